@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from telemetry import telemetry
+
+
+# Content-addressed store of exporter outputs. An entry is keyed by the exporter,
+# its version, the question type and the generated output (plus any other input
+# that changes the files, e.g. model name and score for the HTML report), and holds
+# a copy of every file the exporter wrote. Re-exporting the same winner copies the
+# files back instead of running exec/Graphviz/pdflatex again.
+class ArtifactStore:
+    def __init__(self, path=".cache/artifacts", max_entries=2000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+    @staticmethod
+    def make_key(exporter, version, q_type, generated_output, *extra):
+        raw = "\0".join([exporter, str(version), q_type or "", generated_output] + [str(e) for e in extra])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _entry_dir(self, key):
+        return os.path.join(self.path, key[:2], key)
+
+    # Copies the stored files to `outputs` (paths in the same order they were stored);
+    # False when the entry is missing or incomplete.
+    def fetch(self, key, outputs):
+        entry_dir = self._entry_dir(key)
+        try:
+            with open(os.path.join(entry_dir, "manifest.json"), "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return False
+
+        stored = [os.path.join(entry_dir, name) for name in manifest["files"]]
+        if len(stored) != len(outputs) or not all(os.path.exists(path) for path in stored):
+            with self._lock:
+                self.misses += 1
+            return False
+
+        for source, destination in zip(stored, outputs):
+            if os.path.dirname(destination):
+                os.makedirs(os.path.dirname(destination), exist_ok=True)
+            shutil.copyfile(source, destination)
+        os.utime(os.path.join(entry_dir, "manifest.json"))
+        with self._lock:
+            self.hits += 1
+        return True
+
+    # Keeps a copy of `outputs`; written to a temporary directory and renamed, so a
+    # concurrent reader never sees a half-written entry.
+    def store(self, key, outputs, exporter=None):
+        entry_dir = self._entry_dir(key)
+        if os.path.exists(entry_dir):
+            return
+        os.makedirs(os.path.dirname(entry_dir), exist_ok=True)
+        staging = tempfile.mkdtemp(prefix=".staging-", dir=os.path.dirname(entry_dir))
+        try:
+            names = []
+            for index, output in enumerate(outputs):
+                name = f"{index}-{os.path.basename(output)}"
+                shutil.copyfile(output, os.path.join(staging, name))
+                names.append(name)
+            with open(os.path.join(staging, "manifest.json"), "w", encoding="utf-8") as f:
+                json.dump({"exporter": exporter, "files": names, "created": time.time()}, f)
+            os.replace(staging, entry_dir)
+        except OSError:
+            # another process stored the same entry first
+            shutil.rmtree(staging, ignore_errors=True)
+        self._evict()
+
+    def _manifests(self):
+        for prefix in os.listdir(self.path):
+            prefix_dir = os.path.join(self.path, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            for key in os.listdir(prefix_dir):
+                manifest = os.path.join(prefix_dir, key, "manifest.json")
+                if os.path.exists(manifest):
+                    yield manifest
+
+    # Least recently used entries (manifest mtime, refreshed on fetch) go first
+    def _evict(self):
+        if not self.max_entries:
+            return
+        with self._lock:
+            manifests = sorted(self._manifests(), key=os.path.getmtime)
+            for manifest in manifests[:max(0, len(manifests) - self.max_entries)]:
+                shutil.rmtree(os.path.dirname(manifest), ignore_errors=True)
+
+    def stats(self):
+        return {"entries": sum(1 for _ in self._manifests()), "hits": self.hits, "misses": self.misses}
+
+
+# Wraps an export job: serves `outputs` from the store when possible, otherwise runs
+# `function` and stores the outputs once all of them exist (a failed export is
+# retried next time). Returns True when the files came from the store.
+def cached_export(store, name, key, outputs, function):
+    def run():
+        if store.fetch(key, outputs):
+            print(f"[✓] {name}: reutilizado do cache de artefatos")
+            telemetry.count("artifact_cache_hits", exporter=name)
+            return True
+        function()
+        if outputs and all(os.path.exists(output) for output in outputs):
+            store.store(key, outputs, exporter=name)
+        return False
+    return run
+
+
+_default_options = {}
+_default_store = None
+_default_lock = threading.Lock()
+
+
+def configure_default_store(enabled=False, **options):
+    global _default_store
+    with _default_lock:
+        _default_options.clear()
+        if enabled:
+            _default_options.update(options)
+            _default_options["enabled"] = True
+        _default_store = None
+
+
+# None while the artifact cache is disabled
+def get_default_store():
+    global _default_store
+    with _default_lock:
+        if _default_store is None and _default_options.get("enabled"):
+            options = {k: v for k, v in _default_options.items() if k != "enabled"}
+            _default_store = ArtifactStore(**options)
+        return _default_store
@@ -0,0 +1,182 @@
+import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import latex_compiler
+import rate_limiter
+
+
+# Accepts a directory of .tex/.txt files (one question per file, id = file name)
+# or a .jsonl file with {"id": ..., "question": ...} per line.
+def load_question_bank(path):
+    questions = []
+    if os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            stem, ext = os.path.splitext(name)
+            if ext.lower() not in (".tex", ".txt"):
+                continue
+            with open(os.path.join(path, name), 'r', encoding='utf-8') as f:
+                questions.append({"id": stem, "question": f.read()})
+        return questions
+
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            text = entry.get("question") or entry.get("original_question") or entry.get("text")
+            if not text:
+                print(f"[!] Linha {line_number} sem campo 'question', ignorada.")
+                continue
+            questions.append({"id": str(entry.get("id", f"q{line_number:04d}")), "question": text})
+    return questions
+
+def _safe_id(question_id):
+    return re.sub(r"[^\w.-]", "_", question_id)
+
+# The PDF is left to _question_pdfs, which compiles every question's PDF at once
+def _export_job(pipeline, outcome, question_dir):
+    return pipeline.export_assets(outcome["winner"], outcome["question_type"], question_dir, skip=("pdf",))
+
+# One PDF per question, compiled in parallel by latex.workers pdflatex processes
+def _question_pdfs(winners, entries):
+    from export_pipeline import compile_pdfs
+    started = time.perf_counter()
+    results = compile_pdfs([(o["winner"], o["question_type"], entry["output_dir"]) for o, entry in zip(winners, entries)])
+    for entry, result in zip(entries, results):
+        entry["pdf"] = result
+    failed = [entry["id"] for entry, result in zip(entries, results) if not result["ok"]]
+    print(f"[✓] {len(results) - len(failed)} PDFs de questões prontos em {time.perf_counter() - started:.2f}s "
+          f"({sum(1 for result in results if result['cached'])} do cache)")
+    if failed:
+        print(f"[✗] Falha ao compilar o PDF de: {', '.join(failed)}")
+    return results
+
+# All winners in one multi-page PDF: a single pdflatex run instead of one per question
+def _combined_pdf(outcomes, output_dir):
+    from exporter import QuestionExporter
+    bodies = [QuestionExporter.build_pdf_body(o["winner"]["output"], o["question_type"]) for o in outcomes]
+    filename = os.path.join(output_dir, "questoes_lote.pdf")
+    result = latex_compiler.get_default_compiler().compile_combined(bodies, filename)
+    if result["ok"]:
+        print(f"[✓] PDF do lote ({len(bodies)} questões) compilado em {result['seconds']:.2f}s: {filename}")
+    else:
+        print(f"[✗] Falha ao compilar o PDF do lote: {filename}")
+    return result
+
+# pipeline is the already-imported main module, so models loaded by it are reused
+# instead of being loaded a second time by "import main".
+def run_batch(source, config, output_dir, pipeline=None):
+    if pipeline is None:
+        import main as pipeline
+
+    questions = load_question_bank(source)
+    if not questions:
+        print(f"[!] Nenhuma questão encontrada em: {source}")
+        return None
+
+    os.makedirs(output_dir, exist_ok=True)
+    print(f"\n[✓] {len(questions)} questões carregadas de {source}")
+
+    summary = []
+    winners = []
+    winner_entries = []
+    started = time.perf_counter()
+
+    # Exports (pdflatex/Graphviz) of question N run while question N+1 is being generated
+    with ThreadPoolExecutor(max_workers=1) as export_pool:
+        pending_exports = []
+        for index, item in enumerate(questions, 1):
+            print(f"\n{'#' * 80}")
+            print(f"QUESTÃO {index}/{len(questions)}: {item['id']}")
+            print(f"{'#' * 80}")
+
+            question_dir = os.path.join(output_dir, _safe_id(item["id"]))
+            os.makedirs(question_dir, exist_ok=True)
+
+            question_started = time.perf_counter()
+            outcome = pipeline.run_question(item["question"], config, question_dir, export=False)
+            generation_time = time.perf_counter() - question_started
+
+            pipeline.record_results(item["question"], outcome, config, question_dir)
+
+            winner = outcome["winner"]
+            entry = {
+                "id": item["id"],
+                "question_type": outcome["question_type"],
+                "winner": winner["name"] if winner else None,
+                "score_geral": winner["evaluation"]["score_geral"] if winner else None,
+                "similarity": winner["similarity"] if winner else None,
+                "models_evaluated": len(outcome["results"]),
+                "generation_seconds": round(generation_time, 2),
+                "prompt_tokens_saved": outcome["tokens"]["prompt_tokens_saved"],
+                "output_dir": question_dir
+            }
+            summary.append(entry)
+
+            if winner:
+                winners.append(outcome)
+                winner_entries.append(entry)
+                pending_exports.append((entry, export_pool.submit(_export_job, pipeline, outcome, question_dir)))
+
+        for entry, future in pending_exports:
+            try:
+                timings = future.result()
+                entry["export_seconds"] = round(timings["total"]["seconds"], 2)
+                entry["export_cached"] = [name for name, info in timings.items() if name != "total" and info["cached"]]
+                entry["export_timings"] = {
+                    name: round(info["seconds"], 2) if info["seconds"] is not None else None
+                    for name, info in timings.items() if name != "total"
+                }
+            except Exception as e:
+                print(f"[✗] Erro ao exportar {entry['id']}: {e}")
+                entry["export_error"] = str(e)
+
+    if winners:
+        try:
+            _question_pdfs(winners, winner_entries)
+        except Exception as e:
+            print(f"[✗] Erro ao compilar os PDFs das questões: {e}")
+
+    combined_pdf = None
+    if winners and config.get('latex', {}).get('combined_pdf', False):
+        try:
+            combined_pdf = _combined_pdf(winners, output_dir)
+        except Exception as e:
+            print(f"[✗] Erro ao compilar o PDF do lote: {e}")
+            combined_pdf = {"ok": False, "error": str(e)}
+
+    elapsed = time.perf_counter() - started
+    succeeded = sum(1 for entry in summary if entry["winner"])
+    throughput = {
+        "questions": len(questions),
+        "succeeded": succeeded,
+        "failed": len(questions) - succeeded,
+        "elapsed_seconds": round(elapsed, 2),
+        "questions_per_minute": round(len(questions) / elapsed * 60, 2) if elapsed > 0 else 0
+    }
+
+    aggregated = {
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "source": source,
+        "throughput": throughput,
+        "latex": {**latex_compiler.get_default_compiler().stats(), "combined_pdf": combined_pdf},
+        "rate_limit": rate_limiter.get_default_limiter().stats(),
+        "questions": summary
+    }
+    pipeline.save_results(aggregated, os.path.join(output_dir, "resultados_lote.json"))
+
+    print(f"\n{'=' * 80}")
+    print("RESUMO DO LOTE")
+    print(f"{'=' * 80}")
+    print(f"  Questões: {throughput['questions']} ({throughput['succeeded']} com vencedor, {throughput['failed']} sem)")
+    print(f"  Tempo total: {throughput['elapsed_seconds']}s")
+    print(f"  Throughput: {throughput['questions_per_minute']} questões/min")
+    throttled = aggregated["rate_limit"].values()
+    print(f"  Espera por limite de taxa: {sum(s['throttled_seconds'] for s in throttled):.1f}s "
+          f"({sum(s['rate_limited'] for s in throttled)} respostas 429, {sum(s['retries'] for s in throttled)} novas tentativas)")
+    return aggregated
@@ -0,0 +1,170 @@
+# Microbenchmark: QuestionEvaluator's LaTeX, Python and structure metrics (single-pass
+# latex_scanner plus the AST class model) vs. the previous per-metric regex scans.
+# Also checks that both produce the same metrics. The AST parse makes complete texts
+# slower than the regexes; truncated ones, where the old patterns backtrack, are not.
+#
+#   python benchmarks/bench_latex_scanner.py [--sizes 10 100 1000] [--repeat 5]
+import argparse
+import ast
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import class_model
+from evaluation import QuestionEvaluator
+from latex_scanner import clear_cache, scan_text
+
+
+def legacy_latex_validation(text):
+    latex_patterns = {
+        "verbatim_blocks": r"\\begin{verbatim}.*?\\end{verbatim}",
+        "enumerate_blocks": r"\\begin{enumerate}.*?\\end{enumerate}",
+        "textbf": r"\\textbf{.*?}",
+        "texttt": r"\\texttt{.*?}",
+        "items": r"\\item"
+    }
+    encontrados = {}
+    for name, pattern in latex_patterns.items():
+        encontrados[name] = len(re.findall(pattern, text, re.DOTALL))
+    begin_count = len(re.findall(r"\\begin{", text))
+    end_count = len(re.findall(r"\\end{", text))
+    blocos_balanceados = begin_count == end_count
+    total_comandos = sum(encontrados.values())
+    return {
+        "latex_valido": blocos_balanceados and (total_comandos > 0),
+        "blocos_balanceados": blocos_balanceados,
+        "total_comandos_latex": total_comandos
+    }
+
+
+def legacy_python_validation(text):
+    codigos = re.findall(r"\\begin{verbatim}(.*?)\\end{verbatim}", text, re.DOTALL)
+    validos = invalidos = 0
+    for codigo in codigos:
+        try:
+            ast.parse(codigo.strip())
+            validos += 1
+        except SyntaxError:
+            invalidos += 1
+    return {"blocos_codigo_encontrados": len(codigos), "codigos_validos": validos, "codigos_invalidos": invalidos}
+
+
+def legacy_structure_analysis(text):
+    classes = re.findall(r"\bclass\s+(\w+)", text)
+    metodos = re.findall(r"\bdef\s+(\w+)", text)
+    return {
+        "tem_classe": bool(re.search(r"\bclass\s+\w+", text)),
+        "tem_metodos": bool(re.search(r"\bdef\s+\w+", text)),
+        "tem_atributos": bool(re.search(r"self\.\w+", text)),
+        "tem_alternativas": bool(re.search(r"\\item|Alternativas:", text, re.IGNORECASE)),
+        "tamanho_texto": len(text),
+        "numero_linhas": len(text.split('\n')),
+        "classes_encontradas": classes,
+        "metodos_encontrados": metodos
+    }
+
+
+def legacy_metrics(text):
+    metrics = {}
+    metrics.update(legacy_latex_validation(text))
+    metrics.update(legacy_python_validation(text))
+    metrics.update(legacy_structure_analysis(text))
+    return metrics
+
+
+COMPARED_KEYS = (
+    "latex_valido", "blocos_balanceados", "total_comandos_latex",
+    "blocos_codigo_encontrados", "codigos_validos", "codigos_invalidos",
+    "tem_classe", "tem_metodos", "tem_atributos", "tem_alternativas",
+    "tamanho_texto", "numero_linhas", "classes_encontradas", "metodos_encontrados"
+)
+
+
+def new_metrics(evaluator, text):
+    metrics = {}
+    metrics.update(evaluator._latex_validation(text))
+    metrics.update(evaluator._python_validation(text))
+    metrics.update(evaluator._estructure_analysis(text))
+    return {key: metrics[key] for key in COMPARED_KEYS}
+
+
+SECTION = r"""\textbf{EP%(i)d} \textbf{Classe Produto%(i)d} — Encapsulamento
+
+Crie a classe \texttt{Produto%(i)d} com \textbf{atributos privados}:
+\begin{itemize}[itemsep=2pt]
+  \item nome e preço
+  \item método \texttt{aplicar\_desconto()}
+\end{itemize}
+\begin{verbatim}
+class Produto%(i)d:
+    def __init__(self, nome, preco):
+        self.__nome = nome
+        self.__preco = preco
+
+    def aplicar_desconto(self, pct):
+        self.__preco *= (1 - pct / 100)
+\end{verbatim}
+\begin{enumerate}
+  \item Alternativa A
+  \item Alternativa B
+\end{enumerate}
+"""
+
+
+def synthetic_text(sections):
+    return "\n".join(SECTION % {"i": i} for i in range(sections))
+
+
+# Output cut at max_tokens: environments and \textbf{ left open, which makes the
+# old non-greedy DOTALL patterns rescan the rest of the text from every opening.
+def truncated_text(sections):
+    section = SECTION.replace(r"\end{verbatim}", "").replace(r"\end{enumerate}", "")
+    return "\n".join(section % {"i": i} for i in range(sections)) + r"\textbf{sem fechamento"
+
+
+def best_of(function, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 500], help="seções LaTeX por texto sintético")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    evaluator = QuestionEvaluator()
+    report = []
+    for family, build in (("completo", synthetic_text), ("truncado", truncated_text)):
+        for sections in args.sizes:
+            text = build(sections)
+            assert new_metrics(evaluator, text) == legacy_metrics(text), f"métricas divergentes ({family}, {sections} seções)"
+
+            legacy_seconds = best_of(lambda: legacy_metrics(text), args.repeat)
+            # clear the memos so every run pays for a full scan and AST parse
+            scanner_seconds = best_of(lambda: (clear_cache(), class_model.clear_cache(), new_metrics(evaluator, text)),
+                                      args.repeat)
+            report.append({
+                "input": family,
+                "sections": sections,
+                "chars": len(text),
+                "legacy_ms": round(legacy_seconds * 1000, 3),
+                "scanner_ms": round(scanner_seconds * 1000, 3),
+                "speedup": round(legacy_seconds / scanner_seconds, 2) if scanner_seconds else None
+            })
+            print(f"{family:<9} {sections:>6} seções {len(text):>9} chars  "
+                  f"legado {legacy_seconds * 1000:9.2f} ms  scanner {scanner_seconds * 1000:9.2f} ms")
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+# End-to-end benchmark of generation -> evaluation -> export against the local fake
+# Groq server. Reports p50/p95 per stage and questions/sec per concurrency level as
+# JSON, so runs can be compared over time without calling Groq.
+#
+#   python benchmarks/bench_pipeline.py --concurrency 1 2 4 --questions 6 --latency 1.5
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_groq_server import FakeGroqServer, DEFAULT_RECORDINGS
+from exporter import QuestionExporter
+from token_budget import percentile
+import telemetry as telemetry_module
+
+
+# run_question stages timed from its own telemetry spans (one JSON line per span)
+PIPELINE_STAGES = ("generation", "evaluation", "embedding")
+
+
+class StageTimer:
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.add_error(name)
+            raise
+        else:
+            self.add(name, time.perf_counter() - started)
+
+    def add(self, name, seconds):
+        with self._lock:
+            self.samples[name].append(seconds)
+
+    def add_error(self, name, count=1):
+        with self._lock:
+            self.errors[name] += count
+
+    def merge(self, other):
+        for name, values in other.samples.items():
+            for value in values:
+                self.add(name, value)
+        for name, count in other.errors.items():
+            self.add_error(name, count)
+
+    def summary(self):
+        stages = {}
+        for name in sorted(set(self.samples) | set(self.errors)):
+            values = self.samples.get(name, [])
+            stages[name] = {
+                "count": len(values),
+                "errors": self.errors.get(name, 0),
+                "p50_ms": round(percentile(values, 50) * 1000, 2) if values else None,
+                "p95_ms": round(percentile(values, 95) * 1000, 2) if values else None,
+                "total_s": round(sum(values), 3)
+            }
+        return stages
+
+
+    # Adds the PIPELINE_STAGES spans written to a telemetry JSONL file
+    def load_spans(self, path):
+        if not os.path.exists(path):
+            return
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                if record.get("stage") not in PIPELINE_STAGES:
+                    continue
+                if record["status"] == "ok":
+                    self.add(record["stage"], record["duration_ms"] / 1000)
+                else:
+                    self.add_error(record["stage"])
+
+
+# One question through main.run_question (routing, attempts, generation, evaluation
+# and embedding exactly as a real run), then the export of its winner
+def run_one(pipeline, config, output_dir, timer):
+    outcome = pipeline.run_question(config['original_question'], config, output_dir, export=False)
+    best = outcome["winner"]
+    if not best:
+        return False
+
+    with timer.stage("def_exec"):
+        QuestionExporter._get_context(best["output"])
+
+    for name, info in pipeline.export_assets(best, outcome["question_type"], output_dir).items():
+        if name == "total":
+            continue
+        if info["error"] is None:
+            timer.add(f"export_{name}", info["seconds"])
+        else:
+            timer.add_error(f"export_{name}")
+    return True
+
+
+def timed_question(pipeline, config, output_dir, timer):
+    with timer.stage("end_to_end"):
+        return run_one(pipeline, config, output_dir, timer)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do pipeline com Groq falso")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--questions", type=int, default=6, help="questões por nível de concorrência")
+    parser.add_argument("--latency", type=float, default=1.0)
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--recordings", default=DEFAULT_RECORDINGS)
+    parser.add_argument("--report", default="benchmark_report.json")
+    args = parser.parse_args()
+
+    server = FakeGroqServer(("127.0.0.1", 0), args.recordings, args.latency, args.jitter, seed=42)
+    server.start_background()
+    os.environ["GROQ_BASE_URL"] = server.base_url
+    os.environ.setdefault("GROQ_API_KEY", "fake-key")
+
+    import main as pipeline
+    import sandbox
+
+    config = pipeline.load_config(os.path.join(ROOT, "models&question_config.yaml"))
+    work_dir = tempfile.mkdtemp(prefix="bench-")
+    # fresh caches and stores, no response cache and no def-block memo, so every stage
+    # pays its real cost and the project's .cache is left untouched
+    config['cache']['embeddings']['path'] = os.path.join(work_dir, "embeddings.sqlite")
+    config['cache']['responses']['enabled'] = False
+    config['cache']['dedup']['enabled'] = False
+    config['llm_params']['token_budget']['path'] = os.path.join(work_dir, "token_stats.sqlite")
+    config['llm_params']['routing']['path'] = os.path.join(work_dir, "routing.sqlite")
+    sandbox.configure_default_pool(**{**config.get('sandbox', {}), "memo_size": 0})
+
+    levels = []
+    timer = StageTimer()
+    for level in args.concurrency:
+        level_timer = StageTimer()
+        spans_path = os.path.join(work_dir, f"spans-c{level}.jsonl")
+        telemetry_module.configure(jsonl_path=spans_path)
+        started = time.perf_counter()
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            with ThreadPoolExecutor(max_workers=level) as pool:
+                jobs = []
+                for index in range(args.questions):
+                    output_dir = os.path.join(work_dir, f"c{level}-q{index}")
+                    os.makedirs(output_dir, exist_ok=True)
+                    jobs.append(pool.submit(timed_question, pipeline, config, output_dir, level_timer))
+                succeeded = sum(1 for job in jobs if job.result())
+        elapsed = time.perf_counter() - started
+        telemetry_module.configure()
+        level_timer.load_spans(spans_path)
+
+        timer.merge(level_timer)
+        levels.append({
+            "concurrency": level,
+            "questions": args.questions,
+            "succeeded": succeeded,
+            "seconds": round(elapsed, 3),
+            "questions_per_second": round(args.questions / elapsed, 4) if elapsed else None,
+            "stages": level_timer.summary()
+        })
+        print(f"concorrência {level:>3}: {args.questions} questões em {elapsed:.2f}s ({args.questions / elapsed:.3f} q/s)")
+
+    report = {
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "fake_server": {"latency_s": args.latency, "jitter_s": args.jitter, "requests": server.requests, "aborted_streams": server.aborted},
+        "stages": timer.summary(),
+        "levels": levels
+    }
+    with open(args.report, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\n{'etapa':<16} {'n':>5} {'erros':>6} {'p50 (ms)':>10} {'p95 (ms)':>10}")
+    for name, stats in report["stages"].items():
+        p50 = "-" if stats["p50_ms"] is None else f"{stats['p50_ms']:.1f}"
+        p95 = "-" if stats["p95_ms"] is None else f"{stats['p95_ms']:.1f}"
+        print(f"{name:<16} {stats['count']:>5} {stats['errors']:>6} {p50:>10} {p95:>10}")
+    print(f"\n[✓] Relatório salvo em: {args.report}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
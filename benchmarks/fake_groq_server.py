@@ -0,0 +1,235 @@
+# Local stand-in for the Groq chat-completions endpoint. Serves recorded outputs
+# (resultados_geracao.json format) with configurable latency, so the pipeline can be
+# benchmarked without network access or token cost. With --rpm/--tpm it enforces a
+# per-model quota like Groq: x-ratelimit-* headers on every response and 429 with
+# retry-after once the quota of the current minute is used up.
+#
+#   python benchmarks/fake_groq_server.py --port 8765 --latency 2.0 --jitter 0.5
+#   GROQ_BASE_URL=http://127.0.0.1:8765 GROQ_API_KEY=fake python main.py
+import argparse
+import itertools
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import yaml
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_RECORDINGS = os.path.join(ROOT, "resultados_geracao.json")
+DEFAULT_CONFIG = os.path.join(ROOT, "models&question_config.yaml")
+# characters per streamed chunk (roughly 4 tokens)
+CHUNK_CHARS = 16
+
+
+# Maps every model id to the outputs recorded for it. Recordings are keyed by the
+# config's short names (llama, gpt, kimi); unknown models get any recorded output.
+def load_recordings(path=DEFAULT_RECORDINGS, config_path=DEFAULT_CONFIG):
+    with open(path, 'r', encoding='utf-8') as f:
+        results = json.load(f)["results"]
+
+    models = {}
+    if os.path.exists(config_path):
+        with open(config_path, 'r', encoding='utf-8') as f:
+            models = yaml.safe_load(f)["llm_params"]["models"]
+
+    by_model = {}
+    for result in results:
+        model_id = models.get(result["model"], result["model"])
+        by_model.setdefault(model_id, []).append(result["output"])
+    return by_model, [r["output"] for r in results]
+
+
+class FakeGroqServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, recordings=DEFAULT_RECORDINGS, latency=1.0, jitter=0.0, seed=None,
+                 requests_per_minute=None, tokens_per_minute=None):
+        super().__init__(address, FakeGroqHandler)
+        self.by_model, fallback = load_recordings(recordings)
+        self.fallback = itertools.cycle(fallback)
+        self.latency = latency
+        self.jitter = jitter
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.aborted = 0
+        self.rate_limited = 0
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.windows = {}
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def next_output(self, model):
+        with self.lock:
+            self.requests += 1
+            outputs = self.by_model.get(model)
+            output = self.random.choice(outputs) if outputs else next(self.fallback)
+            delay = max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+        return output, delay
+
+    # Sliding 60 s window per model. Returns (headers, retry_after); retry_after is set
+    # when the request is over the quota and must be answered with 429.
+    def admit(self, model, tokens):
+        with self.lock:
+            now = time.monotonic()
+            window = self.windows.setdefault(model, deque())
+            while window and window[0][0] <= now - 60:
+                window.popleft()
+            used_requests = len(window)
+            used_tokens = sum(t for _, t in window)
+            over = ((self.requests_per_minute and used_requests >= self.requests_per_minute) or
+                    (self.tokens_per_minute and used_tokens + tokens > self.tokens_per_minute))
+            reset = f"{max(0.0, window[0][0] + 60 - now):.2f}s" if window else "0s"
+            if not over:
+                window.append((now, tokens))
+                used_requests += 1
+                used_tokens += tokens
+            else:
+                self.rate_limited += 1
+            headers = {}
+            if self.requests_per_minute:
+                headers.update({
+                    "x-ratelimit-limit-requests": str(self.requests_per_minute),
+                    "x-ratelimit-remaining-requests": str(max(0, self.requests_per_minute - used_requests)),
+                    "x-ratelimit-reset-requests": reset
+                })
+            if self.tokens_per_minute:
+                headers.update({
+                    "x-ratelimit-limit-tokens": str(self.tokens_per_minute),
+                    "x-ratelimit-remaining-tokens": str(max(0, self.tokens_per_minute - used_tokens)),
+                    "x-ratelimit-reset-tokens": reset
+                })
+            return headers, (window[0][0] + 60 - now if over else None)
+
+    def start_background(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+class FakeGroqHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"rota desconhecida: {self.path}"}})
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        model = request.get("model", "")
+        prompt = "".join(m.get("content", "") for m in request.get("messages", []))
+
+        headers, retry_after = self.server.admit(model, max(1, len(prompt) // 4) + request.get("max_tokens", 0))
+        if retry_after is not None:
+            headers["retry-after"] = f"{retry_after:.2f}"
+            self._send_json(429, {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}},
+                            headers)
+            return
+
+        output, delay = self.server.next_output(model)
+        prompt_tokens = max(1, len(prompt) // 4)
+        completion_tokens = max(1, len(output) // 4)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+        if request.get("stream"):
+            self._stream(model, output, delay, usage, headers)
+            return
+
+        time.sleep(delay)
+        self._send_json(200, {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": output},
+                "finish_reason": "stop"
+            }],
+            "usage": usage
+        }, headers)
+
+    # Server-sent events in the chat.completion.chunk format, with the latency spread
+    # evenly over the chunks. Usage goes in x_groq of the last chunk, as Groq does.
+    def _stream(self, model, output, delay, usage, headers):
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        pieces = [output[i:i + CHUNK_CHARS] for i in range(0, len(output), CHUNK_CHARS)] or [""]
+
+        def chunk(delta, finish_reason=None, x_groq=None):
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+            }
+            if x_groq:
+                payload["x_groq"] = x_groq
+            return f"data: {json.dumps(payload)}\n\n".encode("utf-8")
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        try:
+            self.wfile.write(chunk({"role": "assistant", "content": ""}))
+            for piece in pieces:
+                time.sleep(delay / len(pieces))
+                self.wfile.write(chunk({"content": piece}))
+                self.wfile.flush()
+            self.wfile.write(chunk({}, "stop", {"id": completion_id, "usage": usage}))
+            self.wfile.write(b"data: [DONE]\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # client closed the stream early (aborted generation)
+            with self.server.lock:
+                self.server.aborted += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor Groq falso para benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--recordings", default=DEFAULT_RECORDINGS)
+    parser.add_argument("--latency", type=float, default=1.0, help="latência média por requisição (s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="variação uniforme +/- sobre a latência (s)")
+    parser.add_argument("--rpm", type=int, help="requisições por minuto por modelo (429 acima disso)")
+    parser.add_argument("--tpm", type=int, help="tokens (prompt + max_tokens) por minuto por modelo")
+    args = parser.parse_args()
+
+    server = FakeGroqServer((args.host, args.port), args.recordings, args.latency, args.jitter,
+                            requests_per_minute=args.rpm, tokens_per_minute=args.tpm)
+    print(f"[✓] Groq falso ouvindo em {server.base_url} (latência {args.latency}s ± {args.jitter}s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+import ast
+import copy
+import re
+import textwrap
+from functools import lru_cache
+from typing import Dict, Any, List, Optional
+
+from latex_scanner import scan_text
+
+_DEF_BLOCK_RE = re.compile(r"\[\[\s*def\s*:(.*?)\]\]", re.DOTALL | re.IGNORECASE)
+
+
+def extract_def_code(generated_output: str) -> Optional[str]:
+    def_block = _DEF_BLOCK_RE.search(generated_output)
+    if not def_block:
+        return None
+    return textwrap.dedent(def_block.group(1).strip('\n'))
+
+
+# UML visibility: __x private, _x protected, dunder methods and the rest public
+def visibility(name: str) -> str:
+    if name.startswith("__") and name.endswith("__"):
+        return "+"
+    if name.startswith("__"):
+        return "-"
+    if name.startswith("_"):
+        return "#"
+    return "+"
+
+
+def _self_attributes(function: ast.AST) -> List[str]:
+    attributes = []
+    for node in ast.walk(function):
+        targets = []
+        if isinstance(node, ast.Assign):
+            targets = node.targets
+        elif isinstance(node, (ast.AnnAssign, ast.AugAssign)):
+            targets = [node.target]
+        for target in targets:
+            for element in ast.walk(target):
+                if (isinstance(element, ast.Attribute) and isinstance(element.value, ast.Name)
+                        and element.value.id == "self"):
+                    attributes.append(element.attr)
+    return attributes
+
+
+def _class_info(node: ast.ClassDef) -> Dict[str, Any]:
+    attributes, methods = [], []
+    for item in node.body:
+        if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            methods.append(item.name)
+            # attributes set in any method, not only __init__
+            attributes.extend(_self_attributes(item))
+        elif isinstance(item, ast.Assign):
+            attributes.extend(t.id for t in item.targets if isinstance(t, ast.Name))
+        elif isinstance(item, ast.AnnAssign) and isinstance(item.target, ast.Name):
+            attributes.append(item.target.id)
+
+    attributes = list(dict.fromkeys(attributes))
+    return {
+        "name": node.name,
+        "bases": [ast.unparse(base) for base in node.bases],
+        "attributes": attributes,
+        "methods": methods,
+        "visibility": {member: visibility(member) for member in attributes + methods}
+    }
+
+
+def _parse(code: str) -> Optional[ast.AST]:
+    # same tolerance as the def-block execution: retry without a stray first line
+    for candidate in (code, "\n".join(code.splitlines()[1:])):
+        try:
+            return ast.parse(candidate)
+        except (SyntaxError, ValueError):
+            continue
+    return None
+
+
+# When the whole source does not parse, each top-level "class" chunk (up to the next
+# unindented line) is parsed on its own so one broken statement elsewhere does not
+# hide every class.
+def _parse_class_chunks(code: str) -> List[ast.AST]:
+    trees, chunk = [], None
+    for line in code.splitlines() + [""]:
+        starts_class = line.startswith("class ")
+        top_level = line[:1].strip() != ""
+        if chunk is not None and (starts_class or top_level):
+            tree = _parse("\n".join(chunk))
+            if tree:
+                trees.append(tree)
+            chunk = None
+        if starts_class:
+            chunk = [line]
+        elif chunk is not None:
+            chunk.append(line)
+    return trees
+
+
+# Classes (nested ones included) and top-level functions of one source
+def _source_model(code: str):
+    tree = _parse(code)
+    trees = [tree] if tree else _parse_class_chunks(code)
+    # ast.walk also reaches nested classes
+    classes = [_class_info(node) for t in trees for node in ast.walk(t) if isinstance(node, ast.ClassDef)]
+    functions = [node.name for t in trees for node in t.body
+                 if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))]
+    return classes, functions
+
+
+@lru_cache(maxsize=64)
+def _extract(generated_output: str) -> Dict[str, Any]:
+    sources = []
+    def_code = extract_def_code(generated_output)
+    if def_code:
+        sources.append(def_code)
+    sources.extend(textwrap.dedent(block).strip("\n") for block in scan_text(generated_output)["code_blocks"])
+
+    classes, functions = {}, []
+    for code in sources:
+        source_classes, source_functions = _source_model(code)
+        for info in source_classes:
+            classes.setdefault(info["name"], info)
+        functions.extend(source_functions)
+
+    return {"classes": list(classes.values()), "functions": functions}
+
+
+# Compact class model of a generated question, built once per text from the
+# [[def:]] block (the reference implementation) and the verbatim code blocks:
+# {"classes": [...], "functions": [top-level def names]}. Shared by the UML exporter
+# and the evaluator's structure metrics. The memoized model is shared, so every
+# caller gets its own copy.
+def extract_class_model(generated_output: str) -> Dict[str, Any]:
+    return copy.deepcopy(_extract(generated_output))
+
+
+def clear_cache():
+    _extract.cache_clear()
@@ -0,0 +1,96 @@
+import hashlib
+import threading
+import time
+
+import numpy as np
+
+import sqlite_store
+
+
+# Persistent bank of every accepted question, used to spot near-duplicates across
+# runs. Vectors live in SQLite and are mirrored in one L2-normalised float32 matrix,
+# so a top-k cosine search is a single matrix-vector product (a few ms for tens of
+# thousands of questions on CPU).
+class DuplicateIndex:
+    def __init__(self, path=".cache/questions_index.sqlite", embedding_cache=None, threshold=0.92, top_k=5):
+        self.path = path
+        self.embedding_cache = embedding_cache
+        self.threshold = threshold
+        self.top_k = top_k
+        self._lock = threading.Lock()
+
+        self._conn = sqlite_store.connect(path, (
+            "CREATE TABLE IF NOT EXISTS questions ("
+            " key TEXT PRIMARY KEY, model TEXT, job TEXT, created REAL NOT NULL,"
+            " dim INTEGER NOT NULL, vector BLOB NOT NULL, preview TEXT)"
+        ))
+
+        rows = self._conn.execute("SELECT key, model, job, vector FROM questions ORDER BY rowid").fetchall()
+        self._keys = {row[0] for row in rows}
+        self._meta = [{"model": row[1], "job": row[2]} for row in rows]
+        vectors = [np.frombuffer(row[3], dtype=np.float32) for row in rows]
+        self._size = len(vectors)
+        # rows past _size are spare capacity, so add() does not copy the matrix every time
+        self._matrix = np.vstack(vectors) if vectors else None
+
+    def __len__(self):
+        return self._size
+
+    @staticmethod
+    def _key(text):
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _normalize(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else vector
+
+    def _encode(self, text):
+        return self.embedding_cache.encode([text])[0]
+
+    # Top-k most similar stored questions: [{"similarity", "model", "job"}], best first
+    def search(self, vector, k=None):
+        k = k or self.top_k
+        with self._lock:
+            if not self._size:
+                return []
+            scores = self._matrix[:self._size] @ self._normalize(vector)
+            k = min(k, self._size)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [{"similarity": round(float(scores[i]), 4), **self._meta[i]} for i in top]
+
+    def check(self, text):
+        neighbours = self.search(self._encode(text))
+        best = neighbours[0]["similarity"] if neighbours else 0.0
+        return {
+            "similaridade_banco": best,
+            "duplicata_proxima": best >= self.threshold,
+            "vizinhos_banco": neighbours
+        }
+
+    def add(self, text, model=None, job=None):
+        key = self._key(text)
+        vector = self._normalize(self._encode(text))
+        with self._lock:
+            if key in self._keys:
+                return False
+            self._conn.execute(
+                "INSERT INTO questions (key, model, job, created, dim, vector, preview) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, model, job, time.time(), len(vector), vector.tobytes(), text[:200])
+            )
+            self._conn.commit()
+
+            if self._matrix is None:
+                self._matrix = np.zeros((16, len(vector)), dtype=np.float32)
+            elif self._size == len(self._matrix):
+                self._matrix = np.vstack([self._matrix, np.zeros_like(self._matrix)])
+            self._matrix[self._size] = vector
+            self._size += 1
+            self._keys.add(key)
+            self._meta.append({"model": model, "job": job})
+        return True
+
+    def stats(self):
+        return {"entries": self._size, "threshold": self.threshold}
@@ -0,0 +1,85 @@
+import hashlib
+import threading
+import time
+
+import numpy as np
+
+import model_registry
+import sqlite_store
+
+
+# On-disk embedding store keyed by sha256(model name + text). Rows carry a
+# last_used timestamp so the least recently used ones are evicted past max_entries.
+class EmbeddingCache:
+    def __init__(self, path=".cache/embeddings.sqlite", model_name=model_registry.EMBEDDING_MODEL_NAME, max_entries=20000):
+        self.path = path
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self._conn = sqlite_store.connect(path, (
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY, model TEXT NOT NULL, dim INTEGER NOT NULL,"
+            " vector BLOB NOT NULL, last_used REAL NOT NULL)",
+            "CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)"
+        ))
+
+    def _key(self, text):
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def _lookup(self, keys):
+        found = {}
+        now = time.time()
+        with self._lock:
+            for key in set(keys):
+                row = self._conn.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+                if row:
+                    found[key] = np.frombuffer(row[0], dtype=np.float32)
+            if found:
+                self._conn.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, k) for k in found])
+                self._conn.commit()
+        return found
+
+    def _store(self, items):
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, dim, vector, last_used) VALUES (?, ?, ?, ?, ?)",
+                [(key, self.model_name, len(vec), vec.astype(np.float32).tobytes(), now) for key, vec in items]
+            )
+            sqlite_store.evict_lru(self._conn, "embeddings", self.max_entries)
+            self._conn.commit()
+
+    # Returns one float32 vector per text; all cache misses go to a single encode() call
+    def encode(self, texts):
+        keys = [self._key(text) for text in texts]
+        vectors = self._lookup(keys)
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors:
+                missing.setdefault(key, text)
+
+        self.hits += len(keys) - sum(1 for key in keys if key in missing)
+        self.misses += len(missing)
+
+        if missing:
+            model = model_registry.get_embedding_model(self.model_name)
+            encoded = model.encode(list(missing.values()), convert_to_numpy=True, batch_size=32)
+            new_items = list(zip(missing.keys(), encoded))
+            self._store(new_items)
+            vectors.update({key: np.asarray(vec, dtype=np.float32) for key, vec in new_items})
+
+        return [vectors[key] for key in keys]
+
+    def stats(self):
+        with self._lock:
+            total = sqlite_store.count(self._conn, "embeddings")
+        return {"entries": total, "hits": self.hits, "misses": self.misses}
+
+
+def cosine_similarity(a, b):
+    denom = float(np.linalg.norm(a) * np.linalg.norm(b))
+    return float(np.dot(a, b) / denom) if denom else 0.0
@@ -1,48 +1,164 @@
-import spacy
 import ast
-import re
-from typing import Dict, Any
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Any, List
 import json
 from datetime import datetime
+import model_registry
+from telemetry import telemetry
+from latex_scanner import scan_text
+from class_model import extract_class_model
+from scoring import score_metrics
 
 
+# Only word vectors, NER labels and lexical stop/punct flags are used, so every
+# other pipeline component (parser, lemmatizer, morphologizer...) is skipped.
+SPACY_REQUIRED_PIPES = ("tok2vec", "ner")
+
 class QuestionEvaluator:    
-    def __init__(self):
+    def __init__(self, nlp=None, duplicate_index=None, weights=None):
+        # spaCy is loaded on first evaluation through the shared model registry
+        self._nlp = nlp
+        # optional DuplicateIndex; when set, candidates are compared with the whole bank
+        self.duplicate_index = duplicate_index
+        # points per criterion of score_geral (scoring.DEFAULT_WEIGHTS when None)
+        self.weights = weights
+        # optional MicroBatcher (generation service): texts parsed by concurrent jobs
+        # are grouped into a single nlp.pipe call
+        self.doc_batcher = None
+        self._nlp_missing = False
+        self._original_doc_cache = {}
+        self._original_doc_lock = threading.Lock()
+        # per thread, since batch workers and service jobs share one evaluator
+        self._timings = threading.local()
+    
+    @property
+    def nlp(self):
+        if self._nlp is None and not self._nlp_missing:
+            try:
+                self._nlp = model_registry.get_spacy_model()
+            except (OSError, ImportError):
+                print("[!] Modelo spaCy não encontrado. Execute: python -m spacy download pt_core_news_md")
+                self._nlp_missing = True
+        return self._nlp
+    
+    @property
+    def _disabled_pipes(self):
+        return [name for name in self.nlp.pipe_names if name not in SPACY_REQUIRED_PIPES]
+    
+    def _parse(self, text: str):
+        if self.doc_batcher is not None:
+            return self.doc_batcher.submit([text])[0]
+        return self.nlp(text, disable=self._disabled_pipes)
+    
+    # Seconds per evaluation stage since the calling thread's last reset_timings()
+    @property
+    def stage_timings(self):
+        if not hasattr(self._timings, "stages"):
+            self._timings.stages = defaultdict(float)
+        return self._timings.stages
+    
+    @contextmanager
+    def _timed(self, stage: str):
+        started = time.perf_counter()
         try:
-            self.nlp = spacy.load("pt_core_news_md")
-            print("[✓] Modelo spaCy carregado com sucesso")
-        except OSError:
-            print("[!] Modelo spaCy não encontrado. Execute: python -m spacy download pt_core_news_md")
-            self.nlp = None
+            yield
+        finally:
+            self.stage_timings[stage] += time.perf_counter() - started
+    
+    def reset_timings(self):
+        self._timings.stages = defaultdict(float)
+    
+    # The original question is the same for every candidate, so its Doc is parsed once
+    def _original_doc(self, original: str):
+        with self._original_doc_lock:
+            doc = self._original_doc_cache.get(original)
+        if doc is None:
+            with self._timed("spacy_original"):
+                doc = self._parse(original)
+            # a few originals are kept, since the service evaluates several questions at once
+            with self._original_doc_lock:
+                if original not in self._original_doc_cache and len(self._original_doc_cache) >= 8:
+                    self._original_doc_cache.pop(next(iter(self._original_doc_cache)))
+                self._original_doc_cache[original] = doc
+        return doc
     
     def evaluate_question(self, original_text: str, generated_text: str) -> Dict[str, Any]:
+        with telemetry.span("evaluation") as span:
+            generated_doc = None
+            if self.nlp:
+                with self._timed("spacy_candidates"):
+                    generated_doc = self._parse(generated_text)
+            results = self._evaluate(original_text, generated_text, generated_doc)
+            span["score_geral"] = results["score_geral"]
+            return results
+    
+    # Batch API: parses the original once and all candidates in one nlp.pipe call
+    # (through doc_batcher when set, so concurrent jobs share batches).
+    # n_process > 1 is only worth it for large batches (each process loads the model).
+    def evaluate_many(self, original_text: str, generated_texts: List[str], n_process: int = 1, batch_size: int = 8) -> List[Dict[str, Any]]:
+        self.reset_timings()
+        with telemetry.span("evaluation", candidates=len(generated_texts)):
+            generated_docs = [None] * len(generated_texts)
+            if self.nlp and generated_texts:
+                self._original_doc(original_text)
+                with self._timed("spacy_candidates"):
+                    if self.doc_batcher is not None:
+                        generated_docs = self.doc_batcher.submit(generated_texts)
+                    else:
+                        generated_docs = list(self.nlp.pipe(
+                            generated_texts,
+                            disable=self._disabled_pipes,
+                            n_process=n_process,
+                            batch_size=batch_size
+                        ))
+            
+            resultados = [
+                self._evaluate(original_text, text, doc)
+                for text, doc in zip(generated_texts, generated_docs)
+            ]
+        
+        print(f"[✓] {len(generated_texts)} candidatos avaliados. Tempo por etapa:")
+        for stage, seconds in self.stage_timings.items():
+            print(f"    {stage:<18} {seconds * 1000:.1f} ms")
+        return resultados
+    
+    def _evaluate(self, original_text: str, generated_text: str, generated_doc=None) -> Dict[str, Any]:
         results = {
             "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
             "metricas": {}
         }
         
         # 1. semantic analysis with spaCy
-        if self.nlp:
-            results["metricas"].update(self._semantic_evaluation(original_text, generated_text))
+        if generated_doc is not None:
+            with self._timed("semantic"):
+                results["metricas"].update(self._semantic_evaluation(self._original_doc(original_text), generated_doc))
         
         # 2. Latex validation
-        results["metricas"].update(self._latex_validation(generated_text))
+        with self._timed("latex"):
+            results["metricas"].update(self._latex_validation(generated_text))
         
         # 3. Python code validation
-        results["metricas"].update(self._python_validation(generated_text))
+        with self._timed("python"):
+            results["metricas"].update(self._python_validation(generated_text))
         
         # 4. Estrutural analysis
-        results["metricas"].update(self._estructure_analysis(generated_text))
+        with self._timed("structure"):
+            results["metricas"].update(self._estructure_analysis(generated_text))
+        
+        # 5. Novelty against every accepted question
+        if self.duplicate_index is not None:
+            with self._timed("novelty"):
+                results["metricas"].update(self.duplicate_index.check(generated_text))
         
-        # 5. General score calculation (1-10)
+        # 6. General score calculation (1-10)
         results["score_geral"] = self._calculte_score(results["metricas"])
         
         return results
     
-    def _semantic_evaluation(self, original: str, generated: str) -> Dict[str, Any]:
-        doc1 = self.nlp(original)
-        doc2 = self.nlp(generated)
-        
+    def _semantic_evaluation(self, doc1, doc2) -> Dict[str, Any]:
         similarity = doc1.similarity(doc2) 
         
         entities_original = set([ent.label_ for ent in doc1.ents])
@@ -74,22 +190,10 @@ class QuestionEvaluator:
             return "Muito Diferente"
     
     def _latex_validation(self, text: str) -> Dict[str, Any]:
-        latex_patterns = {
-            "verbatim_blocks": r"\\begin{verbatim}.*?\\end{verbatim}",
-            "enumerate_blocks": r"\\begin{enumerate}.*?\\end{enumerate}",
-            "textbf": r"\\textbf{.*?}",
-            "texttt": r"\\texttt{.*?}",
-            "items": r"\\item"
-        }
+        scan = scan_text(text)
+        encontrados = scan["counts"]
         
-        encontrados = {}
-        for name, pattern in latex_patterns.items():
-            matches = re.findall(pattern, text, re.DOTALL)
-            encontrados[name] = len(matches)
-        
-        begin_count = len(re.findall(r"\\begin{", text))
-        end_count = len(re.findall(r"\\end{", text))
-        blocos_balanceados = begin_count == end_count
+        blocos_balanceados = scan["begin_count"] == scan["end_count"]
         total_comandos = sum(encontrados.values())
         latex_ok = blocos_balanceados and (total_comandos > 0)
         
@@ -100,7 +204,7 @@ class QuestionEvaluator:
         }
     
     def _python_validation(self, text: str) -> Dict[str, Any]:
-        codigos = re.findall(r"\\begin{verbatim}(.*?)\\end{verbatim}", text, re.DOTALL)
+        codigos = scan_text(text)["code_blocks"]
         
         resultados = {
             "blocos_codigo_encontrados": len(codigos),
@@ -130,19 +234,32 @@ class QuestionEvaluator:
         return resultados
     
     def _estructure_analysis(self, text: str) -> Dict[str, Any]:
+        scan = scan_text(text)
+        # Same class model as the UML exporter; the scanner's class/def markers are
+        # only a fallback when no code block parses. Unlike the old regexes, with
+        # parsed code the metrics ignore class/def/self. mentions in the prose, count
+        # each class name once across blocks, leave out functions nested in methods
+        # and only see attributes that are assigned (tests/test_class_model.py).
+        modelo = extract_class_model(text)
+        if modelo["classes"]:
+            classes = [c["name"] for c in modelo["classes"]]
+            metodos = [m for c in modelo["classes"] for m in c["methods"]] + modelo["functions"]
+            tem_atributos = any(c["attributes"] for c in modelo["classes"])
+        else:
+            classes = list(scan["classes"])
+            metodos = list(scan["methods"])
+            tem_atributos = scan["has_attributes"]
+        
         estrutura = {
-            "tem_classe": bool(re.search(r"\bclass\s+\w+", text)),
-            "tem_metodos": bool(re.search(r"\bdef\s+\w+", text)),
-            "tem_atributos": bool(re.search(r"self\.\w+", text)),
-            "tem_alternativas": bool(re.search(r"\\item|Alternativas:", text, re.IGNORECASE)),
-            "tem_enunciado": len(text) > 100,
-            "tamanho_texto": len(text),
-            "numero_linhas": len(text.split('\n'))
+            "tem_classe": bool(classes),
+            "tem_metodos": bool(metodos),
+            "tem_atributos": tem_atributos,
+            "tem_alternativas": scan["has_alternatives"],
+            "tem_enunciado": scan["length"] > 100,
+            "tamanho_texto": scan["length"],
+            "numero_linhas": scan["lines"]
         }
         
-        classes = re.findall(r"\bclass\s+(\w+)", text)
-        metodos = re.findall(r"\bdef\s+(\w+)", text)
-        
         estrutura["classes_encontradas"] = classes
         estrutura["metodos_encontrados"] = metodos
         estrutura["total_classes"] = len(classes)
@@ -152,44 +269,7 @@ class QuestionEvaluator:
     
     # Calculate overall score from 1 to 10
     def _calculte_score(self, metricas: Dict[str, Any]) -> float:
-        pontos = 0
-        max_pontos = 0
-        
-        # Semantic coherence (weight 3)
-        if "coerencia_semantica" in metricas:
-            sim = metricas["coerencia_semantica"]
-            # If similarity is very high or very low, penalize
-            if 0.4 <= sim <= 0.7:
-                pontos += 3
-            elif 0.3 <= sim < 0.4 or 0.7 < sim <= 0.8:
-                pontos += 2
-            else:
-                pontos += 1
-            max_pontos += 3
-        
-        # LaTeX (weight 2)
-        if metricas.get("latex_valido", False):
-            pontos += 2
-        max_pontos += 2
-        
-        # Python code (weight 3)
-        if metricas.get("codigo_python_ok", False):
-            pontos += 3
-        max_pontos += 3
-        
-        # Estructure (weight 2)
-        if metricas.get("tem_classe", False):
-            pontos += 0.5
-        if metricas.get("tem_metodos", False):
-            pontos += 0.5
-        if metricas.get("tem_atributos", False):
-            pontos += 0.5
-        if metricas.get("tem_alternativas", False):
-            pontos += 0.5
-        max_pontos += 2
-        
-        score = (pontos / max_pontos) * 10 if max_pontos > 0 else 0
-        return round(score, 2)
+        return float(score_metrics([metricas], self.weights)[0])
     
     def generate_report(self, resultados: Dict[str, Any], formato: str = "texto") -> str:
         if formato == "json":
@@ -252,6 +332,15 @@ class QuestionEvaluator:
         relatorio.append(f"  Total de Métodos: {metricas.get('total_metodos', 0)}")
         relatorio.append("")
         
+        # Novelty Section
+        if "similaridade_banco" in metricas:
+            relatorio.append("─" * 80)
+            relatorio.append("5. NOVIDADE (BANCO DE QUESTÕES)")
+            relatorio.append("─" * 80)
+            relatorio.append(f"  Maior Similaridade no Banco: {metricas['similaridade_banco']}")
+            relatorio.append(f"  Duplicata Próxima: {'✗ sim' if metricas.get('duplicata_proxima') else '✓ não'}")
+            relatorio.append("")
+        
         relatorio.append("=" * 80)
         
         return "\n".join(relatorio)
@@ -0,0 +1,148 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import artifact_store
+import latex_compiler
+from artifact_store import cached_export
+from exporter import QuestionExporter
+from html_view import QuestionReporter
+from latex_compiler import build_document
+from telemetry import telemetry
+
+# Part of the artifact cache key: bump an exporter's version whenever the files it
+# writes change, so outputs of the old version are not reused.
+EXPORTER_VERSIONS = {"mctest": 1, "vpl": 2, "uml": 1, "pdf": 2, "html": 1}
+
+
+def output_path(output_dir, filename):
+    return os.path.join(output_dir, filename) if output_dir else filename
+
+
+# name -> (function, dependencies). The HTML report links the PDF and the UML PNG,
+# so it only runs after both; everything else is independent. Exporters in `skip`
+# are left out (batch mode compiles the PDFs itself, see compile_pdfs).
+def build_export_jobs(best_result, question_type, output_dir=None, skip=()):
+    chosen = best_result["output"]
+    exporter = QuestionExporter()
+    reporter = QuestionReporter()
+    score_final = best_result["evaluation"]["score_geral"]
+
+    jobs = {
+        "mctest": (lambda: exporter.export_mctest_json(chosen, best_result["name"], question_type, output_path(output_dir, "mctest_import.json")), ()),
+        "vpl": (lambda: exporter.export_vpl_cases(chosen, question_type, output_path(output_dir, "questoes.cases")), ()),
+        "uml": (lambda: exporter.export_class_diagram(chosen, output_path(output_dir, "diagrama_classes")), ()),
+        "pdf": (lambda: exporter.export_pdf_latex(chosen, output_path(output_dir, "questao_oficial"), q_type=question_type), ()),
+        "html": (lambda: reporter.generate_html(chosen, score_final, best_result["name"], output_path(output_dir, "relatorio_final.html")), ("uml", "pdf")),
+    }
+    jobs = {name: (function, tuple(dep for dep in deps if dep not in skip))
+            for name, (function, deps) in jobs.items() if name not in skip}
+
+    store = artifact_store.get_default_store()
+    if store is None:
+        return jobs
+
+    # exporter -> (files it writes, extra inputs besides output and question type)
+    artifacts = {
+        "mctest": (["mctest_import.json"], (best_result["name"],)),
+        "uml": (["diagrama_classes.png"], ()),
+        "pdf": (["questao_oficial.pdf"], ()),
+        "html": (["relatorio_final.html"], (score_final, best_result["name"])),
+    }
+    # QM questions have no VPL cases (the exporter only removes a stale file)
+    if question_type != "QM":
+        artifacts["vpl"] = (["questoes.cases", "validacao_casos.json"], ())
+
+    for name, (files, extra) in artifacts.items():
+        if name not in jobs:
+            continue
+        function, deps = jobs[name]
+        key = store.make_key(name, EXPORTER_VERSIONS[name], question_type, chosen, *extra)
+        outputs = [output_path(output_dir, f) for f in files]
+        jobs[name] = (cached_export(store, name, key, outputs, function), deps)
+    return jobs
+
+
+def _timed(function):
+    started = time.perf_counter()
+    result = function()
+    return time.perf_counter() - started, result
+
+
+# Runs independent exporters concurrently (pdflatex and Graphviz are subprocesses, so
+# threads overlap them fine) and starts each dependent exporter once its
+# dependencies finish. Returns {exporter: {"seconds": ..., "error": ..., "cached": ...}},
+# where cached tells whether the files came from the artifact store.
+def run_jobs(jobs, max_workers=4):
+    timings = {}
+    remaining = dict(jobs)
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while remaining or running:
+            for name, (function, deps) in list(remaining.items()):
+                if all(dep in timings for dep in deps):
+                    running[pool.submit(_timed, function)] = name
+                    del remaining[name]
+
+            if not running:
+                # only reachable with an unknown dependency name
+                for name in remaining:
+                    timings[name] = {"seconds": 0.0, "error": "dependência não encontrada", "cached": False}
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    seconds, result = future.result()
+                    timings[name] = {"seconds": seconds, "error": None, "cached": result is True}
+                except Exception as e:
+                    print(f"[✗] Erro no exportador {name}: {e}")
+                    timings[name] = {"seconds": None, "error": str(e), "cached": False}
+    return timings
+
+
+def run_export_pipeline(best_result, question_type, output_dir=None, max_workers=4, skip=()):
+    started = time.perf_counter()
+    timings = run_jobs(build_export_jobs(best_result, question_type, output_dir, skip), max_workers)
+    total = time.perf_counter() - started
+
+    print(f"\n{'─' * 80}")
+    print("TEMPO DOS EXPORTADORES")
+    print(f"{'─' * 80}")
+    for name, info in timings.items():
+        status = f"{info['seconds']:.2f}s" if info["error"] is None else f"falhou ({info['error']})"
+        if info["cached"]:
+            status += " (cache)"
+        print(f"  {name:<8} {status}")
+    print(f"  {'total':<8} {total:.2f}s (em paralelo)")
+
+    timings["total"] = {"seconds": total, "error": None, "cached": all(info["cached"] for info in timings.values())}
+    return timings
+
+
+# The PDFs of many questions, [(best_result, question_type, output_dir), ...], compiled
+# by the latex.workers pdflatex processes of LatexCompiler.compile_many. PDFs in the
+# artifact cache are copied back instead, under the same keys as the "pdf" exporter.
+# Returns one {"ok", "seconds", "cached"} per question, in order.
+def compile_pdfs(items):
+    store = artifact_store.get_default_store()
+    results = [None] * len(items)
+    jobs, pending = [], []
+    for index, (best_result, question_type, output_dir) in enumerate(items):
+        filename = output_path(output_dir, "questao_oficial.pdf")
+        key = store.make_key("pdf", EXPORTER_VERSIONS["pdf"], question_type, best_result["output"]) if store else None
+        if key and store.fetch(key, [filename]):
+            telemetry.count("artifact_cache_hits", exporter="pdf")
+            results[index] = {"ok": True, "seconds": 0.0, "cached": True}
+            continue
+        body = QuestionExporter.build_pdf_body(best_result["output"], question_type)
+        jobs.append((build_document(body), filename))
+        pending.append((index, key, filename))
+
+    for (index, key, filename), result in zip(pending, latex_compiler.get_default_compiler().compile_many(jobs)):
+        if key and result["ok"]:
+            store.store(key, [filename], exporter="pdf")
+        results[index] = {"ok": result["ok"], "seconds": result["seconds"], "cached": False}
+    return results
@@ -1,49 +1,60 @@
+import hashlib
 import json
 import re
 import os
-import subprocess
-import textwrap
+import threading
 from graphviz import Digraph
 from datetime import datetime
+import sandbox
+import latex_compiler
+from latex_compiler import build_document
+from telemetry import telemetry, traced
+import vpl_validation
+from class_model import extract_class_model, extract_def_code
+
+_validation_cache = {}
+_validation_lock = threading.Lock()
 
 class QuestionExporter:
     @staticmethod
     def _get_context(generated_output):
-        def_block = re.search(r"\[\[\s*def\s*:(.*?)\]\]", generated_output, re.DOTALL | re.IGNORECASE)
-        if not def_block:
+        clean_code = extract_def_code(generated_output)
+        if clean_code is None:
             print("[!] Bloco [[def:]] não encontrado.")
             return None, None
         
-        raw_code = def_block.group(1)
-        raw_code = raw_code.strip('\n')
-        clean_code = textwrap.dedent(raw_code)
-        
-        context = {
-            "random": __import__("random"),
-            "json": __import__("json"),
-            "datetime": __import__("datetime"),
-            "uuid": __import__("uuid"),
-            "nomes_base": ["André", "Beatriz", "Carlos", "Daniela", "Eduardo", "Fernanda"],
-            "sobrenomes_base": ["Silva", "Santos", "Oliveira", "Souza", "Costa", "Almeida"]
-        }
+        # Runs in a limited worker process; the result is memoized per code hash, so
+        # export_vpl_cases and export_pdf_latex share a single execution.
+        result = sandbox.get_default_pool().run(clean_code)
+        if result["ok"]:
+            context = {"inp_list": result["inp_list"], "out_list": result["out_list"]}
+            return context, result["code"]
         
-        try:
-            exec(clean_code, context)
-            return context, clean_code
-        except Exception as e:
-            try:
-                second_attempt_code = "\n".join(clean_code.splitlines()[1:])
-                exec(second_attempt_code, context)
-                return context, second_attempt_code
-            except:
-                print(f"\n[✗] Erro persistente no Python gerado pela IA:")
-                print(f"    Erro original: {e}")
-                print("-" * 40)
-                print(clean_code[:500])
-                print("-" * 40)
-                return None, clean_code
+        print(f"\n[✗] Erro persistente no Python gerado pela IA:")
+        print(f"    Erro original: {result['error']}")
+        print("-" * 40)
+        print(clean_code[:500])
+        print("-" * 40)
+        return None, clean_code
+
+    # validate_cases report of the generated cases. A few are kept, so the .cases file
+    # and the PDF example of one output (and of the batch PDF) share one validation.
+    @staticmethod
+    def _validate_cases(code, inp_list, out_list):
+        key = hashlib.sha256(repr((code, inp_list, out_list)).encode("utf-8")).hexdigest()
+        with _validation_lock:
+            report = _validation_cache.get(key)
+        if report is None:
+            options = vpl_validation.get_options()
+            report = vpl_validation.validate_cases(code, inp_list, out_list, options.get('seeds', (1, 2)), options.get('chunk_size', 25))
+            with _validation_lock:
+                if key not in _validation_cache and len(_validation_cache) >= 16:
+                    _validation_cache.pop(next(iter(_validation_cache)))
+                _validation_cache[key] = report
+        return report
 
     @staticmethod
+    @traced("export_mctest")
     def export_mctest_json(generated_output, model_name, q_type, filename="mctest_import.json"):
         topic = "02-Classes, atributos e métodos"
         short_desc = re.search(r"\\textbf{(.*?)}", generated_output)
@@ -65,6 +76,7 @@ class QuestionExporter:
         print(f"[✓] Exportado para MCTest: {filename}")
 
     @staticmethod
+    @traced("export_vpl")
     def export_vpl_cases(generated_output, q_type, filename="questoes.cases"):
         if q_type == "QM":
             if os.path.exists(filename):
@@ -87,9 +99,26 @@ class QuestionExporter:
             print("[!] Erro: O código Python executou mas não gerou 'inp_list' ou 'out_list'.")
             return context
 
+        # Every case is replayed against the reference classes (twice, with different
+        # seeds) and only the ones that are not contradicted go to the .cases file
+        options = vpl_validation.get_options()
+        report = QuestionExporter._validate_cases(code, inp_list, out_list)
+        accepted = vpl_validation.accepted_cases(report)
+        with open(os.path.join(os.path.dirname(filename), "validacao_casos.json"), 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+        print(f"[✓] Casos VPL validados: {report['ok']} ok, {report['mismatch']} divergentes, "
+              f"{report['nondeterministic']} não determinísticos, {report['unverifiable']} não verificáveis, "
+              f"{report['error']} com erro (de {report['total']})")
+        if len(accepted) < report["total"]:
+            telemetry.count("vpl_rejected_cases", report["total"] - len(accepted))
+        if not accepted:
+            print("[!] Nenhum caso VPL consistente com as classes de referência; .cases não gerado.")
+            return context
+
         with open(filename, 'w', encoding='utf-8') as f:
-            for i in range(min(len(inp_list), 5)):
-                f.write(f"case=case{i+1}\n")
+            for number, i in enumerate(accepted[:options.get('max_cases', 5)], 1):
+                f.write(f"case=case{number}\n")
                 
                 entrada_limpa = str(inp_list[i]).replace('\n', ' ')
                 saida_limpa = str(out_list[i]).replace('\n', ' ')
@@ -101,28 +130,10 @@ class QuestionExporter:
         return context
 
     @staticmethod
+    @traced("export_uml")
     def export_class_diagram(generated_output, filename="diagrama_classes"):
         print("   -> Gerando Diagrama de Classes UML...")
-        class_matches = re.finditer(r"class\s+(\w+)(?:\((\w+)\))?:", generated_output)
-        classes_info = {}
-        
-        for match in class_matches:
-            class_name = match.group(1)
-            parent_class = match.group(2)
-            class_start = match.end()
-            next_class = re.search(r"\nclass\s+\w+", generated_output[class_start:])
-            class_end = class_start + next_class.start() if next_class else len(generated_output)
-            class_body = generated_output[class_start:class_end]
-            
-            methods = re.findall(r"def\s+(\w+)\(self[^)]*\)", class_body)
-            init_match = re.search(r"def\s+__init__.*?(?=\n    def|\nclass|\Z)", class_body, re.DOTALL)
-            attributes = []
-            if init_match:
-                init_body = init_match.group(0)
-                attributes = re.findall(r"self\.(_*\w+)\s*=", init_body)
-                attributes = list(dict.fromkeys(attributes))
-            
-            classes_info[class_name] = {'parent': parent_class, 'attributes': attributes, 'methods': methods}
+        classes_info = extract_class_model(generated_output)["classes"]
         
         if not classes_info: return
         
@@ -131,27 +142,29 @@ class QuestionExporter:
         dot.attr('node', shape='record', fontname='Arial', fontsize='10', style='filled', fillcolor='#e3f2fd')
         dot.attr('edge', arrowhead='empty', color='#1565c0')
         
-        for class_name, info in classes_info.items():
-            attr_lines = [f"{'-' if a.startswith('_') else '+'} {a}" for a in info['attributes']]
-            meth_lines = [f"{'-' if m.startswith('_') else '+'} {m}()" for m in info['methods']]
+        for info in classes_info:
+            attr_lines = [f"{info['visibility'][a]} {a}" for a in info['attributes']]
+            meth_lines = [f"{info['visibility'][m]} {m}()" for m in info['methods']]
             
             attrs_str = '\\n'.join(attr_lines)
             meths_str = '\\n'.join(meth_lines)
             
-            label = f"{{{class_name}|{attrs_str}|{meths_str}}}"
-            dot.node(class_name, label)
-            if info['parent']: dot.edge(class_name, info['parent'])
+            label = f"{{{info['name']}|{attrs_str}|{meths_str}}}"
+            dot.node(info['name'], label)
+            for parent in info['bases']:
+                dot.edge(info['name'], parent)
         
         try:
             dot.render(filename, format='png', cleanup=True)
             print(f"[✓] Diagrama UML gerado: {filename}.png")
         except Exception as e: print(f"[✗] Erro no Graphviz: {e}")
 
+    # Question body of the PDF (without preamble): [[def:]] and template examples
+    # removed, text escaped and, for QT, the first generated case that passed the VPL
+    # validation as the example (none when every case was rejected).
     @staticmethod
-    def export_pdf_latex(generated_output, filename="questao_oficial", q_type="QT"):
-        print("   -> Compilando PDF via LaTeX...")
-        
-        context, _ = QuestionExporter._get_context(generated_output)
+    def build_pdf_body(generated_output, q_type="QT"):
+        context, code = QuestionExporter._get_context(generated_output)
         
         latex_content = re.sub(r"\[\[\s*def\s*:.*?\]\]", "", generated_output, flags=re.DOTALL | re.IGNORECASE)
 
@@ -183,10 +196,14 @@ class QuestionExporter:
             inp_list = context.get('inp_list', [])
             out_list = context.get('out_list', [])
             if inp_list and out_list:
-                ex_input = str(inp_list[0])
-                ex_output = str(out_list[0])
-                
-                example_latex = f"""
+                accepted = vpl_validation.accepted_cases(QuestionExporter._validate_cases(code, inp_list, out_list))
+                if not accepted:
+                    print("[!] Nenhum caso consistente com as classes de referência; PDF sem exemplo.")
+                else:
+                    ex_input = str(inp_list[accepted[0]])
+                    ex_output = str(out_list[accepted[0]])
+                    
+                    example_latex = f"""
 \\vspace{{0.5cm}}
 \\noindent\\textbf{{Exemplo de Entrada:}}
 \\begin{{verbatim}}
@@ -199,34 +216,18 @@ class QuestionExporter:
 {ex_output}
 \\end{{verbatim}}
 """
-                final_body += example_latex
-
-        latex_template = r"""\documentclass[a4paper,12pt]{article}
-\usepackage[utf8]{inputenc}
-\usepackage[T1]{fontenc}
-\usepackage[brazil]{babel}
-\usepackage{geometry}
-\usepackage{xcolor}
-\usepackage{enumitem}
-\usepackage{verbatim}
-\usepackage{listings}
-\usepackage{fancyhdr}
-\usepackage{graphicx}
-\geometry{top=2.5cm, bottom=2cm, left=2.5cm, right=2.5cm}
-\pagestyle{fancy}
-\fancyhf{}
-\lhead{Questão Gerada por IA}
-\rhead{\today}
-\cfoot{\thepage}
-\begin{document}
-"""
-        full_document = latex_template + final_body + r"\end{document}"
-        
-        with open(f"{filename}.tex", "w", encoding="utf-8") as f: f.write(full_document)
+                    final_body += example_latex
+
+        return final_body
+
+    @staticmethod
+    @traced("export_pdf")
+    def export_pdf_latex(generated_output, filename="questao_oficial", q_type="QT"):
+        print("   -> Compilando PDF via LaTeX...")
         
-        try:
-            subprocess.run(["pdflatex", "-interaction=nonstopmode", f"{filename}.tex"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=30)
-            if os.path.exists(f"{filename}.pdf"): print(f"[✓] PDF Compilado: {filename}.pdf")
-        finally:
-            for ext in [".aux", ".log", ".out", ".toc", ".tex"]:
-                if os.path.exists(f"{filename}{ext}"): os.remove(f"{filename}{ext}")
\ No newline at end of file
+        final_body = QuestionExporter.build_pdf_body(generated_output, q_type)
+        result = latex_compiler.get_default_compiler().compile(build_document(final_body), f"{filename}.pdf")
+        if result["ok"]:
+            modo = "preâmbulo pré-compilado" if result["with_format"] else "compilação completa"
+            print(f"[✓] PDF Compilado: {filename}.pdf ({result['seconds']:.2f}s, {modo})")
+        return result
@@ -1,7 +1,9 @@
 import os
+from telemetry import traced
 
 class QuestionReporter:
     @staticmethod
+    @traced("export_html")
     def generate_html(generated_output, score, model_name, filename="relatorio_final.html"):
         print("   -> Gerando relatório com HTML ...")
         score_color = "#4caf50" if score >= 8 else "#ff9800" if score >= 6 else "#f44336"
@@ -0,0 +1,177 @@
+import hashlib
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from telemetry import telemetry
+
+# Fixed preamble of every exported question. It is precompiled once into a .fmt
+# (mylatexformat), so each compilation skips loading babel, listings, enumitem,
+# fancyhdr... and only typesets the body.
+LATEX_PREAMBLE = r"""\documentclass[a4paper,12pt]{article}
+\usepackage[utf8]{inputenc}
+\usepackage[T1]{fontenc}
+\usepackage[brazil]{babel}
+\usepackage{geometry}
+\usepackage{xcolor}
+\usepackage{enumitem}
+\usepackage{verbatim}
+\usepackage{listings}
+\usepackage{fancyhdr}
+\usepackage{graphicx}
+\geometry{top=2.5cm, bottom=2cm, left=2.5cm, right=2.5cm}
+\pagestyle{fancy}
+\fancyhf{}
+\lhead{Questão Gerada por IA}
+\rhead{\today}
+\cfoot{\thepage}
+"""
+
+
+def build_document(body):
+    return LATEX_PREAMBLE + "\\begin{document}\n" + body + "\n\\end{document}"
+
+
+# Several question bodies as one multi-page document, each starting on a new page
+def build_combined_document(bodies):
+    return build_document("\n\\newpage\n".join(bodies))
+
+
+class LatexCompiler:
+    def __init__(self, format_dir=".cache/latex", use_format=True, timeout=30, workers=4):
+        self.format_dir = os.path.abspath(format_dir)
+        self.use_format = use_format
+        self.timeout = timeout
+        self.workers = workers
+        self.format_name = f"preamble-{hashlib.sha256(LATEX_PREAMBLE.encode('utf-8')).hexdigest()[:12]}"
+        self.format_seconds = None
+        self._format_ready = None
+        self._lock = threading.Lock()
+        self._stats = {"compilations": 0, "with_format": 0, "failures": 0, "seconds": 0.0}
+
+    # Dumps the preamble into <format_dir>/<format_name>.fmt; False when pdflatex or
+    # mylatexformat is unavailable, in which case documents compile from scratch.
+    def _ensure_format(self):
+        with self._lock:
+            if self._format_ready is not None:
+                return self._format_ready
+            fmt_path = os.path.join(self.format_dir, f"{self.format_name}.fmt")
+            if os.path.exists(fmt_path):
+                self._format_ready = True
+                return True
+
+            os.makedirs(self.format_dir, exist_ok=True)
+            with open(os.path.join(self.format_dir, f"{self.format_name}.tex"), "w", encoding="utf-8") as f:
+                f.write(build_document(""))
+
+            started = time.perf_counter()
+            try:
+                subprocess.run(
+                    ["pdflatex", "-ini", "-interaction=nonstopmode", f"-jobname={self.format_name}",
+                     "&pdflatex", "mylatexformat.ltx", f"{self.format_name}.tex"],
+                    cwd=self.format_dir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=self.timeout * 2
+                )
+            except (OSError, subprocess.TimeoutExpired) as e:
+                print(f"[!] Não foi possível pré-compilar o preâmbulo LaTeX: {e}")
+            self.format_seconds = time.perf_counter() - started
+            self._format_ready = os.path.exists(fmt_path)
+            if self._format_ready:
+                print(f"[✓] Preâmbulo LaTeX pré-compilado em {self.format_seconds:.2f}s: {fmt_path}")
+            return self._format_ready
+
+    def _run_pdflatex(self, tex_path, build_dir, job_name, with_format):
+        command = ["pdflatex", "-interaction=nonstopmode", f"-output-directory={build_dir}", f"-jobname={job_name}"]
+        env = None
+        if with_format:
+            command.append(f"-fmt={self.format_name}")
+            # trailing separator keeps the default format search path
+            env = {**os.environ, "TEXFORMATS": self.format_dir + os.pathsep}
+        subprocess.run(command + [tex_path], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                       timeout=self.timeout, env=env)
+        return os.path.join(build_dir, f"{job_name}.pdf")
+
+    # Compiles one document to <output_pdf>. Builds under a unique job name in a
+    # private directory, so parallel compilations never share .aux/.log files.
+    # Returns {"ok", "seconds", "with_format"}.
+    def compile(self, document, output_pdf):
+        output_dir = os.path.dirname(output_pdf) or "."
+        job_name = f"{os.path.splitext(os.path.basename(output_pdf))[0]}-{uuid.uuid4().hex[:8]}"
+        build_dir = tempfile.mkdtemp(prefix="latex-", dir=output_dir)
+        tex_path = os.path.join(build_dir, f"{job_name}.tex")
+        with open(tex_path, "w", encoding="utf-8") as f:
+            f.write(document)
+
+        with_format = self.use_format and self._ensure_format()
+        started = time.perf_counter()
+        with telemetry.span("pdflatex", with_format=with_format) as span:
+            try:
+                built_pdf = self._run_pdflatex(tex_path, build_dir, job_name, with_format)
+                if with_format and not os.path.exists(built_pdf):
+                    # a stale or incompatible format must not cost the PDF; it is only
+                    # turned off for later documents when the plain compile works, since
+                    # a broken document fails both ways
+                    print("[!] Falha com o preâmbulo pré-compilado; recompilando sem ele.")
+                    with_format = False
+                    built_pdf = self._run_pdflatex(tex_path, build_dir, job_name, False)
+                    if os.path.exists(built_pdf):
+                        with self._lock:
+                            self._format_ready = False
+                ok = os.path.exists(built_pdf)
+                if ok:
+                    os.replace(built_pdf, output_pdf)
+            finally:
+                shutil.rmtree(build_dir, ignore_errors=True)
+            span["with_format"] = with_format
+            span["ok"] = ok
+
+        seconds = time.perf_counter() - started
+        with self._lock:
+            self._stats["compilations"] += 1
+            self._stats["with_format"] += int(with_format)
+            self._stats["failures"] += int(not ok)
+            self._stats["seconds"] += seconds
+        return {"ok": ok, "seconds": round(seconds, 3), "with_format": with_format}
+
+    # [(document, output_pdf), ...] compiled by `workers` pdflatex processes at once
+    def compile_many(self, jobs):
+        if self.use_format:
+            self._ensure_format()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            return list(pool.map(lambda job: self.compile(*job), jobs))
+
+    def compile_combined(self, bodies, output_pdf):
+        return self.compile(build_combined_document(bodies), output_pdf)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["format_seconds"] = round(self.format_seconds, 3) if self.format_seconds is not None else None
+        stats["mean_seconds"] = round(stats["seconds"] / stats["compilations"], 3) if stats["compilations"] else None
+        stats["seconds"] = round(stats["seconds"], 3)
+        return stats
+
+
+_default_options = {}
+_default_compiler = None
+_default_lock = threading.Lock()
+
+
+def configure_default_compiler(**options):
+    global _default_compiler
+    with _default_lock:
+        _default_options.clear()
+        _default_options.update(options)
+        _default_compiler = None
+
+
+def get_default_compiler():
+    global _default_compiler
+    with _default_lock:
+        if _default_compiler is None:
+            _default_compiler = LatexCompiler(**_default_options)
+        return _default_compiler
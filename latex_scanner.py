@@ -0,0 +1,127 @@
+import re
+from functools import lru_cache
+from typing import Dict, Any
+
+# One alternation covering every construct the evaluator looks at. Tokens are short
+# prefixes (e.g. "\texttt{" rather than the whole command), so the scan never skips
+# over text that another metric still needs, such as "class X" inside \texttt{...}.
+# Every branch starts with a literal character (the \b of "class"/"def" is checked
+# with a lookbehind after it), which lets the regex engine skip ahead by first char.
+_TOKEN_RE = re.compile(
+    r"\\(?P<env_kind>begin|end)\{(?P<env>[^{}\n]*)(?P<env_close>\})?"
+    r"|\\(?P<cmd>textbf|texttt)\{"
+    r"|\\(?P<item>[Ii][Tt][Ee][Mm])"
+    r"|(?P<alternativas>[Aa][Ll][Tt][Ee][Rr][Nn][Aa][Tt][Ii][Vv][Aa][Ss]:)"
+    r"|c(?<!\wc)lass\s+(?P<class_name>\w+)"
+    r"|d(?<!\wd)ef\s+(?P<method_name>\w+)"
+    r"|(?P<attribute>self\.\w+)"
+)
+_ENV, _CMD, _ITEM, _ALTERNATIVAS, _CLASS, _METHOD, _ATTRIBUTE = 3, 4, 5, 6, 7, 8, 9
+
+# Environments counted as blocks: the first \begin opens the block and the first
+# matching \end closes it (same pairing as the old non-greedy regexes).
+_BLOCK_ENVS = ("verbatim", "enumerate")
+
+
+# Single pass over the generated text collecting environments, commands, \begin/\end
+# balance, verbatim code blocks and the class/method/attribute markers. Every
+# QuestionEvaluator metric is derived from this result. The cached result is shared,
+# so scan_text hands every caller its own copy of the lists and counts.
+@lru_cache(maxsize=64)
+def _scan(text: str) -> Dict[str, Any]:
+    counts = {"verbatim_blocks": 0, "enumerate_blocks": 0, "textbf": 0, "texttt": 0, "items": 0}
+    open_blocks = {}
+    code_blocks = []
+    environments = []
+    command_resume = {"textbf": 0, "texttt": 0}
+    begin_count = end_count = depth = max_depth = 0
+    unmatched_end = False
+    has_alternatives = False
+    classes, methods = [], []
+    has_attributes = False
+
+    for match in _TOKEN_RE.finditer(text):
+        kind = match.lastindex
+
+        if kind == _ATTRIBUTE:
+            has_attributes = True
+
+        elif kind <= _ENV:
+            env = match.group("env") if match.group("env_close") else None
+            if match.group("env_kind") == "begin":
+                begin_count += 1
+                depth += 1
+                max_depth = max(max_depth, depth)
+                if env:
+                    environments.append(env)
+                if env in _BLOCK_ENVS and env not in open_blocks:
+                    open_blocks[env] = match.end()
+            else:
+                end_count += 1
+                depth -= 1
+                if depth < 0:
+                    unmatched_end = True
+                    depth = 0
+                if env in open_blocks:
+                    start = open_blocks.pop(env)
+                    counts[f"{env}_blocks"] += 1
+                    if env == "verbatim":
+                        code_blocks.append(text[start:match.start()])
+
+        elif kind == _CMD:
+            # \textbf{.*?} needs a closing brace somewhere after the opening one;
+            # once none is left, later occurrences are skipped without searching again
+            name = match.group("cmd")
+            if match.start() >= command_resume[name]:
+                close = text.find("}", match.end())
+                if close != -1:
+                    counts[name] += 1
+                    command_resume[name] = close + 1
+                else:
+                    command_resume[name] = len(text) + 1
+
+        elif kind == _ITEM:
+            has_alternatives = True
+            if match.group("item") == "item":
+                counts["items"] += 1
+
+        elif kind == _ALTERNATIVAS:
+            has_alternatives = True
+
+        elif kind == _CLASS:
+            classes.append(match.group("class_name"))
+
+        elif kind == _METHOD:
+            methods.append(match.group("method_name"))
+
+    return {
+        "counts": counts,
+        "environments": environments,
+        "begin_count": begin_count,
+        "end_count": end_count,
+        "max_depth": max_depth,
+        "unmatched_end": unmatched_end,
+        "code_blocks": code_blocks,
+        "classes": classes,
+        "methods": methods,
+        "has_attributes": has_attributes,
+        "has_alternatives": has_alternatives,
+        "length": len(text),
+        "lines": text.count("\n") + 1
+    }
+
+
+def scan_text(text: str) -> Dict[str, Any]:
+    scan = _scan(text)
+    return {
+        **scan,
+        "counts": dict(scan["counts"]),
+        "environments": list(scan["environments"]),
+        "code_blocks": list(scan["code_blocks"]),
+        "classes": list(scan["classes"]),
+        "methods": list(scan["methods"])
+    }
+
+
+def clear_cache():
+    _scan.cache_clear()
@@ -1,20 +1,36 @@
-from groq import Groq
-from sentence_transformers import SentenceTransformer, util
+import time
+_IMPORT_STARTED = time.perf_counter()
+
 from dotenv import load_dotenv
+import argparse
 import os
+import random
 import re
-import time
+import sys
+import threading
+import uuid
 import json
 import yaml
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime
 from evaluation import QuestionEvaluator
-from exporter import QuestionExporter 
-from html_view import QuestionReporter
+from export_pipeline import run_export_pipeline
+import model_registry
+import sandbox
+import latex_compiler
+import artifact_store
+import vpl_validation
+import rate_limiter
+import telemetry as telemetry_module
+from telemetry import telemetry
+from embedding_cache import cosine_similarity
+from response_cache import CacheMiss
+from stream_monitor import StreamMonitor, GenerationAborted, GenerationCancelled
+from token_budget import compact_question, dedupe_sentences, estimate_tokens
 
 load_dotenv()
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-model_embed = SentenceTransformer("paraphrase-multilingual-MiniLM-L12-v2")
 evaluator = QuestionEvaluator()
+IMPORT_SECONDS = time.perf_counter() - _IMPORT_STARTED
 
 def load_config(path="models&question_config.yaml"):
     with open(path, 'r', encoding='utf-8') as f:
@@ -25,7 +41,9 @@ def detect_question_type(text):
         return "QM"
     return "QT"
 
-def generate_prompt(question_text, question_type):
+# compact=True strips LaTeX formatting noise from the question and repeated sentences
+# from the instruction (see token_budget.py)
+def generate_prompt(question_text, question_type, compact=False):
     common_instruction = (
         "É OBRIGATÓRIO incluir ao final da resposta o bloco [[def:...]] contendo o código Python, porém este bloco não deve sair no PDF final."
         "que gera as listas inp_list e out_list para validação no VPL. Não esqueça dos colchetes duplos."
@@ -33,119 +51,602 @@ def generate_prompt(question_text, question_type):
         "Use identação estrita de 4 espaços (NUNCA use tabs). "
         "Certifique-se que o código Python dentro de [[def:]] esteja alinhado à esquerda (sem indentação inicial relativa ao bloco)."
     )
+    if compact:
+        question_text = compact_question(question_text)
+        common_instruction = dedupe_sentences(common_instruction)
     if question_type == "QT":
         prompt = f"Reescreva do zero uma questão de POO, mantendo o formato LaTeX, mas usando novos nomes de classe, atributos, métodos, adicionando novos desafios e alterando o tema ficticio da questão. Não gere uma questão parametrizada, gere uma questão nova. Mantenha os exemplos de entrada/saída e o bloco [[def:...]].:\n\n{question_text} {common_instruction}"
     if question_type == "QM":
         prompt = f"Gere uma nova questão de múltipla escolha no mesmo formato que a seguinte, inclua 5 alternativas usando \\begin{{enumerate}}, mas NÃO inclua o gabarito no texto. NÃO gere exemplos de entrada e saída no texto. Use o formato LaTeX com \\begin{{verbatim}} para o código da questão e \\begin{{enumerate}} para alternativas:\n\nQuestão:\n{question_text}{common_instruction}"
     return prompt
 
-def generate_with_model(model_name, prompt, temperature, max_tokens):
-    response = client.chat.completions.create(
-        model=model_name,
-        messages=[{"role": "user", "content": prompt}],
-        max_tokens=max_tokens,
-        temperature=temperature,
-    )
-    return response.choices[0].message.content
+# Consumes a streamed completion, running the StreamMonitor checks on every chunk and
+# closing the stream as soon as the output is doomed or `cancel` is set, so its
+# remaining tokens are never generated.
+def stream_completion(stream, request, streaming, span, cancel=None):
+    options = {k: v for k, v in streaming.items() if k != 'enabled'}
+    monitor = StreamMonitor(request["max_tokens"], **options)
+    finish_reason = usage = None
+    try:
+        for chunk in stream:
+            if chunk.choices:
+                monitor.feed(chunk.choices[0].delta.content)
+                finish_reason = chunk.choices[0].finish_reason or finish_reason
+            usage = chunk.usage or (chunk.x_groq.usage if chunk.x_groq else None) or usage
+
+            reason = monitor.abort_reason()
+            if reason:
+                span["aborted"] = reason
+                raise GenerationAborted(reason)
+            if cancel is not None and cancel.is_set():
+                span["cancelled"] = True
+                raise GenerationCancelled("geração cancelada")
+    finally:
+        stream.close()
+        span.update(monitor.summary())
+
+    if usage:
+        span["prompt_tokens"] = usage.prompt_tokens
+        span["completion_tokens"] = usage.completion_tokens
+    span["finish_reason"] = finish_reason
+    return monitor.text
+
+# token_budget/question_type: when given, the usage of every completed call is
+# recorded so later runs can size max_tokens from observed outputs. usage, when
+# given, is filled with the seconds, tokens, finish_reason and cache_hit of the call.
+# Once `cancel` (a threading.Event) is set the request is not sent, or its stream is
+# closed at the next chunk; a non-streamed request already sent runs to the end.
+def generate_with_model(model_name, prompt, temperature, max_tokens, timeout=None, seed=None, response_cache=None, replay=False, sample=0, streaming=None, token_budget=None, question_type=None, usage=None, cancel=None):
+    started = time.perf_counter()
+    with telemetry.span("generation", model=model_name, attempt=sample) as span:
+        try:
+            if response_cache:
+                key = response_cache.make_key(model_name, prompt, temperature, seed, sample)
+                cached = response_cache.get(key)
+                span["cache_hit"] = cached is not None
+                if cached is not None:
+                    return cached
+                if replay:
+                    raise CacheMiss(f"resposta de {model_name} não encontrada no cache (modo replay)")
+
+            client = model_registry.get_groq_client()
+            request = dict(
+                model=model_name,
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=max_tokens,
+                temperature=temperature,
+                timeout=timeout,
+            )
+            if seed is not None:
+                request["seed"] = seed
+            streamed = bool(streaming and streaming.get('enabled', True))
+            # the token quota is reserved for the prompt plus the whole max_tokens and
+            # the unused part is given back once the usage is known
+            limiter = rate_limiter.get_default_limiter()
+            reserved = estimate_tokens(prompt) + max_tokens
 
-def validate_output(original, generated):
-    emb1 = model_embed.encode(original, convert_to_tensor=True)
-    emb2 = model_embed.encode(generated, convert_to_tensor=True)
-    similarity = util.cos_sim(emb1, emb2).item()
-    structure = bool(re.search(r"Classe|class", generated, re.IGNORECASE)) and \
-                bool(re.search(r"atribut", generated, re.IGNORECASE))
+            def send():
+                if cancel is not None and cancel.is_set():
+                    span["cancelled"] = True
+                    raise GenerationCancelled("geração cancelada antes do envio")
+                return client.chat.completions.with_raw_response.create(stream=streamed, **request)
 
-    return similarity, structure
+            with limiter.request(model_name, send, reserved, cancel) as raw:
+                if streamed:
+                    content = stream_completion(raw.parse(), request, streaming, span, cancel)
+                else:
+                    response = raw.parse()
+                    content = response.choices[0].message.content
+
+                    if response.usage:
+                        span["prompt_tokens"] = response.usage.prompt_tokens
+                        span["completion_tokens"] = response.usage.completion_tokens
+                    span["finish_reason"] = response.choices[0].finish_reason
+            if span.get("completion_tokens"):
+                limiter.settle(model_name, reserved, (span.get("prompt_tokens") or 0) + span["completion_tokens"])
+
+            if token_budget and span.get("completion_tokens"):
+                token_budget.record(model_name, question_type, prompt, span.get("prompt_tokens"),
+                                    span["completion_tokens"], span.get("finish_reason"))
+            if response_cache and content:
+                response_cache.put(key, model_name, prompt, temperature, max_tokens, seed, sample, content)
+            return content
+        finally:
+            if usage is not None:
+                usage.update({name: span[name] for name in ("prompt_tokens", "completion_tokens", "finish_reason") if name in span})
+                usage["cache_hit"] = span.get("cache_hit", False)
+                usage["seconds"] = round(time.perf_counter() - started, 3)
+
+# timeout and max_tokens can be a single value or a mapping {model_key: value}
+def get_model_option(value, model_name_key):
+    if isinstance(value, dict):
+        return value.get(model_name_key, value.get("default"))
+    return value
+
+# Yields, as models finish, the list of (model_key, output, error, usage) of every model
+# that finished since the previous yield: one entry while the caller keeps up, more
+# when responses arrived while it was evaluating the last ones. Closing the generator
+# early (tournament mode) drops the requests that have not started, keeps queued and
+# throttled ones from being sent and closes the streams still in flight at their next
+# chunk; it does not wait for any of them.
+def generate_concurrently(models_dict, prompt, temperature, max_tokens, timeouts=None, max_in_flight=None, **generation_options):
+    max_workers = max_in_flight or len(models_dict) or 1
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    cancel = threading.Event()
+    try:
+        futures = {}
+        for model_name_key, model_id in models_dict.items():
+            timeout = get_model_option(timeouts, model_name_key)
+            tokens = get_model_option(max_tokens, model_name_key)
+            usage = {}
+            future = pool.submit(generate_with_model, model_id, prompt, temperature, tokens, timeout, usage=usage, cancel=cancel, **generation_options)
+            futures[future] = (model_name_key, usage)
+        
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            finished = []
+            for future in [future for future in futures if future in done]:
+                model_name_key, usage = futures[future]
+                try:
+                    finished.append((model_name_key, future.result(), None, usage))
+                except Exception as e:
+                    finished.append((model_name_key, None, e, usage))
+            yield finished
+    finally:
+        cancel.set()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def check_structure(generated):
+    return bool(re.search(r"Classe|class", generated, re.IGNORECASE)) and \
+           bool(re.search(r"atribut", generated, re.IGNORECASE))
+
+# Similarity of every candidate against the original using one batched encode() for
+# whatever is not already in the embedding cache.
+def compute_similarities(original, outputs, embedding_cache=None):
+    with telemetry.span("embedding", texts=len(outputs) + 1):
+        embedding_cache = embedding_cache or model_registry.get_embedding_cache()
+        vectors = embedding_cache.encode([original] + list(outputs))
+        return [cosine_similarity(vectors[0], vector) for vector in vectors[1:]]
+
+def validate_output(original, generated, embedding_cache=None):
+    similarity = compute_similarities(original, [generated], embedding_cache)[0]
+    return similarity, check_structure(generated)
 
 def save_results(results, filename="resultados_geracao.json"):
     with open(filename, 'w', encoding='utf-8') as f:
         json.dump(results, f, indent=2, ensure_ascii=False)
     print(f"\n[✓] Results saved to: {filename}")
 
-def main():
-    config = load_config()
+# Returns (ResultsLog or None, write_json) from cache.results_log
+def get_results_log(config):
+    options = dict(config.get('cache', {}).get('results_log', {}))
+    enabled = options.pop('enabled', False)
+    write_json = options.pop('write_json', not enabled)
+    return (model_registry.get_results_log(**options) if enabled else None), write_json
+
+# Appends every candidate evaluated for one question (all attempts, also when none
+# won) to the results log and, when write_json is on (or the log is disabled), also
+# writes the full resultados_geracao.json of the winning attempt.
+def record_results(original_question, outcome, config, output_dir=None):
+    results_log, write_json = get_results_log(config)
+    if results_log and outcome["candidates"]:
+        run = results_log.append_run(original_question, outcome["question_type"], outcome["candidates"],
+                                     outcome["winner"], job=output_dir, max_tokens=outcome["tokens"]["max_tokens"])
+        print(f"\n[✓] {len(outcome['candidates'])} candidatos registrados no log de resultados (execução {run})")
+    if write_json and outcome["results"]:
+        save_results(build_final_results(original_question, outcome["results"], outcome["tokens"]),
+                     os.path.join(output_dir or ".", "resultados_geracao.json"))
+
+def export_assets(best_result, question_type, output_dir=None, skip=()):
+    return run_export_pipeline(best_result, question_type, output_dir, skip=skip)
+
+def build_final_results(original_question, all_evaluations, token_report=None):
+    final = {
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "original_question": original_question,
+        "models_evaluated": len(all_evaluations),
+        "results": [
+            {"model": r["name"], "similarity": r["similarity"], "valid": r["valid"], "output": r["output"]}
+            for r in all_evaluations
+        ]
+    }
+    if token_report:
+        final["tokens"] = token_report
+    return final
+
+# Returns (TokenBudget or None, compact_prompt) from llm_params.token_budget
+def get_token_budget(config):
+    options = dict(config['llm_params'].get('token_budget') or {})
+    enabled = options.pop('enabled', False)
+    compact = options.pop('compact_prompt', enabled)
+    return (model_registry.get_token_budget(**options) if enabled else None), compact
+
+# Per-model max_tokens for this question type, plus the estimated prompt sizes with
+# and without compaction.
+def plan_tokens(models_dict, original_question, question_type, prompt, ceiling, token_budget):
+    full_prompt_tokens = estimate_tokens(generate_prompt(original_question, question_type))
+    plan = {
+        "prompt_tokens_full": full_prompt_tokens,
+        "prompt_tokens_sent": estimate_tokens(prompt),
+        "max_tokens_ceiling": ceiling,
+        "prompt_tokens": {},
+        "max_tokens": {},
+        "expected_tokens": {}
+    }
+    for model_name_key, model_id in models_dict.items():
+        estimate = token_budget.estimate(model_id, question_type, ceiling) if token_budget else {"max_tokens": ceiling, "expected_tokens": None}
+        # per-model prompt size, calibrated on the usage Groq reported for that model
+        plan["prompt_tokens"][model_name_key] = token_budget.estimate_prompt_tokens(model_id, prompt) if token_budget else plan["prompt_tokens_sent"]
+        plan["max_tokens"][model_name_key] = estimate["max_tokens"]
+        plan["expected_tokens"][model_name_key] = estimate["expected_tokens"]
+    return plan
+
+def print_token_report(report):
+    print(f"\n{'─' * 80}")
+    print("ORÇAMENTO DE TOKENS")
+    print(f"{'─' * 80}")
+    print(f"  Prompt: ~{report['prompt_tokens_sent']} tokens (sem compactação: ~{report['prompt_tokens_full']})")
+    print(f"  Tokens de prompt economizados: ~{report['prompt_tokens_saved']} em {report['requests']} requisições")
+    for model_name_key, tokens in report["max_tokens"].items():
+        expected = report["expected_tokens"][model_name_key]
+        print(f"  {model_name_key:<10} prompt ~{report['prompt_tokens'][model_name_key]:>5}  max_tokens {tokens:>5} / {report['max_tokens_ceiling']}"
+              f"{f'  (saída típica ~{expected})' if expected else ''}")
+    print(f"  Tempo de geração e avaliação: {report['generation_seconds']}s | tempo total: {report['run_seconds']}s")
+
+# Returns (cache, replay). Replay serves every completion from the cache and never
+# calls Groq, so runs can be repeated offline.
+def get_response_cache(config):
+    options = dict(config.get('cache', {}).get('responses', {}))
+    enabled = options.pop('enabled', False)
+    replay = options.pop('replay', False)
+    if not (enabled or replay):
+        return None, False
+    return model_registry.get_response_cache(**options), replay
+
+# ModelRouter from llm_params.routing, or None when routing is disabled (every model
+# is called on every question)
+def get_model_router(config):
+    options = dict(config['llm_params'].get('routing') or {})
+    if not options.pop('enabled', False):
+        return None
+    return model_registry.get_model_router(**options)
+
+# Feeds one call back to the router: reward score_geral/10 for a valid output, 0 for
+# an invalid or failed one; cache hits do not count towards latency.
+def record_routing(router, question_type, model_name_key, usage, result=None):
+    if router is None:
+        return
+    valid = bool(result and result["valid"])
+    reward = result["evaluation"]["score_geral"] / 10 if valid else 0.0
+    seconds = None if usage.get("cache_hit") else usage.get("seconds")
+    router.record(model_name_key, question_type, reward, seconds, failed=result is None, valid=valid)
+
+# Attaches the near-duplicate bank (cache.dedup) to the evaluator and returns whether
+# near-duplicates are rejected; with dedup disabled only the original is compared.
+def configure_dedup(config, embedding_cache=None):
+    options = dict(config.get('cache', {}).get('dedup', {}))
+    enabled = options.pop('enabled', False)
+    reject = options.pop('reject', False)
+    evaluator.duplicate_index = model_registry.get_duplicate_index(embedding_cache=embedding_cache, **options) if enabled else None
+    return enabled and reject
+
+# Exponential backoff with jitter between attempts: base * 2^(attempt-1), capped, scaled by [0.5, 1.5)
+def backoff_delay(attempt, base_seconds=2.0, max_seconds=30.0):
+    return min(max_seconds, base_seconds * 2 ** (attempt - 1)) * random.uniform(0.5, 1.5)
+
+# most_similar / least_similar rank by similarity to the original; best_score ranks
+# by score_geral, with similarity breaking ties (scoring.select_winners does the same)
+def pick_best(candidates, pick_mode):
+    valid_results = [r for r in candidates if r["valid"]]
+    if not valid_results:
+        return None
+    if pick_mode == "best_score":
+        valid_results.sort(key=lambda x: (x["evaluation"]["score_geral"], x["similarity"]), reverse=True)
+    else:
+        valid_results.sort(key=lambda x: x["similarity"], reverse=(pick_mode == "most_similar"))
+    return valid_results[0]
+
+def clears_quality_bar(result, tournament):
+    if not result["valid"]:
+        return False
+    if result["evaluation"]["score_geral"] < tournament.get('min_score', 0):
+        return False
+    min_similarity = tournament.get('min_similarity')
+    return min_similarity is None or result["similarity"] >= min_similarity
+
+# Evaluates the (model_name_key, output) pairs that arrived together with a single
+# evaluate_many call, so their spaCy parses are batched.
+def evaluate_candidates(original_question, outputs, reject_duplicates=False):
+    print(f"Avaliando {len(outputs)} candidato(s) com spaCy...")
+    evaluations = evaluator.evaluate_many(original_question, [output for _, output in outputs])
     
-    original_question = config['original_question']
+    results = []
+    for (model_name_key, output), evaluation in zip(outputs, evaluations):
+        is_structure_ok = check_structure(output)
+        if evaluation["metricas"].get("duplicata_proxima"):
+            print(f"[!] {model_name_key}: quase duplicata de uma questão já aceita "
+                  f"(similaridade {evaluation['metricas']['similaridade_banco']})")
+            telemetry.count("near_duplicates", model=model_name_key)
+            if reject_duplicates:
+                is_structure_ok = False
+        results.append({
+            "name": model_name_key,
+            "output": output,
+            "similarity": None,
+            "valid": is_structure_ok,
+            "evaluation": evaluation
+        })
+    return results
+
+# Runs the generation tournament for one question. When export is False the caller
+# is responsible for calling export_assets (used by batch mode to overlap exports).
+# embedding_cache overrides the configured one (the service passes a micro-batching wrapper).
+#
+# In tournament mode (experiment.tournament.enabled) candidates are scored as they
+# arrive and the attempt stops as soon as one clears the quality bar. Only models
+# that failed or produced invalid output are retried in the next attempt.
+#
+# The outcome's "results" are the candidates the winner was picked from (empty when
+# no attempt won); "candidates" holds every candidate evaluated in any attempt.
+def run_question(original_question, config, output_dir=None, export=True, embedding_cache=None):
     models_dict = config['llm_params']['models']
     temp = config['llm_params']['temperature']
     max_t = config['llm_params']['max_tokens']
+    timeouts = config['llm_params'].get('timeout')
+    max_in_flight = config['llm_params'].get('max_in_flight')
     pick_mode = config['experiment']['pick_mode']
     attempts_max = config['experiment']['attempts']
+    tournament = config['experiment'].get('tournament') or {}
+    tournament_on = tournament.get('enabled', False)
+    backoff = config['experiment'].get('backoff') or {}
+
+    streaming = config['llm_params'].get('streaming')
+    seed = config['experiment'].get('seed')
+    embedding_cache = embedding_cache or model_registry.get_embedding_cache(**config.get('cache', {}).get('embeddings', {}))
+    response_cache, replay = get_response_cache(config)
+    token_budget, compact_prompt = get_token_budget(config)
+    reject_duplicates = configure_dedup(config, embedding_cache)
+    router = get_model_router(config)
 
-    print("=" * 80)
-    print("SISTEMA DE GERAÇÃO E AVALIAÇÃO DE QUESTÕES DE POO")
-    print("=" * 80)
-    
     question_type = detect_question_type(original_question)
     print(f"\n[DEBUG] Tipo de questão detectado: {question_type}")
-    prompt = generate_prompt(original_question, question_type)
+    prompt = generate_prompt(original_question, question_type, compact=compact_prompt)
+    token_report = plan_tokens(models_dict, original_question, question_type, prompt, max_t, token_budget)
+    run_started = time.perf_counter()
+    generation_seconds = 0.0
+    requests_sent = 0
 
     all_evaluations = []
+    candidates = []
+    best_result = None
+    pending_models = dict(models_dict)
+    called_models = set()
+    decision = router.route(models_dict, question_type, job=output_dir) if router else None
+    if decision:
+        pending_models = {k: models_dict[k] for k in decision["selected"]}
+        print(f"[✓] Roteamento: {decision['reason']}")
 
     for attempt in range(attempts_max):
+        if attempt > 0:
+            delay = backoff_delay(attempt, **backoff)
+            print(f"\nAguardando {delay:.1f}s antes da próxima tentativa...")
+            time.sleep(delay)
+
         try:
             results = []
             print(f"\n{'─' * 80}")
             print(f"TENTATIVA {attempt + 1}")
             print(f"{'─' * 80}")
 
-            for model_name_key, model_id in models_dict.items():
-                print(f"\nGerando com {model_name_key}...")
-                output = generate_with_model(model_id, prompt, temp, max_t)
-                sim, is_structure_ok = validate_output(original_question, output)
-                
-                print(f"Avaliando com spaCy...")
-                evaluation = evaluator.evaluate_question(original_question, output)
-                
-                results.append({
-                    "name": model_name_key,
-                    "output": output,
-                    "similarity": sim,
-                    "valid": is_structure_ok,
-                    "evaluation": evaluation
-                })
-
-            valid_results = [r for r in results if r["valid"]]
-
-            if not valid_results:
+            print(f"\nGerando com {', '.join(pending_models)} (até {max_in_flight or len(pending_models)} em paralelo)...")
+            stream = generate_concurrently(
+                pending_models, prompt, temp, token_report["max_tokens"], timeouts, max_in_flight,
+                seed=seed, response_cache=response_cache, replay=replay, sample=attempt, streaming=streaming,
+                token_budget=token_budget, question_type=question_type)
+            requests_sent += len(pending_models)
+            called_models.update(pending_models)
+            attempt_started = time.perf_counter()
+            try:
+                for finished in stream:
+                    received = []
+                    for model_name_key, output, error, usage in finished:
+                        if error:
+                            record_routing(router, question_type, model_name_key, usage)
+                        if isinstance(error, GenerationAborted):
+                            print(f"\n[✗] Geração de {model_name_key} interrompida: {error}")
+                            telemetry.count("aborted_generations", model=model_name_key)
+                            continue
+                        if error:
+                            print(f"\n[✗] Falha em {model_name_key}: {error}")
+                            telemetry.count("model_failures", model=model_name_key)
+                            continue
+                        print(f"\n[✓] Resposta recebida de {model_name_key}")
+                        received.append((model_name_key, output, usage))
+                    if not received:
+                        continue
+
+                    # evaluated as soon as they arrive, in one batch when several did
+                    evaluated = evaluate_candidates(
+                        original_question, [(key, output) for key, output, _ in received], reject_duplicates)
+                    for (model_name_key, _, usage), result in zip(received, evaluated):
+                        result["generation"] = {**usage, "attempt": attempt + 1}
+                        record_routing(router, question_type, model_name_key, usage, result)
+                        results.append(result)
+
+                    if tournament_on:
+                        similarities = compute_similarities(original_question, [r["output"] for r in evaluated], embedding_cache)
+                        for result, sim in zip(evaluated, similarities):
+                            result["similarity"] = sim
+                        best_result = next((r for r in evaluated if clears_quality_bar(r, tournament)), None)
+                        if best_result:
+                            print(f"[✓] {best_result['name']} atingiu o critério de qualidade. Cancelando as demais requisições.")
+                            break
+            finally:
+                stream.close()
+                generation_seconds += time.perf_counter() - attempt_started
+
+            if not tournament_on:
+                similarities = compute_similarities(original_question, [r["output"] for r in results], embedding_cache)
+                for result, sim in zip(results, similarities):
+                    result["similarity"] = sim
+            candidates.extend(results)
+
+            if tournament_on:
+                best_result = next((r for r in results if clears_quality_bar(r, tournament)), None)
+                if not best_result:
+                    valid_names = {r["name"] for r in results if r["valid"]}
+                    pending_models = {k: v for k, v in pending_models.items() if k not in valid_names}
+                    if decision:
+                        pending_models.update({k: models_dict[k] for k in router.fallback(decision, called_models)})
+                    if pending_models and attempt < attempts_max - 1:
+                        for model_name_key in pending_models:
+                            telemetry.count("retries", model=model_name_key)
+                        print(f"\n⚠ Nenhum candidato atingiu o critério. Repetindo apenas: {', '.join(pending_models)}")
+                        continue
+                    best_result = pick_best(candidates, pick_mode)
+            else:
+                best_result = pick_best(results, pick_mode)
+
+            if not best_result:
                 print("\n⚠ Nenhum resultado válido nesta tentativa. Tentando novamente...")
+                telemetry.count("retries", model="*")
+                fallback = router.fallback(decision, called_models) if decision else []
+                if fallback:
+                    pending_models = {k: models_dict[k] for k in fallback}
+                    print(f"[✓] Roteamento: recorrendo a {', '.join(fallback)}")
             else:
-                valid_results.sort(key=lambda x: x["similarity"], reverse=(pick_mode == "most_similar"))
-                best_result = valid_results[0]
-                chosen = best_result["output"]
-                
                 print(f"\n{'=' * 80}")
                 print(f"VENCEDOR: {best_result['name'].upper()}")
                 print(f"{'=' * 80}")
 
-                exporter = QuestionExporter()
-                reporter = QuestionReporter()
-                
-                exporter.export_mctest_json(chosen, best_result["name"], question_type)
-                exporter.export_vpl_cases(chosen, question_type)
-                exporter.export_class_diagram(chosen)
-                exporter.export_pdf_latex(chosen, "questao_oficial", q_type=question_type)
-                
-                score_final = best_result["evaluation"]["score_geral"]
-                reporter.generate_html(chosen, score_final, best_result["name"])
-                all_evaluations = results
+                if evaluator.duplicate_index is not None:
+                    evaluator.duplicate_index.add(best_result["output"], model=best_result["name"], job=output_dir)
+                if export:
+                    export_assets(best_result, question_type, output_dir)
+                all_evaluations = candidates if tournament_on else results
                 break
 
+        # Groq errors are handled per model above (and retried by the rate limiter), so
+        # what gets here comes from evaluation, similarity or the export
         except Exception as e:
-            print(f"\n Erro na API do Groq (Tentativa {attempt + 1}): {e}")
-            time.sleep(5)
-
-    if all_evaluations:
-        final_results = {
-            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "original_question": original_question,
-            "models_evaluated": len(all_evaluations),
-            "results": [
-                {"model": r["name"], "similarity": r["similarity"], "valid": r["valid"], "output": r["output"]}
-                for r in all_evaluations
-            ]
-        }
-        save_results(final_results)
+            print(f"\n[✗] Erro na tentativa {attempt + 1} (avaliação, similaridade ou exportação): {type(e).__name__}: {e}")
+
+    if decision:
+        router.finish(decision, called_models, best_result["name"] if best_result else None)
+
+    token_report.update({
+        "requests": requests_sent,
+        "prompt_tokens_saved": (token_report["prompt_tokens_full"] - token_report["prompt_tokens_sent"]) * requests_sent,
+        "generation_seconds": round(generation_seconds, 2),
+        "run_seconds": round(time.perf_counter() - run_started, 2)
+    })
+    print_token_report(token_report)
+
+    return {
+        "question_type": question_type,
+        "winner": best_result,
+        "results": all_evaluations,
+        "candidates": candidates,
+        "tokens": token_report
+    }
+
+# Measures module import and cold load of each shared model, appending one JSON line
+# per run so startup regressions can be tracked over time.
+def profile_startup(filename="startup_profile.jsonl"):
+    timings = {"import_main": IMPORT_SECONDS}
+    loaders = {
+        "groq_client": model_registry.get_groq_client,
+        "embedding_model": model_registry.get_embedding_model,
+        "spacy_model": model_registry.get_spacy_model,
+    }
+    for name, loader in loaders.items():
+        started = time.perf_counter()
+        try:
+            loader()
+            timings[name] = time.perf_counter() - started
+        except Exception as e:
+            print(f"[✗] Falha ao carregar {name}: {e}")
+            timings[name] = None
+
+    print(f"\n{'─' * 80}")
+    print("PERFIL DE INICIALIZAÇÃO")
+    print(f"{'─' * 80}")
+    for name, seconds in timings.items():
+        print(f"  {name:<20} {'falhou' if seconds is None else f'{seconds:.3f}s'}")
+    total = sum(t for t in timings.values() if t is not None)
+    print(f"  {'total':<20} {total:.3f}s")
+
+    record = {
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "seconds": {name: round(t, 4) if t is not None else None for name, t in timings.items()},
+        "total_seconds": round(total, 4)
+    }
+    with open(filename, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record) + "\n")
+    print(f"\n[✓] Perfil salvo em: {filename}")
+    return record
+
+# Every run writes to its own directory (<base_dir>/<job_id>), so several pipelines
+# can run side by side on the same machine without clobbering each other's files.
+def new_job_id():
+    return f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+def create_run_dir(base_dir, job_id=None):
+    run_dir = os.path.join(base_dir, job_id or new_job_id())
+    os.makedirs(run_dir, exist_ok=True)
+    return run_dir
+
+def main():
+    parser = argparse.ArgumentParser(description="Geração e avaliação de questões de POO")
+    parser.add_argument("--batch", help="diretório (.tex/.txt) ou arquivo .jsonl com questões de origem")
+    parser.add_argument("--output-dir", help="diretório base das execuções (padrão: output.base_dir do config)")
+    parser.add_argument("--job-id", help="identificador da execução (padrão: data/hora + sufixo aleatório)")
+    parser.add_argument("--profile-startup", action="store_true", help="mede o tempo de import e de carga dos modelos e sai")
+    parser.add_argument("--serve", action="store_true", help="inicia o serviço HTTP de geração (fila de jobs com modelos carregados)")
+    parser.add_argument("--replay", action="store_true", help="usa apenas respostas já salvas no cache, sem chamar o Groq")
+    args = parser.parse_args()
+
+    if args.profile_startup:
+        profile_startup()
+        return
+
+    config = load_config()
+    sandbox.configure_default_pool(**config.get('sandbox', {}))
+    vpl_validation.configure(**config.get('vpl', {}))
+    evaluator.weights = config.get('scoring', {}).get('weights')
+    model_registry.configure_groq_client(**config['llm_params'].get('http', {}))
+    rate_limiter.configure_default_limiter(models=config['llm_params']['models'], **config['llm_params'].get('rate_limit', {}))
+    artifact_store.configure_default_store(**config.get('cache', {}).get('artifacts', {}))
+    latex_compiler.configure_default_compiler(**{k: v for k, v in config.get('latex', {}).items() if k != 'combined_pdf'})
+    if args.replay:
+        config.setdefault('cache', {}).setdefault('responses', {})['replay'] = True
+
+    base_dir = args.output_dir or config.get('output', {}).get('base_dir', "execucoes")
+    run_dir = create_run_dir(base_dir, args.job_id)
+    # spans of every run go to one file next to the run directories unless set explicitly
+    telemetry_options = dict(config.get('telemetry') or {})
+    telemetry_options['jsonl_path'] = telemetry_options.get('jsonl_path') or os.path.join(base_dir, "telemetry.jsonl")
+    telemetry_module.configure(**telemetry_options)
+
+    print("=" * 80)
+    print("SISTEMA DE GERAÇÃO E AVALIAÇÃO DE QUESTÕES DE POO")
+    print("=" * 80)
+    print(f"\n[DEBUG] Diretório da execução: {run_dir}")
+
+    if args.serve:
+        from service import serve
+        serve(config, run_dir, pipeline=sys.modules[__name__])
+        return
+
+    if args.batch:
+        from batch import run_batch
+        run_batch(args.batch, config, run_dir, pipeline=sys.modules[__name__])
+        return
+    
+    original_question = config['original_question']
+    outcome = run_question(original_question, config, run_dir)
+    record_results(original_question, outcome, config, run_dir)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,124 @@
+import os
+import threading
+import time
+
+EMBEDDING_MODEL_NAME = "paraphrase-multilingual-MiniLM-L12-v2"
+SPACY_MODEL_NAME = "pt_core_news_md"
+
+# Heavy models are only imported and loaded on first use, and every caller
+# (main, evaluators, batch, tools) shares the same instance.
+_instances = {}
+_locks = {}
+_registry_lock = threading.Lock()
+load_times = {}
+
+
+def _get_or_load(key, loader):
+    if key in _instances:
+        return _instances[key]
+
+    with _registry_lock:
+        lock = _locks.setdefault(key, threading.Lock())
+
+    with lock:
+        if key not in _instances:
+            started = time.perf_counter()
+            _instances[key] = loader()
+            load_times[key] = time.perf_counter() - started
+    return _instances[key]
+
+
+def is_loaded(key):
+    return key in _instances
+
+
+# Stores are cached per path and options, so a caller asking for other settings on
+# the same file gets its own instance instead of silently sharing the first one
+def _store_key(kind, path, **options):
+    return f"{kind}:{path}:" + ",".join(f"{name}={options[name]!r}" for name in sorted(options))
+
+
+_groq_options = {}
+
+
+# Connection pool of the shared Groq client (llm_params.http); applies to the client
+# loaded after this call. Retries are left to rate_limiter, so the SDK's are disabled.
+def configure_groq_client(max_connections=20, max_keepalive_connections=10, keepalive_expiry=30.0):
+    _groq_options.update(max_connections=max_connections, max_keepalive_connections=max_keepalive_connections,
+                         keepalive_expiry=keepalive_expiry)
+
+
+def get_groq_client():
+    def loader():
+        import httpx
+        from groq import Groq, DefaultHttpxClient
+        limits = httpx.Limits(
+            max_connections=_groq_options.get("max_connections", 20),
+            max_keepalive_connections=_groq_options.get("max_keepalive_connections", 10),
+            keepalive_expiry=_groq_options.get("keepalive_expiry", 30.0)
+        )
+        return Groq(api_key=os.getenv("GROQ_API_KEY"), http_client=DefaultHttpxClient(limits=limits), max_retries=0)
+    return _get_or_load("groq", loader)
+
+
+def get_embedding_model(name=EMBEDDING_MODEL_NAME):
+    def loader():
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(name)
+    return _get_or_load(f"sentence_transformers:{name}", loader)
+
+
+# Raises OSError when the spaCy model is not installed
+def get_spacy_model(name=SPACY_MODEL_NAME):
+    def loader():
+        import spacy
+        nlp = spacy.load(name)
+        print("[✓] Modelo spaCy carregado com sucesso")
+        return nlp
+    return _get_or_load(f"spacy:{name}", loader)
+
+
+def get_embedding_cache(path=".cache/embeddings.sqlite", max_entries=20000, model_name=EMBEDDING_MODEL_NAME):
+    def loader():
+        from embedding_cache import EmbeddingCache
+        return EmbeddingCache(path, model_name, max_entries)
+    return _get_or_load(_store_key("embedding_cache", path, max_entries=max_entries, model_name=model_name), loader)
+
+
+def get_response_cache(path=".cache/responses.sqlite", ttl_seconds=7 * 24 * 3600, max_entries=5000):
+    def loader():
+        from response_cache import ResponseCache
+        return ResponseCache(path, ttl_seconds, max_entries)
+    return _get_or_load(_store_key("response_cache", path, ttl_seconds=ttl_seconds, max_entries=max_entries), loader)
+
+
+# Bank of accepted questions for near-duplicate checks; vectors come from the embedding cache
+def get_duplicate_index(path=".cache/questions_index.sqlite", threshold=0.92, top_k=5, embedding_cache=None):
+    def loader():
+        from duplicate_index import DuplicateIndex
+        return DuplicateIndex(path, embedding_cache or get_embedding_cache(), threshold, top_k)
+    return _get_or_load(_store_key("duplicate_index", path, threshold=threshold, top_k=top_k,
+                                   embedding_cache=id(embedding_cache) if embedding_cache else None), loader)
+
+
+def get_token_budget(path=".cache/token_stats.sqlite", **options):
+    def loader():
+        from token_budget import TokenBudget
+        return TokenBudget(path, **options)
+    return _get_or_load(_store_key("token_budget", path, **options), loader)
+
+
+# Append-only log of evaluated candidates shared by every worker of the process
+def get_results_log(path=".cache/results.sqlite", **options):
+    def loader():
+        from results_log import ResultsLog
+        return ResultsLog(path, **options)
+    return _get_or_load(_store_key("results_log", path, **options), loader)
+
+
+# Per-question-type model routing state shared by every job of the process
+def get_model_router(path=".cache/routing.sqlite", **options):
+    def loader():
+        from model_router import ModelRouter
+        return ModelRouter(path, **options)
+    return _get_or_load(_store_key("model_router", path, **options), loader)
@@ -0,0 +1,191 @@
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import sqlite_store
+
+# Picks which of llm_params.models to call for a question, per question type (QT/QM),
+# by Thompson sampling over past outcomes. Each call is rewarded with score_geral/10
+# when the output is valid and 0 when it failed or was invalid, and the expected
+# reward is reduced by latency_penalty per second of mean latency. Models with fewer
+# than min_samples calls for the question type are always called, so every model
+# keeps being measured; past that only the max_models best samples are called and
+# the rest are kept, in order, as fallbacks for a failed attempt. Every decision is
+# stored with the ranking it was based on, the models actually called and the winner.
+class ModelRouter:
+    def __init__(self, path=".cache/routing.sqlite", max_models=1, min_samples=5, latency_penalty=0.005, seed=None):
+        self.path = path
+        self.max_models = max_models
+        self.min_samples = min_samples
+        self.latency_penalty = latency_penalty
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+        self._conn = sqlite_store.connect(path, (
+            "CREATE TABLE IF NOT EXISTS arms ("
+            " model TEXT NOT NULL, question_type TEXT NOT NULL, calls INTEGER NOT NULL DEFAULT 0,"
+            " failures INTEGER NOT NULL DEFAULT 0, valid INTEGER NOT NULL DEFAULT 0, wins INTEGER NOT NULL DEFAULT 0,"
+            " reward REAL NOT NULL DEFAULT 0, timed INTEGER NOT NULL DEFAULT 0, seconds REAL NOT NULL DEFAULT 0,"
+            " PRIMARY KEY (model, question_type))",
+            "CREATE TABLE IF NOT EXISTS decisions ("
+            " id TEXT PRIMARY KEY, created REAL NOT NULL, job TEXT, question_type TEXT NOT NULL,"
+            " reason TEXT NOT NULL, selected TEXT NOT NULL, called TEXT, winner TEXT, ranking TEXT NOT NULL)",
+            "CREATE INDEX IF NOT EXISTS idx_decisions_created ON decisions(created)"
+        ), timeout=30)
+
+    def _arms(self, question_type):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT model, calls, failures, valid, wins, reward, timed, seconds FROM arms WHERE question_type = ?",
+                (question_type,)
+            ).fetchall()
+        return {row[0]: dict(zip(("calls", "failures", "valid", "wins", "reward", "timed", "seconds"), row[1:])) for row in rows}
+
+    # Ranks the model keys of `models` for a question type and selects which to call.
+    # Returns the decision (id, reason, selected, ranking) used by fallback/finish.
+    def route(self, models, question_type, job=None):
+        arms = self._arms(question_type)
+        ranking = []
+        for key in models:
+            arm = arms.get(key, {})
+            calls = arm.get("calls", 0)
+            reward = arm.get("reward", 0.0)
+            mean_seconds = arm["seconds"] / arm["timed"] if arm.get("timed") else 0.0
+            with self._lock:
+                sample = self._random.betavariate(1 + reward, 1 + calls - reward)
+            ranking.append({
+                "model": key,
+                "calls": calls,
+                "mean_reward": round(reward / calls, 3) if calls else None,
+                "mean_seconds": round(mean_seconds, 2),
+                "utility": round(sample - self.latency_penalty * mean_seconds, 4)
+            })
+        ranking.sort(key=lambda entry: entry["utility"], reverse=True)
+
+        cold = [entry["model"] for entry in ranking if entry["calls"] < self.min_samples]
+        if cold:
+            selected = [entry["model"] for entry in ranking]
+            reason = f"exploração: {', '.join(cold)} com menos de {self.min_samples} chamadas para {question_type}"
+        else:
+            selected = [entry["model"] for entry in ranking[:self.max_models or len(ranking)]]
+            reason = f"thompson: {', '.join(selected)} com maior utilidade amostrada para {question_type}"
+        return {
+            "id": uuid.uuid4().hex,
+            "job": job,
+            "question_type": question_type,
+            "reason": reason,
+            "selected": selected,
+            "ranking": ranking
+        }
+
+    # Next max_models models of the ranking not called yet (empty when all were tried)
+    def fallback(self, decision, called):
+        remaining = [entry["model"] for entry in decision["ranking"] if entry["model"] not in called]
+        return remaining[:self.max_models or len(remaining)]
+
+    # One call of `model`: reward in [0, 1] (0 for failures), seconds None for cache hits
+    def record(self, model, question_type, reward, seconds=None, failed=False, valid=False):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO arms (model, question_type) VALUES (?, ?) ON CONFLICT(model, question_type) DO NOTHING",
+                (model, question_type)
+            )
+            self._conn.execute(
+                "UPDATE arms SET calls = calls + 1, failures = failures + ?, valid = valid + ?, reward = reward + ?,"
+                " timed = timed + ?, seconds = seconds + ? WHERE model = ? AND question_type = ?",
+                (int(failed), int(valid), reward, int(seconds is not None), seconds or 0.0, model, question_type)
+            )
+            self._conn.commit()
+
+    def finish(self, decision, called, winner=None):
+        with self._lock:
+            if winner:
+                self._conn.execute(
+                    "UPDATE arms SET wins = wins + 1 WHERE model = ? AND question_type = ?",
+                    (winner, decision["question_type"])
+                )
+            self._conn.execute(
+                "INSERT INTO decisions (id, created, job, question_type, reason, selected, called, winner, ranking)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (decision["id"], time.time(), decision["job"], decision["question_type"], decision["reason"],
+                 json.dumps(decision["selected"]), json.dumps(list(called)), winner,
+                 json.dumps(decision["ranking"], ensure_ascii=False))
+            )
+            self._conn.commit()
+
+    def decisions(self, limit=20):
+        with self._lock:
+            cursor = self._conn.execute(
+                "SELECT id, created, job, question_type, reason, selected, called, winner, ranking"
+                " FROM decisions ORDER BY created DESC LIMIT ?",
+                (limit,)
+            )
+            names = [column[0] for column in cursor.description]
+            rows = cursor.fetchall()
+        decisions = []
+        for row in rows:
+            decision = dict(zip(names, row))
+            for name in ("selected", "called", "ranking"):
+                decision[name] = json.loads(decision[name]) if decision[name] else None
+            decisions.append(decision)
+        return decisions
+
+    def stats(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT question_type, model, calls, failures, valid, wins, reward, timed, seconds FROM arms"
+                " ORDER BY question_type, model"
+            ).fetchall()
+        return [
+            {
+                "question_type": question_type,
+                "model": model,
+                "calls": calls,
+                "failure_rate": round(failures / calls, 3) if calls else None,
+                "valid_rate": round(valid / calls, 3) if calls else None,
+                "wins": wins,
+                "mean_reward": round(reward / calls, 3) if calls else None,
+                "mean_seconds": round(seconds / timed, 2) if timed else None
+            }
+            for question_type, model, calls, failures, valid, wins, reward, timed, seconds in rows
+        ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Auditoria do roteamento de modelos (llm_params.routing)")
+    parser.add_argument("--path", default=".cache/routing.sqlite", help="arquivo SQLite do roteador")
+    parser.add_argument("--limit", type=int, default=20, help="número de decisões mais recentes")
+    parser.add_argument("--json", action="store_true", help="saída em JSON")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.path):
+        print(f"[!] Histórico de roteamento não encontrado: {args.path}")
+        return 1
+    router = ModelRouter(args.path)
+    stats, decisions = router.stats(), router.decisions(args.limit)
+    if args.json:
+        print(json.dumps({"models": stats, "decisions": decisions}, ensure_ascii=False, indent=2))
+        return 0
+
+    print(f"{'tipo':<5} {'modelo':<10} {'chamadas':>9} {'falhas':>7} {'válidas':>8} {'vitórias':>9} {'recompensa':>11} {'latência':>9}")
+    for entry in stats:
+        print(f"{entry['question_type']:<5} {entry['model']:<10} {entry['calls']:>9} {entry['failure_rate']:>7.1%} "
+              f"{entry['valid_rate']:>8.1%} {entry['wins']:>9} {entry['mean_reward']:>11.3f} "
+              f"{entry['mean_seconds'] if entry['mean_seconds'] is not None else '-':>9}")
+    print()
+    for decision in decisions:
+        created = datetime.fromtimestamp(decision["created"]).strftime("%Y-%m-%d %H:%M:%S")
+        print(f"{created}  {decision['question_type']}  chamados: {', '.join(decision['called'] or [])}  "
+              f"vencedor: {decision['winner'] or '-'}")
+        print(f"    {decision['reason']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,299 @@
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+from telemetry import telemetry
+
+# Statuses worth retrying: rate limited, timeouts/conflicts and server-side errors
+RETRY_STATUSES = (408, 409, 429)
+
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+
+# Groq reset headers come as "7.66s", "2m59.56s" or "120ms"; retry-after as seconds
+def parse_duration(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_RE.findall(value)
+    if not parts:
+        return None
+    scale = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+    return sum(float(number) * scale[unit] for number, unit in parts)
+
+
+def _header_int(headers, name):
+    try:
+        return int(float(headers.get(name)))
+    except (TypeError, ValueError):
+        return None
+
+
+# Refills `capacity` units per `period` seconds. reserve() takes the units at once and
+# returns how long the caller must wait for them, so concurrent callers queue up in
+# order instead of all retrying the same free slot.
+class TokenBucket:
+    def __init__(self, capacity, period=60.0):
+        self.capacity = float(capacity)
+        self.rate = self.capacity / period
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount, now):
+        self._refill(now)
+        self.level -= min(amount, self.capacity)
+        return max(0.0, -self.level / self.rate)
+
+    def refund(self, amount, now):
+        self._refill(now)
+        self.level = min(self.capacity, self.level + amount)
+
+    # Server view of the quota: never more left than `remaining`, and nothing left
+    # until `reset_seconds` when it is exhausted
+    def sync(self, remaining, reset_seconds, now):
+        self._refill(now)
+        if remaining is not None:
+            self.level = min(self.level, float(remaining))
+            if remaining <= 0 and reset_seconds:
+                self.level = min(self.level, -reset_seconds * self.rate)
+
+    def resize(self, capacity, period=60.0):
+        self.capacity = float(capacity)
+        self.rate = self.capacity / period
+        self.level = min(self.level, self.capacity)
+
+
+# Request and token buckets of one model. The token bucket starts from the configured
+# tokens_per_minute or, when not configured, from the x-ratelimit-limit-tokens header
+# of the first response; both buckets follow the remaining/reset headers afterwards.
+class ModelRateLimiter:
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.configured_tokens = bool(tokens_per_minute)
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens=0):
+        with self.lock:
+            now = time.monotonic()
+            wait = max(0.0, self.paused_until - now)
+            if self.requests:
+                wait = max(wait, self.requests.reserve(1, now))
+            if self.tokens and tokens:
+                wait = max(wait, self.tokens.reserve(tokens, now))
+            return wait
+
+    # Gives back the part of a token reservation the call did not use
+    def settle(self, reserved, used):
+        if not self.tokens or used is None:
+            return
+        with self.lock:
+            self.tokens.refund(max(0, reserved - used), time.monotonic())
+
+    # Time left of a pause set after the wait was computed (quota exhausted, 429)
+    def paused_for(self):
+        with self.lock:
+            return max(0.0, self.paused_until - time.monotonic())
+
+    def pause(self, seconds):
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def observe(self, headers):
+        if not headers:
+            return
+        with self.lock:
+            now = time.monotonic()
+            limit_tokens = _header_int(headers, "x-ratelimit-limit-tokens")
+            if limit_tokens and not self.configured_tokens:
+                if self.tokens is None:
+                    self.tokens = TokenBucket(limit_tokens)
+                elif limit_tokens != self.tokens.capacity:
+                    self.tokens.resize(limit_tokens)
+            if self.tokens:
+                self.tokens.sync(_header_int(headers, "x-ratelimit-remaining-tokens"),
+                                 parse_duration(headers.get("x-ratelimit-reset-tokens")), now)
+            # x-ratelimit-*-requests is the daily quota on Groq: only its exhaustion matters
+            if _header_int(headers, "x-ratelimit-remaining-requests") == 0:
+                reset = parse_duration(headers.get("x-ratelimit-reset-requests"))
+                if reset:
+                    self.paused_until = max(self.paused_until, now + reset)
+
+
+# At most `ratio` retries per request on average, with bursts of up to min_retries,
+# so a failing API is not hit with a multiple of the normal load.
+class RetryBudget:
+    def __init__(self, ratio=0.2, min_retries=5):
+        self.ratio = ratio
+        self.capacity = float(min_retries)
+        self.balance = float(min_retries)
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self.balance = min(self.capacity, self.balance + self.ratio)
+
+    def withdraw(self):
+        with self._lock:
+            if self.balance < 1:
+                return False
+            self.balance -= 1
+            return True
+
+
+# Wraps every Groq call: waits for the model's buckets, then takes one of the model's
+# `concurrency` slots (requests in flight across every question, batch worker and
+# service job of the process) only for the request itself, so a throttled or backing
+# off call never holds a slot. Retries only the failed call (429 honouring
+# retry-after, 408/409/5xx and connection errors) with exponential backoff and jitter
+# within the retry budget; timeouts are not retried, since a retry would wait the
+# whole timeout again. Counts the time spent throttled. Limits are a single value or
+# a mapping keyed by model id or config key, with an optional "default".
+class RateLimiter:
+    def __init__(self, models=None, requests_per_minute=None, tokens_per_minute=None, concurrency=None,
+                 max_retries=4, base_seconds=1.0, max_seconds=60.0, retry_ratio=0.2, min_retries=5):
+        self._keys = {model_id: key for key, model_id in (models or {}).items()}
+        self._rpm = requests_per_minute
+        self._tpm = tokens_per_minute
+        self._concurrency = concurrency
+        self.max_retries = max_retries
+        self.base_seconds = base_seconds
+        self.max_seconds = max_seconds
+        self.budget = RetryBudget(retry_ratio, min_retries)
+        self._limiters = {}
+        self._slots = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _limit(self, limits, model):
+        if not isinstance(limits, dict):
+            return limits
+        return limits.get(model, limits.get(self._keys.get(model), limits.get("default")))
+
+    def _model(self, model):
+        with self._lock:
+            if model not in self._limiters:
+                self._limiters[model] = ModelRateLimiter(self._limit(self._rpm, model), self._limit(self._tpm, model))
+                concurrency = self._limit(self._concurrency, model)
+                self._slots[model] = threading.BoundedSemaphore(concurrency) if concurrency else None
+                self._stats[model] = {"calls": 0, "throttled_seconds": 0.0, "throttled_calls": 0, "rate_limited": 0,
+                                      "retries": 0, "retry_budget_exhausted": 0}
+            return self._limiters[model]
+
+    def _count(self, model, name, amount=1):
+        with self._lock:
+            self._stats[model][name] += amount
+
+    @staticmethod
+    def _retryable(error):
+        import groq
+        if isinstance(error, groq.APITimeoutError):
+            return False
+        if isinstance(error, groq.APIStatusError):
+            return error.status_code in RETRY_STATUSES or error.status_code >= 500
+        return isinstance(error, groq.APIConnectionError)
+
+    def _backoff(self, attempt):
+        return min(self.max_seconds, self.base_seconds * 2 ** attempt) * random.uniform(0.5, 1.5)
+
+    # Sleeps `seconds`, returning early once `cancel` (a threading.Event) is set
+    @staticmethod
+    def _sleep(seconds, cancel=None):
+        if cancel is not None:
+            cancel.wait(seconds)
+        else:
+            time.sleep(seconds)
+
+    # Runs function() (a with_raw_response call) for `model`, reserving `tokens` of
+    # the model's token quota, and yields the raw response while holding the model's
+    # slot, so a streamed body is consumed inside it:
+    #     with limiter.request(model, send, tokens) as raw: ...
+    # Errors raised while the response is consumed are not retried.
+    @contextmanager
+    def request(self, model, function, tokens=0, cancel=None):
+        limiter = self._model(model)
+        slot = self._slots[model]
+        self._count(model, "calls")
+        self.budget.deposit()
+        attempt = 0
+        while True:
+            wait = limiter.acquire(tokens)
+            if wait > 0:
+                self._count(model, "throttled_calls")
+            while wait > 0 and not (cancel is not None and cancel.is_set()):
+                self._count(model, "throttled_seconds", wait)
+                telemetry.count("throttled_seconds", wait, model=model)
+                self._sleep(wait, cancel)
+                wait = limiter.paused_for()
+
+            with slot if slot is not None else nullcontext():
+                try:
+                    raw = function()
+                except Exception as e:
+                    error = e
+                else:
+                    limiter.observe(raw.headers)
+                    yield raw
+                    return
+
+            if not self._retryable(error):
+                raise error
+            status = getattr(error, "status_code", None)
+            delay = self._backoff(attempt)
+            if status == 429:
+                self._count(model, "rate_limited")
+                telemetry.count("rate_limited", model=model)
+                headers = getattr(getattr(error, "response", None), "headers", None) or {}
+                limiter.observe(headers)
+                delay = parse_duration(headers.get("retry-after")) or delay
+                limiter.pause(delay)
+                delay = 0.0
+            if attempt >= self.max_retries:
+                raise error
+            if not self.budget.withdraw():
+                self._count(model, "retry_budget_exhausted")
+                raise error
+            attempt += 1
+            self._count(model, "retries")
+            telemetry.count("groq_retries", model=model, status=str(status or "conexão"))
+            self._sleep(delay, cancel)
+
+    def settle(self, model, reserved, used):
+        self._model(model).settle(reserved, used)
+
+    def stats(self):
+        with self._lock:
+            return {model: {**stats, "throttled_seconds": round(stats["throttled_seconds"], 2)}
+                    for model, stats in self._stats.items()}
+
+
+_default_options = {}
+_default_limiter = None
+_default_lock = threading.Lock()
+
+
+def configure_default_limiter(**options):
+    global _default_limiter
+    with _default_lock:
+        _default_options.clear()
+        _default_options.update(options)
+        _default_limiter = None
+
+
+def get_default_limiter():
+    global _default_limiter
+    with _default_lock:
+        if _default_limiter is None:
+            _default_limiter = RateLimiter(**_default_options)
+        return _default_limiter
@@ -0,0 +1,79 @@
+import hashlib
+import json
+import threading
+import time
+
+import sqlite_store
+
+
+class CacheMiss(Exception):
+    pass
+
+
+# Content-addressed store of chat completions keyed by model, prompt hash and
+# sampling parameters. "sample" is the attempt number, so retries within a run get
+# distinct entries and a replayed run reproduces the same sequence of attempts.
+# max_tokens is stored with the entry but left out of the key: the token budget
+# changes it between runs, which would otherwise make every replay miss.
+# Entries expire after ttl_seconds (None = never) and the least recently used
+# ones are evicted past max_entries.
+class ResponseCache:
+    def __init__(self, path=".cache/responses.sqlite", ttl_seconds=7 * 24 * 3600, max_entries=5000):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self._conn = sqlite_store.connect(path, (
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, model TEXT NOT NULL, prompt_hash TEXT NOT NULL,"
+            " params TEXT NOT NULL, content TEXT NOT NULL,"
+            " created_at REAL NOT NULL, last_used REAL NOT NULL)",
+            "CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses(last_used)"
+        ))
+
+    @staticmethod
+    def prompt_hash(prompt):
+        return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _params(temperature, seed, sample, **metadata):
+        return json.dumps({"temperature": temperature, "seed": seed, "sample": sample, **metadata}, sort_keys=True)
+
+    def make_key(self, model, prompt, temperature, seed=None, sample=0):
+        raw = f"{model}\0{self.prompt_hash(prompt)}\0{self._params(temperature, seed, sample)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT content, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row and self.ttl_seconds is not None and now - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                row = None
+            if not row:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, model, prompt, temperature, max_tokens, seed, sample, content):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, prompt_hash, params, content, created_at, last_used)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, model, self.prompt_hash(prompt), self._params(temperature, seed, sample, max_tokens=max_tokens), content, now, now)
+            )
+            sqlite_store.evict_lru(self._conn, "responses", self.max_entries)
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            total = sqlite_store.count(self._conn, "responses")
+        return {"entries": total, "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,254 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+import zlib
+from datetime import datetime
+
+import sqlite_store
+
+# Append-only log of every evaluated candidate. Each run adds one row per candidate
+# (model, attempt, timings, tokens, score and metrics) in a single transaction; the
+# output text is stored once, zlib-compressed, under its sha256 and referenced by
+# hash, so re-generated identical outputs cost nothing. SQLite in WAL mode lets the
+# batch workers, the service and separate processes append at the same time while
+# the CLI below reads.
+class ResultsLog:
+    def __init__(self, path=".cache/results.sqlite", busy_timeout=30):
+        self.path = path
+        self._lock = threading.Lock()
+
+        self._conn = sqlite_store.connect(path, (
+            "CREATE TABLE IF NOT EXISTS outputs ("
+            " hash TEXT PRIMARY KEY, size INTEGER NOT NULL, content BLOB NOT NULL)",
+            "CREATE TABLE IF NOT EXISTS candidates ("
+            " run TEXT NOT NULL, job TEXT, question_hash TEXT NOT NULL, question_type TEXT,"
+            " model TEXT NOT NULL, attempt INTEGER, winner INTEGER NOT NULL, valid INTEGER NOT NULL,"
+            " similarity REAL, score_geral REAL, seconds REAL, cache_hit INTEGER,"
+            " prompt_tokens INTEGER, completion_tokens INTEGER, max_tokens INTEGER, finish_reason TEXT,"
+            " metrics TEXT, output_hash TEXT NOT NULL, created REAL NOT NULL)",
+            "CREATE INDEX IF NOT EXISTS idx_candidates_model ON candidates(model, seconds)",
+            "CREATE INDEX IF NOT EXISTS idx_candidates_created ON candidates(created)"
+        ), timeout=busy_timeout, synchronous="NORMAL")
+
+    @staticmethod
+    def output_hash(text):
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _row(run, job, question_hash, question_type, candidate, winner, max_tokens, created):
+        generation = candidate.get("generation") or {}
+        evaluation = candidate.get("evaluation") or {}
+        return (
+            run, job, question_hash, question_type, candidate["name"], generation.get("attempt"),
+            int(candidate is winner), int(bool(candidate["valid"])),
+            candidate.get("similarity"), evaluation.get("score_geral"), generation.get("seconds"),
+            int(generation["cache_hit"]) if "cache_hit" in generation else None,
+            generation.get("prompt_tokens"), generation.get("completion_tokens"), max_tokens,
+            generation.get("finish_reason"),
+            json.dumps(evaluation.get("metricas", {}), ensure_ascii=False, separators=(",", ":"), default=str),
+            ResultsLog.output_hash(candidate["output"]), created
+        )
+
+    # Appends the candidates of one question run and returns the run id. Only the
+    # new rows and any output text not stored yet are written. winner must be one of
+    # the candidate dicts: a model can appear once per attempt, so rows are matched
+    # by identity rather than by name.
+    def append_run(self, question, question_type, candidates, winner=None, job=None, max_tokens=None):
+        created = time.time()
+        question_hash = self.output_hash(question)
+        run = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{question_hash[:8]}-{os.urandom(3).hex()}"
+        rows = [
+            self._row(run, job, question_hash, question_type, candidate, winner,
+                      (max_tokens or {}).get(candidate["name"]), created)
+            for candidate in candidates
+        ]
+        outputs = {row[17]: candidate["output"] for row, candidate in zip(rows, candidates)}
+        outputs[question_hash] = question
+
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO outputs (hash, size, content) VALUES (?, ?, ?)",
+                [(key, len(text), zlib.compress(text.encode("utf-8"))) for key, text in outputs.items()]
+            )
+            self._conn.executemany(
+                "INSERT INTO candidates (run, job, question_hash, question_type, model, attempt, winner, valid,"
+                " similarity, score_geral, seconds, cache_hit, prompt_tokens, completion_tokens, max_tokens,"
+                " finish_reason, metrics, output_hash, created)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+        return run
+
+    def get_output(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT content FROM outputs WHERE hash = ?", (key,)).fetchone()
+        return zlib.decompress(row[0]).decode("utf-8") if row else None
+
+    @staticmethod
+    def _filters(model=None, question_type=None, since=None):
+        clauses, params = [], []
+        for clause, value in (("model = ?", model), ("question_type = ?", question_type), ("created >= ?", since)):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    # Candidate rows (dicts, oldest first) read from a cursor one at a time
+    def iter_candidates(self, model=None, question_type=None, since=None):
+        where, params = self._filters(model, question_type, since)
+        cursor = self._conn.cursor()
+        cursor.execute(f"SELECT * FROM candidates{where} ORDER BY created", params)
+        names = [column[0] for column in cursor.description]
+        for row in cursor:
+            yield dict(zip(names, row))
+
+    # Nearest-rank percentile of generation latency (cache hits excluded), picked by
+    # SQLite through the (model, seconds) index instead of sorting in Python
+    def _latency_percentile(self, model, count, pct, where, params):
+        offset = min(count - 1, int(round((count - 1) * pct / 100)))
+        condition = where.replace(" WHERE ", " AND ") if where else ""
+        row = self._conn.execute(
+            f"SELECT seconds FROM candidates WHERE model = ? AND seconds IS NOT NULL AND NOT IFNULL(cache_hit, 0){condition}"
+            " ORDER BY seconds LIMIT 1 OFFSET ?",
+            [model] + params + [offset]
+        ).fetchone()
+        return round(row[0], 3) if row else None
+
+    # One entry per model: candidates, runs, win rate, valid rate, mean score and
+    # similarity, latency p50/p95 and mean completion tokens
+    def model_summary(self, question_type=None, since=None):
+        where, params = self._filters(None, question_type, since)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT model, COUNT(*), COUNT(DISTINCT run), SUM(winner), SUM(valid), AVG(score_geral), AVG(similarity),"
+                " AVG(completion_tokens), SUM(CASE WHEN seconds IS NOT NULL AND NOT IFNULL(cache_hit, 0) THEN 1 ELSE 0 END)"
+                f" FROM candidates{where} GROUP BY model ORDER BY model",
+                params
+            ).fetchall()
+            summary = []
+            for model, candidates, runs, wins, valid, score, similarity, tokens, timed in rows:
+                summary.append({
+                    "model": model,
+                    "candidates": candidates,
+                    "runs": runs,
+                    "win_rate": round(wins / runs, 3) if runs else None,
+                    "valid_rate": round(valid / candidates, 3),
+                    "mean_score": round(score, 2) if score is not None else None,
+                    "mean_similarity": round(similarity, 4) if similarity is not None else None,
+                    "mean_completion_tokens": round(tokens) if tokens is not None else None,
+                    "latency_p50": self._latency_percentile(model, timed, 50, where, params) if timed else None,
+                    "latency_p95": self._latency_percentile(model, timed, 95, where, params) if timed else None
+                })
+        return summary
+
+    def stats(self):
+        with self._lock:
+            candidates, runs = self._conn.execute("SELECT COUNT(*), COUNT(DISTINCT run) FROM candidates").fetchone()
+            outputs, size = self._conn.execute("SELECT COUNT(*), IFNULL(SUM(LENGTH(content)), 0) FROM outputs").fetchone()
+        return {"candidates": candidates, "runs": runs, "outputs": outputs, "compressed_bytes": size}
+
+
+def _print_models(log, args):
+    summary = log.model_summary(args.question_type, args.since)
+    if args.json:
+        print(json.dumps(summary, ensure_ascii=False, indent=2))
+        return
+    print(f"{'modelo':<12} {'cand.':>6} {'exec.':>6} {'vitórias':>9} {'válidos':>8} {'score':>6} {'simil.':>7} "
+          f"{'p50 (s)':>8} {'p95 (s)':>8} {'tokens':>7}")
+    for entry in summary:
+        print(f"{entry['model']:<12} {entry['candidates']:>6} {entry['runs']:>6} {entry['win_rate']:>9.1%} "
+              f"{entry['valid_rate']:>8.1%} {_fmt(entry['mean_score']):>6} {_fmt(entry['mean_similarity']):>7} "
+              f"{_fmt(entry['latency_p50']):>8} {_fmt(entry['latency_p95']):>8} {_fmt(entry['mean_completion_tokens']):>7}")
+
+
+def _print_candidates(log, args):
+    columns = ("run", "model", "attempt", "winner", "valid", "score_geral", "similarity", "seconds",
+               "completion_tokens", "output_hash")
+    for index, row in enumerate(log.iter_candidates(args.model, args.question_type, args.since)):
+        if args.json:
+            row["metrics"] = json.loads(row["metrics"]) if row["metrics"] else {}
+            print(json.dumps(row, ensure_ascii=False))
+        else:
+            if index == 0:
+                print("\t".join(columns))
+            print("\t".join(_fmt(row[column]) for column in columns))
+
+
+def _print_rerank(log, args):
+    import scoring
+    weights = {}
+    for item in args.weights or []:
+        name, _, value = item.partition("=")
+        weights[name.strip()] = float(value)
+    report = scoring.rerank(log, weights, args.pick_mode, args.question_type, args.since)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return
+    print(f"{report['candidates']} candidatos de {report['runs']} execuções reavaliados em {report['seconds']}s "
+          f"(pick_mode {args.pick_mode}); vencedor diferente em {report['changed_winners']} execuções")
+    print(f"{'modelo':<12} {'exec.':>6} {'vitórias antes':>15} {'depois':>8} {'score antes':>12} {'depois':>8}")
+    for model, entry in report["models"].items():
+        print(f"{model:<12} {entry['runs']:>6} {entry['win_rate_before']:>15.1%} {entry['win_rate_after']:>8.1%} "
+              f"{_fmt(entry['mean_score_before']):>12} {_fmt(entry['mean_score_after']):>8}")
+
+
+def _fmt(value):
+    if value is None:
+        return "-"
+    if isinstance(value, float):
+        return f"{value:.3f}"
+    return str(value)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Consulta o log de resultados (cache.results_log)")
+    parser.add_argument("--path", default=".cache/results.sqlite", help="arquivo SQLite do log")
+    parser.add_argument("--question-type", choices=["QT", "QM"], help="filtra pelo tipo de questão")
+    parser.add_argument("--days", type=float, help="considera apenas os últimos N dias")
+    parser.add_argument("--json", action="store_true", help="saída em JSON (uma linha por candidato em 'candidates')")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("models", help="taxa de vitória, validade, score e latência p50/p95 por modelo")
+    candidates = commands.add_parser("candidates", help="lista os candidatos registrados, do mais antigo ao mais novo")
+    candidates.add_argument("--model", metavar="CHAVE",
+                            help="filtra pela chave do modelo em llm_params.models (ex.: llama), não pelo id do Groq")
+    output = commands.add_parser("output", help="imprime o texto gerado a partir do hash")
+    output.add_argument("hash")
+    rerank = commands.add_parser("rerank", help="recalcula score_geral e os vencedores com outros pesos, sem reavaliar")
+    rerank.add_argument("--weights", nargs="*", metavar="CRITÉRIO=PESO",
+                        help="ex.: semantic=2 python=4 (critérios: semantic, latex, python, structure, duplicate_penalty)")
+    rerank.add_argument("--pick-mode", default="most_similar", choices=["most_similar", "least_similar", "best_score"])
+    commands.add_parser("stats", help="tamanho do log")
+    args = parser.parse_args(argv)
+    args.since = time.time() - args.days * 86400 if args.days else None
+
+    if not os.path.exists(args.path):
+        print(f"[!] Log de resultados não encontrado: {args.path}")
+        return 1
+    log = ResultsLog(args.path)
+    if args.command == "models":
+        _print_models(log, args)
+    elif args.command == "candidates":
+        _print_candidates(log, args)
+    elif args.command == "rerank":
+        try:
+            _print_rerank(log, args)
+        except ValueError as e:
+            print(f"[!] {e}")
+            return 1
+    elif args.command == "output":
+        text = log.get_output(args.hash)
+        if text is None:
+            print(f"[!] Saída não encontrada: {args.hash}")
+            return 1
+        print(text)
+    else:
+        print(json.dumps(log.stats(), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,282 @@
+import atexit
+import hashlib
+import itertools
+import multiprocessing
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import resource
+except ImportError:  # not available on Windows; limits then rely on the wall clock only
+    resource = None
+
+NOMES_BASE = ["André", "Beatriz", "Carlos", "Daniela", "Eduardo", "Fernanda"]
+SOBRENOMES_BASE = ["Silva", "Santos", "Oliveira", "Souza", "Costa", "Almeida"]
+
+
+def build_context():
+    return {
+        "random": __import__("random"),
+        "json": __import__("json"),
+        "datetime": __import__("datetime"),
+        "uuid": __import__("uuid"),
+        "nomes_base": list(NOMES_BASE),
+        "sobrenomes_base": list(SOBRENOMES_BASE)
+    }
+
+
+def _picklable(values):
+    try:
+        pickle.dumps(values)
+        return list(values)
+    except Exception:
+        return [str(v) for v in values]
+
+
+# Queue on which a worker reports the id of each task it picks up
+_started_queue = None
+
+
+def _worker_init(memory_mb, started_queue=None):
+    global _started_queue
+    _started_queue = started_queue
+    if resource and memory_mb:
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+
+
+# RLIMIT_CPU counts the whole life of the worker, so each task gets
+# "already used + cpu_seconds". Going over it kills the worker with SIGXCPU and
+# the caller sees a wall-clock timeout.
+def _limit_cpu(cpu_seconds):
+    if not resource or not cpu_seconds:
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    soft = int(usage.ru_utime + usage.ru_stime + cpu_seconds) + 1
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+# Runs in the worker process. Same fallback as before: if the block fails, retry
+# without its first line (models often leave a stray line after "[[def:").
+def _exec_def_block(code):
+    context = build_context()
+    try:
+        exec(code, context)
+        used_code = code
+    except BaseException as e:
+        first_error = e
+        try:
+            second_attempt_code = "\n".join(code.splitlines()[1:])
+            context = build_context()
+            exec(second_attempt_code, context)
+            used_code = second_attempt_code
+        except BaseException:
+            return {"ok": False, "error": f"{type(first_error).__name__}: {first_error}", "code": code}
+
+    return {
+        "ok": True,
+        "code": used_code,
+        "inp_list": _picklable(context.get("inp_list", []) or []),
+        "out_list": _picklable(context.get("out_list", []) or [])
+    }
+
+
+# Every task runs through this wrapper: it sets the task's CPU limit and then reports
+# the start, so the caller starts the wall-clock deadline when a worker picks the task
+# up rather than while it waits in the queue.
+def _run_task(task_id, function, args, cpu_seconds):
+    _limit_cpu(cpu_seconds)
+    if _started_queue is not None:
+        _started_queue.put(task_id)
+    return function(*args)
+
+
+# How often a caller waiting on a task checks whether its pool was replaced
+_POLL_SECONDS = 0.05
+
+
+# Reusable pool of worker processes that executes LLM-generated [[def:]] blocks with
+# CPU-time, wall-clock and address-space limits. Results are memoized per code hash
+# (timeouts are not: they depend on the load), and concurrent requests for the same
+# code wait on a single execution. wall_seconds counts from the moment a worker picks
+# the task up, so tasks queued behind others are not timed out. A task that runs past
+# it fails alone: its pool is replaced, and the other tasks that were running or
+# queued in it are submitted again to the new pool.
+class SandboxPool:
+    def __init__(self, processes=2, cpu_seconds=5, wall_seconds=10, memory_mb=512, memo_size=256):
+        self.processes = processes
+        self.cpu_seconds = cpu_seconds
+        self.wall_seconds = wall_seconds
+        self.memory_mb = memory_mb
+        self.memo_size = memo_size
+        self._memo = OrderedDict()
+        self._running = {}
+        self._lock = threading.Lock()
+        self._pool = None
+        self._started_queue = None
+        # task id -> time.monotonic() when a worker picked it up
+        self._started = {}
+        self._task_ids = itertools.count()
+
+    @staticmethod
+    def _mp_context():
+        methods = multiprocessing.get_all_start_methods()
+        # avoid forking a parent that already holds torch/spaCy in memory
+        return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+    def _get_pool(self):
+        if self._pool is None:
+            context = self._mp_context()
+            # SimpleQueue.put writes straight to the pipe, so a start is reported
+            # even when the worker is killed right after it
+            self._started_queue = context.SimpleQueue()
+            self._pool = context.Pool(
+                processes=self.processes,
+                initializer=_worker_init,
+                initargs=(self.memory_mb, self._started_queue)
+            )
+            threading.Thread(target=self._record_starts, args=(self._started_queue,), daemon=True).start()
+        return self._pool
+
+    # Until the pool that writes to `started_queue` is retired. Polled rather than
+    # woken by a sentinel, since a worker killed while writing may hold the queue lock.
+    def _record_starts(self, started_queue):
+        while self._started_queue is started_queue:
+            if started_queue.empty():
+                time.sleep(_POLL_SECONDS)
+                continue
+            task_id = started_queue.get()
+            with self._lock:
+                # the task may already be finished (and forgotten) by its caller
+                if task_id in self._started:
+                    self._started[task_id] = time.monotonic()
+
+    def _submit(self, function, args):
+        with self._lock:
+            pool = self._get_pool()
+            task_id = next(self._task_ids)
+            self._started[task_id] = None
+            return pool, task_id, pool.apply_async(_run_task, (task_id, function, args, self.cpu_seconds))
+
+    # Takes `pool` out of service (unless another caller already did) and kills its
+    # workers; the next submission starts a fresh pool
+    def _retire(self, pool):
+        with self._lock:
+            if self._pool is pool:
+                self._pool = self._started_queue = None
+        pool.terminate()
+
+    # Result of one submitted task. Raises multiprocessing.TimeoutError once it has
+    # run for wall_seconds, and resubmits the task when its pool was retired under it.
+    def _wait(self, pool, task_id, pending, function, args):
+        try:
+            while True:
+                with self._lock:
+                    started = self._started.get(task_id)
+                if started is not None and time.monotonic() - started >= self.wall_seconds:
+                    # the worker is stuck or was killed by the CPU limit
+                    self._retire(pool)
+                    raise multiprocessing.TimeoutError()
+                remaining = self.wall_seconds if started is None else started + self.wall_seconds - time.monotonic()
+                pending.wait(max(0.0, min(remaining, _POLL_SECONDS)))
+                if pending.ready():
+                    return pending.get()
+                if self._pool is not pool:
+                    with self._lock:
+                        self._started.pop(task_id, None)
+                    pool, task_id, pending = self._submit(function, args)
+        finally:
+            with self._lock:
+                self._started.pop(task_id, None)
+
+    def close(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+            self._started_queue = None
+        if pool is not None:
+            pool.terminate()
+
+    def run(self, code):
+        key = hashlib.sha256(code.encode("utf-8")).hexdigest()
+
+        with self._lock:
+            if key in self._memo:
+                self._memo.move_to_end(key)
+                return self._memo[key]
+            running = self._running.get(key)
+            owner = running is None
+            if owner:
+                running = self._running[key] = {"event": threading.Event(), "result": None}
+
+        if not owner:
+            running["event"].wait()
+            return running["result"] or {"ok": False, "error": "execução concorrente falhou", "code": code}
+
+        try:
+            args = (code,)
+            try:
+                result = self._wait(*self._submit(_exec_def_block, args), _exec_def_block, args)
+            except multiprocessing.TimeoutError:
+                result = {"ok": False, "error": f"tempo limite de {self.wall_seconds}s excedido", "code": code}
+            else:
+                # success or an exception raised by the code itself: same result every time
+                with self._lock:
+                    self._memo[key] = result
+                    while len(self._memo) > self.memo_size:
+                        self._memo.popitem(last=False)
+            running["result"] = result
+            return result
+        finally:
+            with self._lock:
+                self._running.pop(key, None)
+            running["event"].set()
+
+    # Runs function(*args) for every tuple in argument_list across the workers, each
+    # call under the same CPU and wall-clock limits as run(). A call that fails or
+    # times out yields None.
+    def run_many(self, function, argument_list):
+        tasks = [(args,) + self._submit(function, args) for args in argument_list]
+
+        results = []
+        for args, pool, task_id, pending in tasks:
+            try:
+                results.append(self._wait(pool, task_id, pending, function, args))
+            except Exception:
+                results.append(None)
+        return results
+
+
+_default_pool = None
+_default_lock = threading.Lock()
+_default_options = {}
+
+
+def configure_default_pool(**options):
+    global _default_pool
+    with _default_lock:
+        _default_options.clear()
+        _default_options.update(options)
+        if _default_pool is not None:
+            _default_pool.close()
+            _default_pool = None
+
+
+def get_default_pool():
+    global _default_pool
+    with _default_lock:
+        if _default_pool is None:
+            _default_pool = SandboxPool(**_default_options)
+        return _default_pool
+
+
+@atexit.register
+def _shutdown_default_pool():
+    if _default_pool is not None:
+        _default_pool.close()
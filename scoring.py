@@ -0,0 +1,157 @@
+import json
+import time
+
+import numpy as np
+
+# Points of each criterion of score_geral. The semantic points depend on how close
+# coerencia_semantica is to the ideal band, the structure points are split evenly
+# across the STRUCTURE_FLAGS, and duplicate_penalty is subtracted from the points of
+# a near-duplicate of an already accepted question.
+DEFAULT_WEIGHTS = {"semantic": 3.0, "latex": 2.0, "python": 3.0, "structure": 2.0, "duplicate_penalty": 3.0}
+
+# Similarity inside IDEAL_BAND gets all semantic points, inside NEAR_BAND two thirds,
+# anything else one third (too close is a copy, too far is off-topic)
+IDEAL_BAND = (0.4, 0.7)
+NEAR_BAND = (0.3, 0.8)
+
+STRUCTURE_FLAGS = ("tem_classe", "tem_metodos", "tem_atributos", "tem_alternativas")
+FLAG_COLUMNS = ("latex_valido", "codigo_python_ok") + STRUCTURE_FLAGS + ("duplicata_proxima",)
+
+PICK_MODES = ("most_similar", "least_similar", "best_score")
+
+
+def resolve_weights(weights=None):
+    unknown = set(weights or {}) - set(DEFAULT_WEIGHTS)
+    if unknown:
+        raise ValueError(f"pesos desconhecidos: {', '.join(sorted(unknown))} (válidos: {', '.join(DEFAULT_WEIGHTS)})")
+    return {**DEFAULT_WEIGHTS, **{k: float(v) for k, v in (weights or {}).items()}}
+
+
+# The "metricas" dicts of many evaluations as one array per metric (NaN where the
+# semantic evaluation did not run)
+def to_columns(metrics_list):
+    columns = {
+        "coerencia_semantica": np.array(
+            [m.get("coerencia_semantica") if m.get("coerencia_semantica") is not None else np.nan for m in metrics_list],
+            dtype=np.float64
+        )
+    }
+    for name in FLAG_COLUMNS:
+        columns[name] = np.array([bool(m.get(name, False)) for m in metrics_list], dtype=bool)
+    return columns
+
+
+# score_geral (0-10) of every row of `columns` at once
+def compute_scores(columns, weights=None):
+    weights = resolve_weights(weights)
+    similarity = columns["coerencia_semantica"]
+    has_similarity = ~np.isnan(similarity)
+
+    with np.errstate(invalid="ignore"):
+        ideal = (similarity >= IDEAL_BAND[0]) & (similarity <= IDEAL_BAND[1])
+        near = (similarity >= NEAR_BAND[0]) & (similarity <= NEAR_BAND[1])
+    band_points = np.select([ideal, near], [3.0, 2.0], default=1.0)
+
+    points = np.where(has_similarity, band_points * weights["semantic"] / 3, 0.0)
+    points += weights["latex"] * columns["latex_valido"] + weights["python"] * columns["codigo_python_ok"]
+    points += weights["structure"] / len(STRUCTURE_FLAGS) * sum(columns[flag].astype(np.float64) for flag in STRUCTURE_FLAGS)
+    points = np.where(columns["duplicata_proxima"], np.maximum(0.0, points - weights["duplicate_penalty"]), points)
+
+    max_points = np.where(has_similarity, weights["semantic"], 0.0) + weights["latex"] + weights["python"] + weights["structure"]
+    scores = np.divide(points * 10, max_points, out=np.zeros_like(points), where=max_points > 0)
+    return np.round(scores, 2)
+
+
+def score_metrics(metrics_list, weights=None):
+    return compute_scores(to_columns(metrics_list), weights)
+
+
+# Index of the winning row of every run (-1 when a run has no valid candidate).
+# runs holds integer run codes 0..n_runs-1; the ordering follows pick_best in main.
+def select_winners(runs, n_runs, scores, similarity, valid, pick_mode="most_similar"):
+    if pick_mode not in PICK_MODES:
+        raise ValueError(f"pick_mode desconhecido: {pick_mode} (válidos: {', '.join(PICK_MODES)})")
+    similarity = np.nan_to_num(similarity, nan=-np.inf if pick_mode != "least_similar" else np.inf)
+    if pick_mode == "best_score":
+        keys = (-similarity, -scores)
+    elif pick_mode == "most_similar":
+        keys = (-similarity,)
+    else:
+        keys = (similarity,)
+
+    candidates = np.flatnonzero(valid)
+    order = candidates[np.lexsort(tuple(key[candidates] for key in keys) + (runs[candidates],))]
+    winners = np.full(n_runs, -1)
+    first = np.unique(runs[order], return_index=True)
+    winners[first[0]] = order[first[1]]
+    return winners
+
+
+# Re-scores every candidate of the results log under `weights` and picks each run's
+# winner again with `pick_mode`, from the stored metrics only (no spaCy, no
+# embeddings). Compares the per-model win rate and mean score with what was recorded.
+def rerank(results_log, weights=None, pick_mode="most_similar", question_type=None, since=None):
+    started = time.perf_counter()
+    run_ids, models, metrics, similarity, valid, stored_scores, stored_winner = [], [], [], [], [], [], []
+    for row in results_log.iter_candidates(question_type=question_type, since=since):
+        run_ids.append(row["run"])
+        models.append(row["model"])
+        metrics.append(_load_metrics(row["metrics"]))
+        similarity.append(row["similarity"] if row["similarity"] is not None else np.nan)
+        valid.append(bool(row["valid"]))
+        stored_scores.append(row["score_geral"] if row["score_geral"] is not None else np.nan)
+        stored_winner.append(bool(row["winner"]))
+
+    if not run_ids:
+        return {"runs": 0, "candidates": 0, "changed_winners": 0, "models": {}, "seconds": 0.0}
+
+    run_names, runs = np.unique(np.array(run_ids), return_inverse=True)
+    model_names, model_codes = np.unique(np.array(models), return_inverse=True)
+    similarity = np.array(similarity, dtype=np.float64)
+    valid = np.array(valid)
+    stored_scores = np.array(stored_scores, dtype=np.float64)
+    stored_winner = np.array(stored_winner)
+
+    scores = compute_scores(to_columns(metrics), weights)
+    winners = select_winners(runs, len(run_names), scores, similarity, valid, pick_mode)
+    new_winner = np.zeros(len(runs), dtype=bool)
+    new_winner[winners[winners >= 0]] = True
+
+    before = np.full(len(run_names), -1)
+    before[runs[stored_winner]] = np.flatnonzero(stored_winner)
+
+    # runs each model took part in (a model retried in a later attempt counts once)
+    participation = np.zeros((len(model_names), len(run_names)), dtype=bool)
+    participation[model_codes, runs] = True
+    runs_per_model = participation.sum(axis=1)
+    candidates_per_model = np.bincount(model_codes, minlength=len(model_names))
+
+    report = {}
+    for code, model in enumerate(model_names):
+        mask = model_codes == code
+        report[str(model)] = {
+            "runs": int(runs_per_model[code]),
+            "candidates": int(candidates_per_model[code]),
+            "win_rate_before": round(float(stored_winner[mask].sum() / runs_per_model[code]), 3),
+            "win_rate_after": round(float(new_winner[mask].sum() / runs_per_model[code]), 3),
+            "mean_score_before": _mean(stored_scores[mask]),
+            "mean_score_after": _mean(scores[mask])
+        }
+    return {
+        "runs": len(run_names),
+        "candidates": len(runs),
+        "weights": resolve_weights(weights),
+        "pick_mode": pick_mode,
+        "changed_winners": int(np.sum(winners != before)),
+        "models": report,
+        "seconds": round(time.perf_counter() - started, 3)
+    }
+
+
+def _load_metrics(raw):
+    return json.loads(raw) if raw else {}
+
+
+def _mean(values):
+    values = values[~np.isnan(values)]
+    return round(float(values.mean()), 2) if len(values) else None
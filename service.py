@@ -0,0 +1,289 @@
+import json
+import os
+import queue
+import threading
+import time
+import urllib.request
+from concurrent.futures import Future
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import model_registry
+from batch import _safe_id
+from telemetry import telemetry
+
+
+# Groups items submitted by concurrent callers into one call of function(items),
+# waiting at most max_wait seconds for a batch to fill. Each caller gets back the
+# slice of results for its own items.
+class MicroBatcher:
+    def __init__(self, function, name, max_batch=16, max_wait=0.02):
+        self.function = function
+        self.name = name
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        threading.Thread(target=self._run, name=f"microbatch-{name}", daemon=True).start()
+
+    def submit(self, items):
+        future = Future()
+        self._queue.put((list(items), future))
+        return future.result()
+
+    def _collect(self):
+        pending = [self._queue.get()]
+        count = len(pending[0][0])
+        deadline = time.monotonic() + self.max_wait
+        while count < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                pending.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+            count += len(pending[-1][0])
+        return pending
+
+    def _run(self):
+        while True:
+            pending = self._collect()
+            items = [item for batch, _ in pending for item in batch]
+            try:
+                results = self.function(items)
+            except Exception as e:
+                for _, future in pending:
+                    future.set_exception(e)
+                continue
+
+            telemetry.count("microbatch_calls", batcher=self.name)
+            telemetry.count("microbatch_items", len(items), batcher=self.name)
+            offset = 0
+            for batch, future in pending:
+                future.set_result(results[offset:offset + len(batch)])
+                offset += len(batch)
+
+
+# Same encode()/stats() interface as EmbeddingCache; lookups and misses of every job
+# running at the moment go through one cache query and one SentenceTransformer call.
+class BatchedEmbeddingCache:
+    def __init__(self, cache, max_batch=16, max_wait=0.02):
+        self.cache = cache
+        self._batcher = MicroBatcher(cache.encode, "embeddings", max_batch, max_wait)
+
+    def encode(self, texts):
+        return self._batcher.submit(texts)
+
+    def stats(self):
+        return self.cache.stats()
+
+
+# Long-running job queue: holds the warm models and runs up to `workers` questions
+# at a time through pipeline.run_question. Jobs are polled (GET /jobs/<id>) or
+# reported to their callback_url when finished, and forgotten job_ttl seconds after
+# they finish. Job dicts are only read and changed under _lock; callers get copies.
+class GenerationService:
+    def __init__(self, config, output_dir, pipeline, workers=2, embedding_cache=None, job_ttl=3600):
+        self.config = config
+        self.output_dir = output_dir
+        self.pipeline = pipeline
+        self.embedding_cache = embedding_cache
+        self.job_ttl = job_ttl
+        self.jobs = {}
+        self._finished = {}
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self.workers = workers
+        for index in range(workers):
+            threading.Thread(target=self._work, name=f"job-worker-{index}", daemon=True).start()
+
+    def submit(self, question, job_id=None, callback_url=None):
+        job_id = _safe_id(job_id or self.pipeline.new_job_id())
+        job = {
+            "id": job_id,
+            "status": "queued",
+            "submitted_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "question": question,
+            "callback_url": callback_url,
+            "result": None,
+            "error": None
+        }
+        with self._lock:
+            self._evict()
+            if job_id in self.jobs:
+                raise ValueError(f"job já existe: {job_id}")
+            self.jobs[job_id] = job
+            snapshot = public_job(job)
+        self._queue.put(job_id)
+        return snapshot
+
+    # Public copy of the job (None when unknown or already evicted)
+    def get(self, job_id):
+        with self._lock:
+            self._evict()
+            job = self.jobs.get(job_id)
+            return public_job(job) if job else None
+
+    def counts(self):
+        with self._lock:
+            self._evict()
+            statuses = [job["status"] for job in self.jobs.values()]
+        return {status: statuses.count(status) for status in ("queued", "running", "done", "failed")}
+
+    # Drops jobs finished more than job_ttl seconds ago; _finished is in finishing
+    # order. Called with _lock held.
+    def _evict(self):
+        if self.job_ttl is None:
+            return
+        expired = time.monotonic() - self.job_ttl
+        while self._finished:
+            job_id, finished = next(iter(self._finished.items()))
+            if finished > expired:
+                break
+            del self._finished[job_id]
+            self.jobs.pop(job_id, None)
+
+    # Applies `fields` to the job under the lock and returns a public copy
+    def _update(self, job, **fields):
+        with self._lock:
+            job.update(fields)
+            if job["status"] in ("done", "failed"):
+                self._finished[job["id"]] = time.monotonic()
+            return public_job(job)
+
+    def _work(self):
+        while True:
+            job_id = self._queue.get()
+            with self._lock:
+                job = self.jobs[job_id]
+            self._update(job, status="running", started_at=datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+            try:
+                with telemetry.span("job", job=job_id):
+                    fields = {"result": self._run(job), "status": "done"}
+            except Exception as e:
+                fields = {"status": "failed", "error": f"{type(e).__name__}: {e}"}
+            snapshot = self._update(job, finished_at=datetime.now().strftime("%Y-%m-%d %H:%M:%S"), **fields)
+            if job["callback_url"]:
+                self._notify(snapshot)
+
+    def _run(self, job):
+        question_dir = os.path.join(self.output_dir, job["id"])
+        os.makedirs(question_dir, exist_ok=True)
+
+        started = time.perf_counter()
+        outcome = self.pipeline.run_question(job["question"], self.config, question_dir, embedding_cache=self.embedding_cache)
+        self.pipeline.record_results(job["question"], outcome, self.config, question_dir)
+
+        winner = outcome["winner"]
+        return {
+            "question_type": outcome["question_type"],
+            "winner": winner["name"] if winner else None,
+            "score_geral": winner["evaluation"]["score_geral"] if winner else None,
+            "similarity": winner["similarity"] if winner else None,
+            "output": winner["output"] if winner else None,
+            "models_evaluated": len(outcome["results"]),
+            "tokens": outcome["tokens"],
+            "seconds": round(time.perf_counter() - started, 2),
+            "output_dir": question_dir
+        }
+
+    def _notify(self, job):
+        body = json.dumps(job, ensure_ascii=False).encode("utf-8")
+        request = urllib.request.Request(job["callback_url"], data=body, headers={"Content-Type": "application/json"})
+        try:
+            urllib.request.urlopen(request, timeout=10).close()
+        except Exception as e:
+            print(f"[✗] Falha no callback do job {job['id']}: {e}")
+
+
+def public_job(job):
+    return {key: value for key, value in job.items() if key != "question"}
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        service = self.server.service
+        path = self.path.rstrip("/")
+        if path == "/health":
+            self._send_json(200, {"status": "ok", "workers": service.workers, "jobs": service.counts()})
+        elif path.startswith("/jobs/"):
+            job = service.get(path[len("/jobs/"):])
+            if job is None:
+                self._send_json(404, {"error": "job não encontrado"})
+            else:
+                self._send_json(200, job)
+        else:
+            self._send_json(404, {"error": f"rota desconhecida: {self.path}"})
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/jobs":
+            self._send_json(404, {"error": f"rota desconhecida: {self.path}"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            if not request.get("question"):
+                raise ValueError("campo 'question' é obrigatório")
+            job = self.server.service.submit(request["question"], request.get("id"), request.get("callback_url"))
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+            return
+        self._send_json(202, {"job_id": job["id"], "status": job["status"], "status_url": f"/jobs/{job['id']}"})
+
+
+# Loads every model once, wires the micro-batchers into the pipeline module and
+# serves the job API until interrupted. Groq calls of all jobs share the process-wide
+# rate_limiter (llm_params.rate_limit).
+def serve(config, output_dir, pipeline=None):
+    if pipeline is None:
+        import main as pipeline
+
+    options = config.get('service', {})
+    batch_options = {"max_batch": options.get('max_batch', 16), "max_wait": options.get('batch_window_ms', 20) / 1000}
+
+    for name, loader in (("groq", model_registry.get_groq_client),
+                         ("sentence_transformers", model_registry.get_embedding_model),
+                         ("spacy", model_registry.get_spacy_model)):
+        try:
+            loader()
+        except Exception as e:
+            print(f"[!] {name} não carregado: {e}")
+
+    evaluator = pipeline.evaluator
+    if evaluator.nlp is not None:
+        evaluator.doc_batcher = MicroBatcher(
+            lambda texts: list(evaluator.nlp.pipe(texts, disable=evaluator._disabled_pipes)),
+            "spacy", **batch_options
+        )
+    embedding_cache = model_registry.get_embedding_cache(**config.get('cache', {}).get('embeddings', {}))
+    service = GenerationService(
+        config, output_dir, pipeline,
+        workers=options.get('workers', 2),
+        job_ttl=options.get('job_ttl_seconds', 3600),
+        embedding_cache=BatchedEmbeddingCache(embedding_cache, **batch_options)
+    )
+
+    server = ThreadingHTTPServer((options.get('host', "127.0.0.1"), options.get('port', 8800)), ServiceHandler)
+    server.daemon_threads = True
+    server.service = service
+    host, port = server.server_address[:2]
+    print(f"[✓] Serviço de geração em http://{host}:{port} ({service.workers} jobs em paralelo)")
+    print(f"    POST /jobs {{\"question\": ..., \"callback_url\": ...}}  |  GET /jobs/<id>  |  GET /health")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n[✓] Serviço encerrado.")
+    finally:
+        server.server_close()
+    return server
@@ -0,0 +1,34 @@
+import os
+import sqlite3
+
+
+# Opens the SQLite file behind one of the on-disk caches and stores: creates its
+# directory, allows the connection to be used from any thread (each store serializes
+# access with its own lock), switches to WAL so other processes can read while one
+# writes, and runs the schema statements (CREATE TABLE/INDEX IF NOT EXISTS).
+def connect(path, schema=(), timeout=5.0, synchronous=None):
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    if synchronous:
+        conn.execute(f"PRAGMA synchronous={synchronous}")
+    for statement in schema:
+        conn.execute(statement)
+    conn.commit()
+    return conn
+
+
+def count(conn, table):
+    return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+# Deletes the least recently used rows of `table` past max_entries, by its `key`
+# column and `last_used` timestamp. The caller holds its lock and commits.
+def evict_lru(conn, table, max_entries, key="key"):
+    total = count(conn, table)
+    if total > max_entries:
+        conn.execute(
+            f"DELETE FROM {table} WHERE {key} IN (SELECT {key} FROM {table} ORDER BY last_used ASC LIMIT ?)",
+            (total - max_entries,)
+        )
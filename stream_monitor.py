@@ -0,0 +1,97 @@
+import re
+
+# Cheap checks run on the partial completion while it streams in. They mirror what
+# would make the finished output useless: check_structure (class + atribut), the
+# LaTeX \begin/\end balance and the mandatory [[def:...]] block.
+_CLASS_RE = re.compile(r"Classe|class", re.IGNORECASE)
+_ATTRIBUTE_RE = re.compile(r"atribut", re.IGNORECASE)
+_DEF_RE = re.compile(r"\[\[\s*def\s*:", re.IGNORECASE)
+_ENV_RE = re.compile(r"\\(begin|end)\{")
+
+# Longest prefix of a marker that can be cut by a chunk boundary ("\begin{" / "atribut")
+_OVERLAP = 12
+
+
+class GenerationAborted(Exception):
+    pass
+
+
+# Raised when the caller no longer needs the completion (tournament winner found);
+# its telemetry span is recorded as cancelled, not as a failure
+class GenerationCancelled(Exception):
+    span_status = "cancelled"
+
+
+class StreamMonitor:
+    def __init__(self, max_tokens, def_block_budget=0.9, structure_budget=0.5, abort_on_unbalanced=False):
+        # budgets are fractions of max_tokens
+        self.def_block_tokens = int(max_tokens * def_block_budget)
+        self.structure_tokens = int(max_tokens * structure_budget)
+        self.abort_on_unbalanced = abort_on_unbalanced
+        self.parts = []
+        self.length = 0
+        self._tail = ""
+        self.has_class = self.has_attribute = self.has_def_block = False
+        self.begin_count = self.end_count = self.depth = 0
+        self.unmatched_end = False
+
+    @property
+    def text(self):
+        return "".join(self.parts)
+
+    # Completion tokens are estimated as chars / 4 while streaming; the real usage only
+    # arrives with the last chunk, which aborted streams never reach.
+    @property
+    def tokens(self):
+        return self.length // 4
+
+    # Only the new chunk (plus a short tail of the previous one) is scanned, so the
+    # cost per chunk stays constant however long the completion gets.
+    def feed(self, chunk):
+        if not chunk:
+            return
+        self.parts.append(chunk)
+        self.length += len(chunk)
+        window = self._tail + chunk
+
+        self.has_class = self.has_class or bool(_CLASS_RE.search(window))
+        self.has_attribute = self.has_attribute or bool(_ATTRIBUTE_RE.search(window))
+        self.has_def_block = self.has_def_block or bool(_DEF_RE.search(window))
+
+        # \begin{ / \end{ already counted in the tail are skipped
+        consumed = 0
+        for match in _ENV_RE.finditer(window):
+            if match.end() <= len(self._tail):
+                continue
+            consumed = match.end()
+            if match.group(1) == "begin":
+                self.begin_count += 1
+                self.depth += 1
+            else:
+                self.end_count += 1
+                self.depth -= 1
+                if self.depth < 0:
+                    self.unmatched_end = True
+                    self.depth = 0
+
+        # keeps a marker cut at the end of this chunk, never one already counted
+        self._tail = window[max(len(window) - _OVERLAP, consumed):]
+
+    # Reason to stop the stream now, or None while the completion can still turn out valid
+    def abort_reason(self):
+        tokens = self.tokens
+        if not self.has_def_block and tokens >= self.def_block_tokens:
+            return f"sem bloco [[def:]] após ~{tokens} tokens"
+        if not (self.has_class and self.has_attribute) and tokens >= self.structure_tokens:
+            return f"sem classe/atributos após ~{tokens} tokens"
+        if self.abort_on_unbalanced and self.unmatched_end:
+            return "\\end{} sem \\begin{} correspondente"
+        return None
+
+    def summary(self):
+        return {
+            "streamed_tokens": self.tokens,
+            "has_def_block": self.has_def_block,
+            "structure_ok": self.has_class and self.has_attribute,
+            "latex_balanced": self.begin_count == self.end_count and not self.unmatched_end
+        }
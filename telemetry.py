@@ -0,0 +1,156 @@
+import functools
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Prometheus histogram buckets (seconds): from embedding/evaluation up to slow Groq calls
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+# Lightweight per-stage tracing: every span is appended as one JSON line (when a
+# path is configured) and folded into in-memory aggregates exposed in Prometheus
+# text format.
+class Telemetry:
+    def __init__(self, jsonl_path=None):
+        self.jsonl_path = jsonl_path
+        self._lock = threading.Lock()
+        self._durations = defaultdict(lambda: {"sum": 0.0, "count": 0, "buckets": [0] * len(BUCKETS)})
+        self._failures = defaultdict(int)
+        self._tokens = defaultdict(int)
+        self._counters = defaultdict(int)
+
+    def _write(self, record):
+        if not self.jsonl_path:
+            return
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self._lock:
+            if os.path.dirname(self.jsonl_path):
+                os.makedirs(os.path.dirname(self.jsonl_path), exist_ok=True)
+            with open(self.jsonl_path, 'a', encoding='utf-8') as f:
+                f.write(line + "\n")
+
+    # attrs may be enriched inside the block (e.g. token usage once the response arrives).
+    # An exception sets the span status to its span_status attribute when it has one
+    # (e.g. "cancelled"), otherwise to "error"; only errors count as failures.
+    @contextmanager
+    def span(self, stage, **attrs):
+        started = time.perf_counter()
+        status, error = "ok", None
+        try:
+            yield attrs
+        except BaseException as e:
+            status, error = getattr(e, "span_status", "error"), f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            self.record_span(stage, time.perf_counter() - started, status, error, **attrs)
+
+    def record_span(self, stage, seconds, status="ok", error=None, **attrs):
+        model = attrs.get("model", "")
+        with self._lock:
+            duration = self._durations[(stage, model)]
+            duration["sum"] += seconds
+            duration["count"] += 1
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    duration["buckets"][i] += 1
+            if status == "error":
+                self._failures[(stage, model)] += 1
+            for kind in ("prompt_tokens", "completion_tokens"):
+                if attrs.get(kind):
+                    self._tokens[(model, kind)] += attrs[kind]
+
+        self._write({
+            "timestamp": datetime.now().isoformat(timespec="milliseconds"),
+            "stage": stage,
+            "duration_ms": round(seconds * 1000, 3),
+            "status": status,
+            "error": error,
+            **attrs
+        })
+
+    def count(self, name, value=1, **labels):
+        with self._lock:
+            self._counters[(name, tuple(sorted(labels.items())))] += value
+        self._write({"timestamp": datetime.now().isoformat(timespec="milliseconds"), "counter": name, "value": value, **labels})
+
+    def render_prometheus(self):
+        lines = []
+        with self._lock:
+            lines.append("# HELP pipeline_stage_duration_seconds Duração de cada etapa do pipeline")
+            lines.append("# TYPE pipeline_stage_duration_seconds histogram")
+            for (stage, model), duration in sorted(self._durations.items()):
+                labels = f'stage="{stage}",model="{model}"'
+                for bound, count in zip(BUCKETS, duration["buckets"]):
+                    lines.append(f'pipeline_stage_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'pipeline_stage_duration_seconds_bucket{{{labels},le="+Inf"}} {duration["count"]}')
+                lines.append(f"pipeline_stage_duration_seconds_sum{{{labels}}} {duration['sum']:.6f}")
+                lines.append(f"pipeline_stage_duration_seconds_count{{{labels}}} {duration['count']}")
+
+            lines.append("# HELP pipeline_stage_failures_total Falhas por etapa e modelo")
+            lines.append("# TYPE pipeline_stage_failures_total counter")
+            for (stage, model), count in sorted(self._failures.items()):
+                lines.append(f'pipeline_stage_failures_total{{stage="{stage}",model="{model}"}} {count}')
+
+            lines.append("# HELP pipeline_tokens_total Tokens consumidos por modelo")
+            lines.append("# TYPE pipeline_tokens_total counter")
+            for (model, kind), count in sorted(self._tokens.items()):
+                lines.append(f'pipeline_tokens_total{{model="{model}",kind="{kind}"}} {count}')
+
+            names = sorted({name for name, _ in self._counters})
+            for name in names:
+                lines.append(f"# TYPE pipeline_{name}_total counter")
+                for (counter, labels), value in sorted(self._counters.items()):
+                    if counter == name:
+                        label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+                        lines.append(f"pipeline_{name}_total{{{label_text}}} {value}")
+        return "\n".join(lines) + "\n"
+
+    def start_metrics_server(self, port, host="127.0.0.1"):
+        telemetry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.rstrip("/") != "/metrics":
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                body = telemetry.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        print(f"[✓] Métricas Prometheus em http://{host}:{server.server_address[1]}/metrics")
+        return server
+
+
+telemetry = Telemetry()
+
+
+def configure(jsonl_path=None, prometheus_port=None, prometheus_host="127.0.0.1"):
+    telemetry.jsonl_path = jsonl_path
+    if prometheus_port is not None:
+        return telemetry.start_metrics_server(prometheus_port, prometheus_host)
+    return None
+
+
+def traced(stage):
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with telemetry.span(stage):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,93 @@
+import re
+
+import pytest
+
+from class_model import extract_class_model, visibility
+from evaluation import QuestionEvaluator
+from main import load_config
+
+
+# QuestionEvaluator._estructure_analysis before it read the AST class model
+def legacy_structure(text):
+    classes = re.findall(r"\bclass\s+(\w+)", text)
+    metodos = re.findall(r"\bdef\s+(\w+)", text)
+    return {
+        "tem_classe": bool(re.search(r"\bclass\s+\w+", text)),
+        "tem_metodos": bool(re.search(r"\bdef\s+\w+", text)),
+        "tem_atributos": bool(re.search(r"self\.\w+", text)),
+        "classes_encontradas": classes,
+        "metodos_encontrados": metodos,
+    }
+
+
+def structure(text):
+    return QuestionEvaluator()._estructure_analysis(text)
+
+
+def verbatim(code):
+    return "\\begin{verbatim}\n" + code + "\n\\end{verbatim}\n"
+
+
+FLAGS = ("tem_classe", "tem_metodos", "tem_atributos")
+
+
+def test_original_question_keeps_the_legacy_flags():
+    text = load_config()["original_question"]
+    current, legacy = structure(text), legacy_structure(text)
+    assert {flag: current[flag] for flag in FLAGS} == {flag: legacy[flag] for flag in FLAGS}
+
+
+# Known differences from the regexes, which also change score_geral when they flip a
+# flag: the metrics now describe the code, not every "class"/"def"/"self." in the text.
+
+def test_prose_mentions_are_not_counted_when_code_parses():
+    text = "Crie a class Extra com def ajuda().\n" + verbatim("class Conta:\n    def depositar(self, v):\n        self.saldo = v")
+    assert structure(text)["classes_encontradas"] == ["Conta"]
+    assert structure(text)["metodos_encontrados"] == ["depositar"]
+    assert legacy_structure(text)["classes_encontradas"] == ["Extra", "Conta"]
+
+
+def test_prose_is_still_scanned_when_no_code_parses():
+    text = "Crie a class Conta com def depositar() que altera self.saldo."
+    current, legacy = structure(text), legacy_structure(text)
+    assert {flag: current[flag] for flag in FLAGS} == {flag: legacy[flag] for flag in FLAGS}
+    assert current["classes_encontradas"] == legacy["classes_encontradas"]
+
+
+def test_attributes_only_count_when_assigned():
+    read_only = verbatim("class Conta:\n    def saldo(self):\n        return self.valor")
+    assert structure(read_only)["tem_atributos"] is False
+    assert legacy_structure(read_only)["tem_atributos"] is True
+
+    outside_init = verbatim("class Conta:\n    def abrir(self):\n        self.aberta = True")
+    class_level = verbatim("class Conta:\n    taxa = 0.1\n    def abrir(self):\n        pass")
+    assert structure(outside_init)["tem_atributos"] is True
+    assert structure(class_level)["tem_atributos"] is True
+
+
+def test_classes_are_counted_once_across_blocks():
+    code = "class Conta:\n    def depositar(self, v):\n        self.saldo = v"
+    text = verbatim(code) + "[[def:\n" + code + "\n]]"
+    assert structure(text)["classes_encontradas"] == ["Conta"]
+    assert structure(text)["total_classes"] == 1
+    assert legacy_structure(text)["classes_encontradas"] == ["Conta", "Conta"]
+
+
+def test_methods_are_class_methods_and_top_level_functions():
+    code = ("class Conta:\n    def depositar(self, v):\n        def auxiliar():\n            pass\n        self.saldo = v\n"
+            "def criar():\n    return Conta()")
+    assert structure(verbatim(code))["metodos_encontrados"] == ["depositar", "criar"]
+    assert legacy_structure(verbatim(code))["metodos_encontrados"] == ["depositar", "auxiliar", "criar"]
+
+
+@pytest.mark.parametrize("name, symbol", [("saldo", "+"), ("_saldo", "#"), ("__saldo", "-"), ("__init__", "+")])
+def test_visibility(name, symbol):
+    assert visibility(name) == symbol
+
+
+def test_uml_model_keeps_attributes_from_every_method():
+    code = "class Conta(Base, Mixin):\n    def __init__(self):\n        self._saldo = 0\n    def fechar(self):\n        self.__fechada = True"
+    (conta,) = extract_class_model(verbatim(code))["classes"]
+    assert conta["bases"] == ["Base", "Mixin"]
+    assert conta["attributes"] == ["_saldo", "__fechada"]
+    assert conta["visibility"] == {"_saldo": "#", "__fechada": "-", "__init__": "+", "fechar": "+"}
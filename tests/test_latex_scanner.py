@@ -0,0 +1,40 @@
+import latex_scanner
+from latex_scanner import scan_text
+
+TEXT = r"""\textbf{Questão} Implemente a \texttt{class Conta}.
+\begin{verbatim}
+class Conta:
+    def depositar(self, valor):
+        self.saldo += valor
+\end{verbatim}
+\begin{enumerate}
+\item A
+\item B
+\end{enumerate}
+"""
+
+
+def test_single_pass_collects_every_marker():
+    scan = scan_text(TEXT)
+    assert scan["counts"] == {"verbatim_blocks": 1, "enumerate_blocks": 1, "textbf": 1, "texttt": 1, "items": 2}
+    assert scan["begin_count"] == scan["end_count"] == 2 and not scan["unmatched_end"]
+    assert scan["classes"] == ["Conta", "Conta"]
+    assert scan["methods"] == ["depositar"]
+    assert scan["has_attributes"] and scan["has_alternatives"]
+    assert scan["code_blocks"][0].strip().startswith("class Conta:")
+
+
+def test_callers_get_their_own_copy_of_the_cached_scan():
+    latex_scanner.clear_cache()
+    first = scan_text(TEXT)
+    first["classes"].append("Intrusa")
+    first["counts"]["items"] = 0
+    second = scan_text(TEXT)
+    assert second["classes"] == ["Conta", "Conta"]
+    assert second["counts"]["items"] == 2
+
+
+def test_unbalanced_environments():
+    scan = scan_text(r"\end{itemize} \begin{verbatim} x")
+    assert scan["unmatched_end"]
+    assert scan["begin_count"] == 1 and scan["end_count"] == 1
@@ -0,0 +1,45 @@
+from model_router import ModelRouter
+
+MODELS = ["llama", "gpt", "kimi"]
+
+
+def router(tmp_path, **options):
+    return ModelRouter(str(tmp_path / "routing.sqlite"), seed=0, **options)
+
+
+def test_models_below_min_samples_are_all_called(tmp_path):
+    model_router = router(tmp_path, min_samples=2)
+    for _ in range(2):
+        model_router.record("llama", "QT", 1.0, seconds=1.0, valid=True)
+    decision = model_router.route(MODELS, "QT")
+    assert sorted(decision["selected"]) == sorted(MODELS)
+    assert decision["reason"].startswith("exploração")
+
+
+def test_best_model_is_selected_and_the_rest_kept_as_fallbacks(tmp_path):
+    model_router = router(tmp_path, min_samples=5, max_models=1)
+    for _ in range(30):
+        model_router.record("llama", "QT", 0.9, seconds=1.0, valid=True)
+        model_router.record("gpt", "QT", 0.1, seconds=1.0, valid=True)
+        model_router.record("kimi", "QT", 0.0, failed=True)
+
+    decision = model_router.route(MODELS, "QT")
+    assert decision["selected"] == ["llama"]
+    assert decision["reason"].startswith("thompson")
+    assert model_router.fallback(decision, {"llama"}) in (["gpt"], ["kimi"])
+    assert model_router.fallback(decision, set(MODELS)) == []
+
+    # question types are routed independently
+    assert sorted(model_router.route(MODELS, "QM")["selected"]) == sorted(MODELS)
+
+
+def test_finished_decisions_are_audited(tmp_path):
+    model_router = router(tmp_path)
+    decision = model_router.route(MODELS, "QT", job="execucoes/job-1")
+    model_router.record("gpt", "QT", 0.8, seconds=2.0, valid=True)
+    model_router.finish(decision, ["llama", "gpt"], winner="gpt")
+
+    (audited,) = model_router.decisions()
+    assert audited["called"] == ["llama", "gpt"] and audited["winner"] == "gpt" and audited["job"] == "execucoes/job-1"
+    stats = {entry["model"]: entry for entry in model_router.stats()}
+    assert stats["gpt"]["wins"] == 1 and stats["gpt"]["mean_seconds"] == 2.0
@@ -0,0 +1,120 @@
+import groq
+import httpx
+import pytest
+
+from rate_limiter import RateLimiter, RetryBudget, TokenBucket, parse_duration
+
+REQUEST = httpx.Request("POST", "https://api.groq.com/openai/v1/chat/completions")
+
+
+def status_error(status, headers=None):
+    response = httpx.Response(status, headers=headers or {}, request=REQUEST)
+    return groq.APIStatusError(f"status {status}", response=response, body=None)
+
+
+class Raw:
+    headers = {}
+
+
+# function() for RateLimiter.request: raises the given errors in order, then succeeds
+class Calls:
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.count = 0
+
+    def __call__(self):
+        self.count += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return Raw()
+
+
+def limiter(**options):
+    return RateLimiter(base_seconds=0.001, max_seconds=0.001, **options)
+
+
+def request(rate_limiter, calls):
+    with rate_limiter.request("llama-3.1-8b-instant", calls) as raw:
+        return raw
+
+
+@pytest.mark.parametrize("value, seconds", [("7.66s", 7.66), ("2m59.56s", 179.56), ("120ms", 0.12), ("3", 3.0)])
+def test_parse_duration(value, seconds):
+    assert parse_duration(value) == pytest.approx(seconds)
+
+
+@pytest.mark.parametrize("value", [None, "", "soon"])
+def test_parse_duration_without_a_duration(value):
+    assert parse_duration(value) is None
+
+
+def test_retry_budget_allows_min_retries_then_ratio_per_request():
+    budget = RetryBudget(ratio=0.5, min_retries=2)
+    assert [budget.withdraw() for _ in range(3)] == [True, True, False]
+    budget.deposit()
+    assert budget.withdraw() is False
+    budget.deposit()
+    assert budget.withdraw() is True
+
+
+def test_token_bucket_queues_reservations():
+    bucket = TokenBucket(60, period=60.0)
+    now = bucket.updated
+    assert bucket.reserve(60, now) == 0.0
+    assert bucket.reserve(30, now) == pytest.approx(30.0)
+    bucket.refund(30, now)
+    assert bucket.reserve(1, now) == pytest.approx(1.0)
+    # one unit per second refills
+    assert bucket.reserve(1, now + 2) == pytest.approx(0.0)
+
+
+@pytest.mark.parametrize("error", [
+    status_error(500),
+    status_error(408),
+    groq.APIConnectionError(request=REQUEST),
+])
+def test_retryable_errors_are_retried(error):
+    rate_limiter = limiter()
+    calls = Calls(error)
+    assert isinstance(request(rate_limiter, calls), Raw)
+    assert calls.count == 2
+    assert rate_limiter.stats()["llama-3.1-8b-instant"]["retries"] == 1
+
+
+@pytest.mark.parametrize("error", [status_error(400), groq.APITimeoutError(REQUEST)])
+def test_client_errors_and_timeouts_are_not_retried(error):
+    calls = Calls(error)
+    with pytest.raises(type(error)):
+        request(limiter(), calls)
+    assert calls.count == 1
+
+
+def test_max_retries_bounds_one_request():
+    calls = Calls(*[status_error(503)] * 5)
+    with pytest.raises(groq.APIStatusError):
+        request(limiter(max_retries=2), calls)
+    assert calls.count == 3
+
+
+def test_retry_budget_is_shared_across_requests():
+    rate_limiter = limiter(max_retries=10, retry_ratio=0.0, min_retries=3)
+    calls = Calls(*[status_error(503)] * 10)
+    with pytest.raises(groq.APIStatusError):
+        request(rate_limiter, calls)
+    assert calls.count == 4
+
+    # the budget is spent: the next request fails on its first error
+    calls = Calls(status_error(503))
+    with pytest.raises(groq.APIStatusError):
+        request(rate_limiter, calls)
+    assert calls.count == 1
+    assert rate_limiter.stats()["llama-3.1-8b-instant"]["retry_budget_exhausted"] == 2
+
+
+def test_rate_limited_response_pauses_the_model_for_retry_after():
+    rate_limiter = limiter()
+    calls = Calls(status_error(429, {"retry-after": "0.2"}))
+    assert isinstance(request(rate_limiter, calls), Raw)
+    stats = rate_limiter.stats()["llama-3.1-8b-instant"]
+    assert stats["rate_limited"] == 1
+    assert stats["throttled_seconds"] >= 0.15
@@ -0,0 +1,41 @@
+from results_log import ResultsLog
+
+
+def candidate(name, attempt, score, valid=True, output=None):
+    return {
+        "name": name,
+        "output": output or f"saída de {name} na tentativa {attempt}",
+        "similarity": 0.5,
+        "valid": valid,
+        "evaluation": {"score_geral": score, "metricas": {"latex_valido": True}},
+        "generation": {"attempt": attempt, "seconds": 1.5, "cache_hit": False, "completion_tokens": 300},
+    }
+
+
+def test_every_attempt_is_logged_and_the_winner_matched_by_identity(tmp_path):
+    log = ResultsLog(str(tmp_path / "results.sqlite"))
+    # the same model in two attempts: only the second one won
+    candidates = [candidate("llama", 1, 4.0, valid=False), candidate("gpt", 1, 5.0), candidate("llama", 2, 8.0)]
+    log.append_run("questão original", "QT", candidates, winner=candidates[2], max_tokens={"llama": 2048})
+
+    rows = list(log.iter_candidates())
+    assert [(r["model"], r["attempt"], r["winner"], r["valid"]) for r in rows] == [
+        ("llama", 1, 0, 0), ("gpt", 1, 0, 1), ("llama", 2, 1, 1)
+    ]
+    assert [r["max_tokens"] for r in rows] == [2048, None, 2048]
+    assert log.get_output(rows[2]["output_hash"]) == candidates[2]["output"]
+
+
+def test_model_filter_uses_the_config_key(tmp_path):
+    log = ResultsLog(str(tmp_path / "results.sqlite"))
+    log.append_run("q", "QT", [candidate("llama", 1, 6.0), candidate("gpt", 1, 7.0)])
+    assert [r["model"] for r in log.iter_candidates(model="llama")] == ["llama"]
+    assert list(log.iter_candidates(model="llama-3.1-8b-instant")) == []
+
+
+def test_identical_outputs_are_stored_once(tmp_path):
+    log = ResultsLog(str(tmp_path / "results.sqlite"))
+    for _ in range(3):
+        log.append_run("q", "QM", [candidate("llama", 1, 6.0, output="mesma saída")])
+    assert log.stats()["candidates"] == 3
+    assert log.stats()["outputs"] == 2
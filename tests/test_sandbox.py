@@ -0,0 +1,64 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from sandbox import SandboxPool
+
+
+def nap(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+def spin():
+    while True:
+        pass
+
+
+@pytest.fixture
+def pool():
+    pool = SandboxPool(processes=1, cpu_seconds=30, wall_seconds=1.0)
+    yield pool
+    pool.close()
+
+
+def test_queued_tasks_are_not_timed_out(pool):
+    # four 0.6 s blocks submitted at once to one worker: the last one starts 1.8 s
+    # after it was submitted, past wall_seconds, but runs for only 0.6 s
+    codes = [f"import time\ntime.sleep(0.6)\ninp_list = [{i}]\nout_list = [{i}]" for i in range(4)]
+    with ThreadPoolExecutor(max_workers=4) as threads:
+        results = list(threads.map(pool.run, codes))
+    assert [result["ok"] for result in results] == [True] * 4
+    assert [result["inp_list"] for result in results] == [[0], [1], [2], [3]]
+
+
+def test_stuck_task_times_out_alone(pool):
+    started = time.monotonic()
+    assert pool.run_many(spin, [()]) == [None]
+    assert time.monotonic() - started < 3
+    assert pool.run_many(nap, [(0.1,)]) == [0.1]
+
+
+def test_results_are_memoized_per_code(pool):
+    code = "import random\ninp_list = [random.random()]\nout_list = ['x']"
+    first = pool.run(code)
+    assert first["ok"]
+    assert pool.run(code) is first
+    assert pool.run(code + "\n")["inp_list"] != first["inp_list"]
+
+
+def test_code_errors_are_memoized_and_timeouts_are_not(pool):
+    code = "x = 1\nraise ValueError('caso inválido')"
+    broken = pool.run(code)
+    assert broken["ok"] is False and "ValueError" in broken["error"]
+    assert pool.run(code) is broken
+
+    stuck = "while True:\n    pass"
+    assert "tempo limite" in pool.run(stuck)["error"]
+    assert len(pool._memo) == 1
+
+
+def test_stray_first_line_is_dropped(pool):
+    result = pool.run("def:\ninp_list = [1]\nout_list = [2]")
+    assert result["ok"] and result["inp_list"] == [1] and result["code"] == "inp_list = [1]\nout_list = [2]"
@@ -0,0 +1,106 @@
+import random
+
+import numpy as np
+import pytest
+
+import scoring
+from main import pick_best
+
+
+# QuestionEvaluator._calculte_score before it delegated to scoring.score_metrics
+def legacy_score(metricas):
+    pontos = 0
+    max_pontos = 0
+
+    if "coerencia_semantica" in metricas:
+        sim = metricas["coerencia_semantica"]
+        if 0.4 <= sim <= 0.7:
+            pontos += 3
+        elif 0.3 <= sim < 0.4 or 0.7 < sim <= 0.8:
+            pontos += 2
+        else:
+            pontos += 1
+        max_pontos += 3
+
+    if metricas.get("latex_valido", False):
+        pontos += 2
+    max_pontos += 2
+
+    if metricas.get("codigo_python_ok", False):
+        pontos += 3
+    max_pontos += 3
+
+    for flag in ("tem_classe", "tem_metodos", "tem_atributos", "tem_alternativas"):
+        if metricas.get(flag, False):
+            pontos += 0.5
+    max_pontos += 2
+
+    if metricas.get("duplicata_proxima", False):
+        pontos = max(0, pontos - 3)
+
+    score = (pontos / max_pontos) * 10 if max_pontos > 0 else 0
+    return round(score, 2)
+
+
+def random_metrics(rng, count):
+    metrics_list = []
+    for _ in range(count):
+        metricas = {name: rng.random() < 0.5 for name in scoring.FLAG_COLUMNS}
+        if rng.random() < 0.9:
+            # band edges are where an off-by-one comparison would show
+            metricas["coerencia_semantica"] = rng.choice([round(rng.random(), 4), 0.3, 0.4, 0.7, 0.8, 0.0, 1.0])
+        metrics_list.append(metricas)
+    return metrics_list
+
+
+def test_score_metrics_matches_legacy_branches():
+    metrics_list = random_metrics(random.Random(0), 20000)
+    scores = scoring.score_metrics(metrics_list)
+    assert [float(score) for score in scores] == [legacy_score(metricas) for metricas in metrics_list]
+
+
+def test_score_metrics_without_semantic_or_flags():
+    assert scoring.score_metrics([{}]).tolist() == [legacy_score({})]
+    assert scoring.score_metrics([{"coerencia_semantica": None}]).tolist() == [0.0]
+
+
+def random_runs(rng, n_runs, max_candidates=5):
+    runs = []
+    for _ in range(n_runs):
+        runs.append([
+            {
+                "valid": rng.random() < 0.7,
+                # one decimal, so ties are common and the tie-breaking order is checked too
+                "similarity": round(rng.random(), 1),
+                "evaluation": {"score_geral": round(rng.uniform(0, 10), 0)}
+            }
+            for _ in range(rng.randint(1, max_candidates))
+        ])
+    return runs
+
+
+@pytest.mark.parametrize("pick_mode", scoring.PICK_MODES)
+def test_select_winners_matches_pick_best(pick_mode):
+    runs = random_runs(random.Random(1), 2000)
+    candidates = [candidate for run in runs for candidate in run]
+    run_codes = np.repeat(np.arange(len(runs)), [len(run) for run in runs])
+
+    winners = scoring.select_winners(
+        run_codes, len(runs),
+        np.array([c["evaluation"]["score_geral"] for c in candidates], dtype=np.float64),
+        np.array([c["similarity"] for c in candidates], dtype=np.float64),
+        np.array([c["valid"] for c in candidates]),
+        pick_mode
+    )
+
+    for run, winner in zip(runs, winners):
+        expected = pick_best(run, pick_mode)
+        if expected is None:
+            assert winner == -1
+        else:
+            assert candidates[winner] is expected
+
+
+def test_select_winners_rejects_unknown_mode():
+    with pytest.raises(ValueError):
+        scoring.select_winners(np.zeros(1, dtype=int), 1, np.zeros(1), np.zeros(1), np.ones(1, dtype=bool), "random")
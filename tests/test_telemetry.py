@@ -0,0 +1,37 @@
+import json
+import urllib.request
+
+import pytest
+
+from stream_monitor import GenerationAborted, GenerationCancelled
+from telemetry import Telemetry
+
+
+def run_span(telemetry, error):
+    with pytest.raises(type(error)):
+        with telemetry.span("generation", model="llama"):
+            raise error
+
+
+def test_cancelled_generations_are_not_failures(tmp_path):
+    telemetry = Telemetry(str(tmp_path / "spans.jsonl"))
+    run_span(telemetry, GenerationCancelled("geração cancelada"))
+    run_span(telemetry, GenerationAborted("sem [[def:]]"))
+
+    spans = [json.loads(line) for line in (tmp_path / "spans.jsonl").read_text().splitlines()]
+    assert [span["status"] for span in spans] == ["cancelled", "error"]
+    metrics = telemetry.render_prometheus()
+    assert 'pipeline_stage_failures_total{stage="generation",model="llama"} 1' in metrics
+    assert 'pipeline_stage_duration_seconds_count{stage="generation",model="llama"} 2' in metrics
+
+
+def test_metrics_server_listens_on_localhost_by_default():
+    telemetry = Telemetry()
+    server = telemetry.start_metrics_server(0)
+    try:
+        host, port = server.server_address[:2]
+        assert host == "127.0.0.1"
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+            assert b"pipeline_stage_duration_seconds" in response.read()
+    finally:
+        server.shutdown()
@@ -0,0 +1,61 @@
+import re
+
+import pytest
+
+from main import generate_prompt, load_config
+from token_budget import TokenBudget, compact_question, dedupe_sentences
+
+
+def instruction(prompt):
+    return prompt[prompt.index("É OBRIGATÓRIO"):]
+
+
+def test_dedupe_sentences_drops_only_repeated_sentences():
+    text = "Gere a questão. Use tabs? Não.\nGere a questão.\nFim"
+    assert dedupe_sentences(text) == "Gere a questão. Use tabs? Não.\nFim"
+
+
+@pytest.mark.parametrize("text", [
+    "Inclua o bloco [[def:...]] contendo o código. Inclua o bloco [[def:...]] no final.",
+    "Use [[def: a = 1. b = 2. ]] aqui. Depois. Depois... ou não.",
+    r"Veja \begin{verbatim}x = 1. Y = 2.\end{verbatim} Outra frase.",
+    "sem maiúscula. depois do ponto. não separa. depois do ponto.",
+])
+def test_dedupe_sentences_keeps_markers_code_and_ellipses(text):
+    assert dedupe_sentences(text) == text
+
+
+@pytest.mark.parametrize("question_type", ["QT", "QM"])
+def test_compacted_prompt_keeps_the_instruction(question_type):
+    question = load_config()["original_question"]
+    full = generate_prompt(question, question_type)
+    compacted = generate_prompt(question, question_type, compact=True)
+
+    assert instruction(compacted) == instruction(full)
+    assert compacted.count("[[def:") == full.count("[[def:")
+    assert not re.search(r"\[\[def:[^\]]*\. \.", compacted)
+    assert len(compacted) < len(full)
+
+
+def test_compact_question_keeps_verbatim_and_def_block():
+    question = load_config()["original_question"]
+    compacted = compact_question(question)
+    for block in re.findall(r"\\begin\{verbatim\}.*?\\end\{verbatim\}", question, re.DOTALL):
+        assert "\n".join(line.rstrip() for line in block.split("\n")) in compacted
+    assert "[[def:" in compacted
+
+
+def test_compact_question_strips_formatting_noise():
+    text = ("\\begin{itemize}[itemsep=2pt]\n    \\item Crie 50\\% dos casos % comentário\n\\end{itemize}\n"
+            "\\vspace{0.5cm}\\noindent Texto\n\n\n\nFim")
+    assert compact_question(text) == "\\begin{itemize}\n\\item Crie 50\\% dos casos\n\\end{itemize}\nTexto\n\nFim"
+
+
+def test_max_tokens_follows_observed_outputs(tmp_path):
+    budget = TokenBudget(str(tmp_path / "tokens.sqlite"), min_samples=3, percentile=100, headroom=1.5, min_tokens=100)
+    assert budget.estimate("llama", "QT", 4000)["max_tokens"] == 4000
+    for tokens, reason in ((600, "stop"), (800, "stop"), (1000, "length"), (5000, None)):
+        budget.record("llama", "QT", "prompt", 50, tokens, reason)
+    # outputs cut at max_tokens count at their limit; aborted ones (no finish_reason) do not
+    assert budget.estimate("llama", "QT", 4000) == {"samples": 3, "expected_tokens": 800, "max_tokens": 1500}
+    assert budget.estimate("llama", "QM", 4000)["max_tokens"] == 4000
@@ -0,0 +1,66 @@
+import pytest
+
+import vpl_validation
+from sandbox import SandboxPool
+
+CODE = """
+class Conta:
+    def __init__(self, titular, saldo=0):
+        self.titular = titular
+        self.saldo = saldo
+
+    def depositar(self, valor):
+        self.saldo += valor
+        return self.saldo
+
+    def sortear(self):
+        return random.randint(1, 10 ** 9)
+
+    def extrato(self):
+        print(self.titular, self.saldo)
+
+    def falhar(self):
+        return 1 / 0
+"""
+
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = SandboxPool(processes=2, wall_seconds=10)
+    yield pool
+    pool.close()
+
+
+@pytest.mark.parametrize("case_input, parsed", [
+    ("'Ana', 10; depositar(5)", (["Ana", 10], [("depositar", (5,))])),
+    ("; depositar(1); extrato()", ([], [("depositar", (1,)), ("extrato", ())])),
+    ("Ana; depositar(5)", (["Ana"], [("depositar", (5,))])),
+    ("sem chamadas", None),
+    ("'Ana'; depositar(", None),
+])
+def test_parse_case(case_input, parsed):
+    assert vpl_validation.parse_case(case_input) == parsed
+
+
+def test_validate_cases_reports_every_status(pool):
+    cases = [
+        ("'Ana', 10; depositar(5)", "15"),
+        ("'Ana', 10; depositar(5)", "99"),
+        ("'Ana'; sortear()", "7"),
+        ("texto livre", "qualquer"),
+        ("'Ana'; falhar()", "0"),
+        ("'Bia', 3; extrato()", "Bia  3"),
+    ]
+    report = vpl_validation.validate_cases(CODE, [c[0] for c in cases], [c[1] for c in cases], chunk_size=2, pool=pool)
+
+    assert [r["status"] for r in report["cases"]] == ["ok", "mismatch", "nondeterministic", "unverifiable", "error", "ok"]
+    assert [r["case"] for r in report["cases"]] == list(range(6))
+    assert report["total"] == 6 and report["ok"] == 2 and report["mismatch"] == 1
+    assert report["cases"][1]["got"] == "15"
+    assert vpl_validation.accepted_cases(report) == [0, 3, 5]
+
+
+def test_code_that_does_not_run_rejects_every_case(pool):
+    report = vpl_validation.validate_cases("raise RuntimeError('x')", ["'Ana'; depositar(1)"] * 2, ["1"] * 2, pool=pool)
+    assert report["error"] == 2
+    assert vpl_validation.accepted_cases(report) == []
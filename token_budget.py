@@ -0,0 +1,153 @@
+import re
+import threading
+import time
+
+import sqlite_store
+
+# Rough size of a token for Portuguese/LaTeX text until a model has real usage data
+DEFAULT_CHARS_PER_TOKEN = 4.0
+
+# Verbatim blocks and the [[def:]] block are kept as they are (code, examples)
+_PROTECTED_RE = re.compile(r"(\\begin\{verbatim\}.*?\\end\{verbatim\}|\[\[\s*def\s*:.*?\]\])", re.DOTALL | re.IGNORECASE)
+_COMMENT_RE = re.compile(r"(?<!\\)%.*$", re.MULTILINE)
+_SPACING_RE = re.compile(r"\\(?:[vh]space\*?\{[^{}]*\}|(?:medskip|smallskip|bigskip|noindent|newpage|clearpage)\b) ?")
+_LIST_OPTIONS_RE = re.compile(r"(\\begin\{(?:itemize|enumerate|description)\})\[[^\]\n]*\]")
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+
+
+def estimate_tokens(text, chars_per_token=DEFAULT_CHARS_PER_TOKEN):
+    return int(len(text) / chars_per_token) if text else 0
+
+
+def _compact_code(code):
+    lines = [line.rstrip() for line in code.split("\n")]
+    return _BLANK_LINES_RE.sub("\n\n", "\n".join(lines))
+
+
+def _compact_latex(text):
+    text = _COMMENT_RE.sub("", text)
+    text = _SPACING_RE.sub("", text)
+    text = _LIST_OPTIONS_RE.sub(r"\1", text)
+    # indentation outside code only aligns the source
+    text = "\n".join(line.strip() for line in text.split("\n"))
+    return _BLANK_LINES_RE.sub("\n\n", text)
+
+
+# Strips formatting noise the model does not need to understand the question (spacing
+# commands, list options, comments, indentation, runs of blank lines) while leaving
+# verbatim examples and the [[def:]] code untouched apart from trailing spaces.
+def compact_question(text):
+    parts = _PROTECTED_RE.split(text)
+    compacted = [_compact_code(part) if index % 2 else _compact_latex(part) for index, part in enumerate(parts)]
+    return "".join(compacted).strip()
+
+
+# A sentence ends at . ! or ? followed by a newline or by a space and a capital letter,
+# never at an ellipsis ("...")
+_SENTENCE_END_RE = re.compile(r"(?<!\.)[.!?](?!\.)(?=[ \t]*\n|\s+[A-ZÀ-ÖØ-Þ])")
+# Markers the models must reproduce and code examples are never split
+_UNSPLITTABLE_RE = re.compile(r"\\begin\{verbatim\}.*?\\end\{verbatim\}|\[\[.*?\]\]", re.DOTALL)
+
+
+def _sentences(text):
+    protected = [match.span() for match in _UNSPLITTABLE_RE.finditer(text)]
+    start = 0
+    for match in _SENTENCE_END_RE.finditer(text):
+        if any(low < match.end() <= high for low, high in protected):
+            continue
+        yield text[start:match.end()]
+        start = match.end()
+    yield text[start:]
+
+
+# Drops repeated sentences (ignoring case and spacing) from an instruction text; the
+# sentences kept are left exactly as they were, separators included
+def dedupe_sentences(text):
+    seen = set()
+    sentences = []
+    for sentence in _sentences(text):
+        normalized = " ".join(sentence.lower().split())
+        if normalized and normalized in seen:
+            continue
+        seen.add(normalized)
+        sentences.append(sentence)
+    return "".join(sentences).strip()
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    index = (len(ordered) - 1) * pct / 100
+    lower = int(index)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (index - lower)
+
+
+# Observed prompt/completion sizes per model and question type (QT/QM). max_tokens
+# for a model becomes a high percentile of its outputs plus headroom, never above the
+# configured ceiling; until min_samples outputs are known the ceiling is used. Outputs
+# cut at max_tokens (finish_reason "length") count at their limit, a lower bound of
+# their real size: leaving them out would bias the percentile low and keep the limit
+# shrinking onto the outputs it truncates.
+class TokenBudget:
+    def __init__(self, path=".cache/token_stats.sqlite", min_samples=5, percentile=95, headroom=1.25,
+                 min_tokens=1024, window=200):
+        self.path = path
+        self.min_samples = min_samples
+        self.percentile = percentile
+        self.headroom = headroom
+        self.min_tokens = min_tokens
+        self.window = window
+        self._lock = threading.Lock()
+
+        self._conn = sqlite_store.connect(path, (
+            "CREATE TABLE IF NOT EXISTS completions ("
+            " model TEXT NOT NULL, question_type TEXT NOT NULL, prompt_chars INTEGER NOT NULL,"
+            " prompt_tokens INTEGER, completion_tokens INTEGER NOT NULL,"
+            " finish_reason TEXT, created REAL NOT NULL)",
+            "CREATE INDEX IF NOT EXISTS idx_completions_model ON completions(model, question_type, created)"
+        ))
+
+    def record(self, model, question_type, prompt, prompt_tokens, completion_tokens, finish_reason=None):
+        if not completion_tokens:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO completions (model, question_type, prompt_chars, prompt_tokens, completion_tokens, finish_reason, created)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (model, question_type, len(prompt), prompt_tokens, completion_tokens, finish_reason, time.time())
+            )
+            self._conn.commit()
+
+    def _completions(self, model, question_type):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT completion_tokens FROM completions WHERE model = ? AND question_type = ? AND finish_reason IN ('stop', 'length')"
+                " ORDER BY created DESC LIMIT ?",
+                (model, question_type, self.window)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def chars_per_token(self, model):
+        with self._lock:
+            chars, tokens = self._conn.execute(
+                "SELECT SUM(prompt_chars), SUM(prompt_tokens) FROM completions WHERE model = ? AND prompt_tokens > 0",
+                (model,)
+            ).fetchone()
+        return chars / tokens if chars and tokens else DEFAULT_CHARS_PER_TOKEN
+
+    def estimate_prompt_tokens(self, model, prompt):
+        return estimate_tokens(prompt, self.chars_per_token(model))
+
+    # {"samples", "expected_tokens" (median), "max_tokens"} for one model/question type
+    def estimate(self, model, question_type, ceiling):
+        observed = self._completions(model, question_type)
+        if len(observed) < self.min_samples:
+            return {"samples": len(observed), "expected_tokens": None, "max_tokens": ceiling}
+        limit = int(percentile(observed, self.percentile) * self.headroom)
+        return {
+            "samples": len(observed),
+            "expected_tokens": int(percentile(observed, 50)),
+            "max_tokens": max(self.min_tokens, min(ceiling, limit))
+        }
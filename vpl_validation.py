@@ -0,0 +1,146 @@
+import ast
+import contextlib
+import inspect
+import io
+import re
+
+import sandbox
+
+# "<constructor args>; metodo(args); outro()" — the input format the prompt asks for
+_CALL_RE = re.compile(r"^\s*(\w+)\s*\((.*)\)\s*$", re.DOTALL)
+
+STATUSES = ("ok", "mismatch", "nondeterministic", "unverifiable", "error")
+# Cases contradicted by the reference classes; they go neither to .cases nor to the PDF
+REJECTED_STATUSES = ("mismatch", "nondeterministic", "error")
+
+
+def _literal(value):
+    value = value.strip()
+    try:
+        return ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        return value
+
+
+# (constructor args, [(method, args), ...]) or None when the input does not follow
+# the constructor-then-calls format
+def parse_case(case_input):
+    segments = [segment.strip() for segment in str(case_input).split(";")]
+    if len(segments) < 2 or not all(segments[1:]):
+        return None
+
+    constructor = [_literal(arg) for arg in segments[0].split(",")] if segments[0] else []
+    calls = []
+    for segment in segments[1:]:
+        match = _CALL_RE.match(segment)
+        if not match:
+            return None
+        try:
+            args = ast.literal_eval(f"({match.group(2)},)") if match.group(2).strip() else ()
+        except (ValueError, SyntaxError):
+            return None
+        calls.append((match.group(1), tuple(args)))
+    return constructor, calls
+
+
+def _normalize(value):
+    return " ".join(str(value).split())
+
+
+def _accepts(cls, args):
+    try:
+        inspect.signature(cls).bind(*args)
+        return True
+    except (TypeError, ValueError):
+        return False
+
+
+# First class defined by the [[def:]] block that takes the constructor args and has
+# every called method
+def _pick_class(classes, constructor, calls):
+    for cls in classes:
+        if _accepts(cls, constructor) and all(callable(getattr(cls, name, None)) for name, _ in calls):
+            return cls
+    return None
+
+
+# Result of the last call, or what the calls printed when it returns None
+def _replay(cls, constructor, calls, random_module, seed):
+    random_module.seed(seed)
+    printed = io.StringIO()
+    with contextlib.redirect_stdout(printed):
+        instance = cls(*constructor)
+        result = None
+        for name, args in calls:
+            result = getattr(instance, name)(*args)
+    return _normalize(result if result is not None else printed.getvalue())
+
+
+# Runs in a sandbox worker: executes the reference code once, then replays each
+# (index, input, expected output) case against its classes under every seed.
+def check_cases(code, cases, seeds):
+    context = sandbox.build_context()
+    context["__name__"] = "__vpl__"
+    try:
+        exec(code, context)
+    except BaseException as e:
+        return [{"case": index, "status": "error", "detail": f"{type(e).__name__}: {e}"} for index, _, _ in cases]
+
+    classes = [value for value in context.values() if isinstance(value, type) and value.__module__ == "__vpl__"]
+    report = []
+    for index, case_input, expected in cases:
+        parsed = parse_case(case_input)
+        cls = _pick_class(classes, *parsed) if parsed else None
+        if cls is None:
+            report.append({"case": index, "status": "unverifiable"})
+            continue
+        try:
+            outputs = [_replay(cls, *parsed, context["random"], seed) for seed in seeds]
+        except BaseException as e:
+            report.append({"case": index, "status": "error", "detail": f"{type(e).__name__}: {e}"})
+            continue
+
+        if len(set(outputs)) > 1:
+            report.append({"case": index, "status": "nondeterministic", "outputs": outputs})
+        elif outputs[0] != _normalize(expected):
+            report.append({"case": index, "status": "mismatch", "expected": str(expected), "got": outputs[0]})
+        else:
+            report.append({"case": index, "status": "ok"})
+    return report
+
+
+# Validates every generated case in chunks spread over the sandbox pool. Returns
+# {"total", <status>: count..., "cases": [per-case results in input order]}.
+def validate_cases(code, inp_list, out_list, seeds=(1, 2), chunk_size=25, pool=None):
+    pool = pool or sandbox.get_default_pool()
+    cases = [(index, inp, out) for index, (inp, out) in enumerate(zip(inp_list, out_list))]
+    chunks = [cases[i:i + chunk_size] for i in range(0, len(cases), chunk_size)]
+
+    results = []
+    for chunk, chunk_report in zip(chunks, pool.run_many(check_cases, [(code, chunk, tuple(seeds)) for chunk in chunks])):
+        if chunk_report is None:
+            chunk_report = [{"case": index, "status": "error", "detail": "tempo limite excedido"} for index, _, _ in chunk]
+        results.extend(chunk_report)
+
+    summary = {"total": len(results)}
+    summary.update({status: sum(1 for r in results if r["status"] == status) for status in STATUSES})
+    summary["cases"] = results
+    return summary
+
+
+# Indices, in input order, of the cases of a validate_cases report that were not rejected
+def accepted_cases(report):
+    return [r["case"] for r in report["cases"] if r["status"] not in REJECTED_STATUSES]
+
+
+# Config "vpl": max_cases written to the .cases file, seeds and chunk_size
+_options = {}
+
+
+def configure(**options):
+    _options.clear()
+    _options.update(options)
+
+
+def get_options():
+    return dict(_options)